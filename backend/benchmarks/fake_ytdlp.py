@@ -0,0 +1,77 @@
+"""
+Drop-in for the ``yt_dlp`` module: "downloads" synthetic audio instead of searching YouTube
+"""
+
+import os
+import re
+import time
+import wave
+import shutil
+import threading
+import numpy as np
+
+SAMPLE_RATE = 22_050
+AUDIO_SECONDS = 180      # Length of every synthetic track; over 120s so download_audio takes 4 spaced clips
+DOWNLOAD_LATENCY = 0.0   # Seconds slept per download, standing in for network transfer
+
+class SyntheticAudio:
+    """Click track over a chord at the synthetic track's tempo; one WAV per tempo, generated once."""
+
+    def __init__(self, directory: str, world, seconds: float = AUDIO_SECONDS, latency: float = DOWNLOAD_LATENCY):
+        self.directory = directory
+        self.world = world
+        self.seconds = seconds
+        self.latency = latency
+        self.downloads = 0
+        self._lock = threading.Lock()
+
+    def _render(self, tempo: float, path: str):
+        t = np.arange(int(self.seconds * SAMPLE_RATE)) / SAMPLE_RATE
+        signal = sum(0.15 * np.sin(2 * np.pi * freq * t) for freq in (220.0, 277.2, 329.6))
+        beat = 60.0 / tempo
+        phase = np.mod(t, beat)
+        signal += 0.6 * np.exp(-phase * 40) * np.sin(2 * np.pi * 1000 * t) # Decaying click on every beat
+        samples = (np.clip(signal, -1, 1) * 32767).astype("<i2")
+
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with wave.open(tmp_path, "wb") as handle:
+            handle.setnchannels(1)
+            handle.setsampwidth(2)
+            handle.setframerate(SAMPLE_RATE)
+            handle.writeframes(samples.tobytes())
+        os.replace(tmp_path, path)
+
+    def source_for(self, query: str) -> str:
+        match = re.search(r"Song (\d+)", query)
+        tempo = int(self.world.tempo(int(match.group(1)))) if match else 120
+        path = os.path.join(self.directory, f"synthetic_{tempo}bpm_{int(self.seconds)}s.wav")
+        with self._lock:
+            if not os.path.exists(path):
+                os.makedirs(self.directory, exist_ok=True)
+                self._render(tempo, path)
+        return path
+
+    def download(self, query: str, outtmpl: str):
+        time.sleep(self.latency)
+        shutil.copyfile(self.source_for(query), outtmpl.replace("%(ext)s", "wav"))
+        with self._lock:
+            self.downloads += 1
+
+def fake_module(audio: SyntheticAudio):
+    """Return an object exposing ``YoutubeDL`` like the real module, backed by ``audio``."""
+
+    class YoutubeDL:
+        def __init__(self, options: dict):
+            self.options = options
+
+        def download(self, urls: list):
+            for url in urls:
+                audio.download(url, self.options["outtmpl"])
+            return 0
+
+    class Module:
+        pass
+
+    module = Module()
+    module.YoutubeDL = YoutubeDL
+    return module
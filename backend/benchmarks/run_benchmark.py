@@ -0,0 +1,317 @@
+"""
+Offline end-to-end benchmark of ``process_single`` and ``worker.process_next_job``.
+
+Spotify, Last.fm and ReccoBeats are replaced by local stub servers (see stubs.py) with
+configurable latency and 429 injection, and yt-dlp by a source of synthetic audio files
+(fake_ytdlp.py); ffmpeg, ffprobe and librosa run for real. The worker part needs a local
+Postgres in BENCHMARK_DATABASE_URL: it is migrated and its seeding tables are TRUNCATED,
+so never point it at a database you care about. Without it only ``process_single`` runs.
+
+Results (per-stage and end-to-end latency, jobs/minute) are written as JSON to
+benchmarks/results/ and can be compared with an earlier run via ``--compare``.
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import subprocess
+from pathlib import Path
+from datetime import datetime, timezone
+
+BENCHMARK_PATH = Path(__file__).resolve().parent
+BACKEND_PATH = BENCHMARK_PATH.parent
+RESULTS_DIR = BENCHMARK_PATH / "results"
+RESULTS_VERSION = 1
+
+SERVICE_LATENCY_MS = {"spotify": 30, "lastfm": 60, "reccobeats": 250} # Mean response times of the real APIs, roughly
+SERVICE_RATE_LIMIT = {"spotify": 0.0, "lastfm": 0.0, "reccobeats": 0.02} # Fraction of requests answered with 429
+JITTER_MS = 20           # Extra random latency per request, up to this much
+SEARCHES = 5             # process_single runs (each a new, uncatalogued track)
+JOBS = 20                # Worker jobs processed
+SEARCH_FIRST_TRACK = 50_000 # Synthetic track numbers used by the process_single runs, far from the worker's
+
+def parse_overrides(values: list, defaults: dict, cast) -> dict:
+    """Apply ``name=value`` overrides (e.g. ``reccobeats=400``) to a per-service dict."""
+    result = dict(defaults)
+    for value in values or []:
+        name, _, amount = value.partition("=")
+        if name not in result:
+            raise SystemExit(f"Unknown service {name!r}; expected one of {', '.join(result)}")
+        result[name] = cast(amount)
+    return result
+
+def summarize(values: list) -> dict:
+    """count/mean/p50/p95/max of a list of milliseconds."""
+    values = sorted(v for v in values if v is not None)
+    if not values:
+        return {"count": 0}
+
+    def percentile(fraction):
+        position = (len(values) - 1) * fraction
+        low = int(position)
+        high = min(low + 1, len(values) - 1)
+        return values[low] + (values[high] - values[low]) * (position - low)
+
+    return {
+        "count": len(values),
+        "mean": round(sum(values) / len(values), 1),
+        "p50": round(percentile(0.50), 1),
+        "p95": round(percentile(0.95), 1),
+        "max": round(values[-1], 1),
+    }
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=BACKEND_PATH, text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+def start_stand_ins(args, workdir: Path):
+    """Start the stub servers and point the service modules at them; returns ``(world, stubs)``."""
+    from stubs import SyntheticCatalogue, StubService, spotify_routes, lastfm_routes, reccobeats_routes
+    from fake_ytdlp import SyntheticAudio, fake_module
+
+    world = SyntheticCatalogue()
+    routes = {
+        "spotify": spotify_routes(world),
+        "lastfm": lastfm_routes(world),
+        "reccobeats": reccobeats_routes(world, args.seed),
+    }
+    stubs = {
+        name: StubService(name, route, args.latency[name], args.jitter_ms, args.rate_limit[name], args.seed)
+        for name, route in routes.items()
+    }
+    for stub in stubs.values():
+        stub.start()
+
+    # Imported only now: the modules read their cache and temp locations from the environment on import
+    import services.spotify as spotify
+    import services.lastfm as lastfm
+
+    spotify.RECCOBEATS_API = f"{stubs['reccobeats'].url}/v1/analysis/audio-features"
+    spotify.sp.client.prefix = f"{stubs['spotify'].url}/v1/"
+    spotify.sp.client.auth_manager.OAUTH_TOKEN_URL = f"{stubs['spotify'].url}/api/token"
+    lastfm.BASE_URL = f"{stubs['lastfm'].url}/2.0/"
+
+    audio = SyntheticAudio(str(workdir / "audio"), world, args.audio_seconds, args.download_latency_ms / 1000)
+    spotify.yt_dlp = fake_module(audio)
+    return world, stubs
+
+def bench_process_single(world, numbers: list) -> dict:
+    """Run ``/search``'s pipeline for the given synthetic tracks and summarize its stage timings."""
+    from main import process_single, TEMP_DIR
+
+    totals, errors, provenance = [], [], {}
+    stages = {"download": [], "trim": [], "analyze": [], "tag": []}
+    for idx, n in enumerate(numbers):
+        timings = {}
+        started = time.perf_counter()
+        try:
+            result = process_single(world.title(n), world.artist_name(n % world.artists), idx=idx, timings=timings)
+            totals.append((time.perf_counter() - started) * 1000)
+            provenance[result["provenance"]] = provenance.get(result["provenance"], 0) + 1
+            for stage in stages:
+                if stage in timings:
+                    stages[stage].append(timings[stage] * 1000)
+        except Exception as e:
+            errors.append(str(e))
+        finally:
+            shutil.rmtree(TEMP_DIR, ignore_errors=True)
+
+    return {
+        "runs": len(numbers),
+        "errors": len(errors),
+        "error_samples": errors[:3],
+        "provenance": provenance,
+        "total_ms": summarize(totals),
+        "stages_ms": {stage: summarize(values) for stage, values in stages.items()},
+    }
+
+def prepare_database(database_url: str):
+    """Migrate the benchmark database (``DATABASE_URL`` is set to it by ``main``) and empty its seeding tables."""
+    from alembic import command
+    from alembic.config import Config
+    from sqlalchemy import create_engine, text
+
+    config = Config(str(BACKEND_PATH / "alembic.ini"))
+    config.set_main_option("script_location", str(BACKEND_PATH / "migrations"))
+    command.upgrade(config, "head")
+
+    engine = create_engine(database_url)
+    with engine.begin() as db:
+        db.execute(text("TRUNCATE populate_queue, song_tags, christian_songs, tags, rejected_tracks, job_metrics RESTART IDENTITY"))
+    engine.dispose()
+
+def bench_worker(world, database_url: str, jobs: int) -> tuple:
+    """
+    Enqueue ``jobs`` manual seeds and process that many jobs with the single-job worker.
+    Stage timings come from the worker's own job_metrics rows. Returns ``(summary, processed track ids)``.
+    """
+    from sqlalchemy import create_engine, text
+    import worker
+    from db_helpers import bulk_enqueue
+    from metrics import STAGES, flush_metrics
+
+    engine = create_engine(database_url)
+    with engine.begin() as db:
+        bulk_enqueue(db, [world.track_id(n) for n in range(1, jobs + 1)], "manual_benchmark")
+
+    worker.load_rejections(engine)
+    worker.warm_tag_cache(engine)
+    worker.load_frontier(engine)
+
+    processed = 0
+    started = time.perf_counter()
+    while processed < jobs and worker.process_next_job(engine):
+        processed += 1
+    wall = time.perf_counter() - started
+    flush_metrics(engine, worker.METRICS)
+
+    with engine.connect() as db:
+        rows = db.execute(text(f"""
+            SELECT outcome, total_ms, {", ".join(f"{stage}_ms" for stage in STAGES)}
+            FROM job_metrics
+            WHERE worker_id = :worker_id
+        """), {"worker_id": worker.WORKER_ID}).fetchall()
+        pending = db.execute(text("SELECT COUNT(*) FROM populate_queue WHERE status = 'pending'")).scalar()
+        songs = [row.track_id for row in db.execute(text("SELECT track_id FROM christian_songs ORDER BY track_id"))]
+    engine.dispose()
+
+    outcomes = {}
+    for row in rows:
+        outcomes[row.outcome] = outcomes.get(row.outcome, 0) + 1
+    done = [row for row in rows if row.outcome == "done"]
+    return {
+        "jobs": processed,
+        "wall_seconds": round(wall, 2),
+        "jobs_per_minute": round(processed / wall * 60, 2) if wall else None,
+        "songs_per_minute": round(len(done) / wall * 60, 2) if wall else None,
+        "outcomes": outcomes,
+        "pending_after": pending,
+        "total_ms": summarize([row.total_ms for row in done]),
+        "stages_ms": {stage: summarize([getattr(row, f"{stage}_ms") for row in done]) for stage in STAGES},
+    }, songs
+
+def compare(previous: dict, current: dict, max_regression: float = None) -> int:
+    """Print p50 changes against an earlier result; returns 1 if any grew past ``max_regression`` (a fraction)."""
+    print(f"\nCompared with {previous.get('commit', 'unknown')[:8]} ({previous.get('created_at')}):")
+    regressions = 0
+    for section in ("process_single", "process_single_catalogue", "worker"):
+        old, new = previous.get(section) or {}, current.get(section) or {}
+        metrics = [("total", old.get("total_ms", {}), new.get("total_ms", {}))]
+        metrics += [(stage, (old.get("stages_ms") or {}).get(stage, {}), value)
+                    for stage, value in (new.get("stages_ms") or {}).items()]
+        for name, before, after in metrics:
+            if not before.get("p50") or "p50" not in after:
+                continue
+            change = after["p50"] / before["p50"] - 1
+            flag = ""
+            if max_regression is not None and change > max_regression:
+                flag = "  <-- regression"
+                regressions += 1
+            print(f"  {section:26} {name:10} p50 {before['p50']:>9.1f} -> {after['p50']:>9.1f} ms ({change:+.0%}){flag}")
+        if old.get("jobs_per_minute") and new.get("jobs_per_minute"):
+            print(f"  {section:26} jobs/min   {old['jobs_per_minute']:>13.2f} -> {new['jobs_per_minute']:>9.2f}")
+    return 1 if regressions else 0
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Offline end-to-end benchmark with local stand-in services")
+    parser.add_argument("--searches", type=int, default=SEARCHES, help="process_single runs")
+    parser.add_argument("--jobs", type=int, default=JOBS, help="Worker jobs (needs BENCHMARK_DATABASE_URL)")
+    parser.add_argument("--database-url", default=os.getenv("BENCHMARK_DATABASE_URL"),
+                        help="Disposable Postgres for the worker run; its seeding tables are truncated")
+    parser.add_argument("--latency", action="append", metavar="SERVICE=MS", help="Mean stub latency, e.g. reccobeats=400")
+    parser.add_argument("--rate-limit", action="append", metavar="SERVICE=FRACTION", help="Share of requests answered with 429")
+    parser.add_argument("--jitter-ms", type=float, default=JITTER_MS)
+    parser.add_argument("--download-latency-ms", type=float, default=0.0, help="Simulated audio download time")
+    parser.add_argument("--audio-seconds", type=float, default=180, help="Length of the synthetic tracks")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Result file (default: benchmarks/results/<time>-<commit>.json)")
+    parser.add_argument("--compare", help="Earlier result file to compare against")
+    parser.add_argument("--max-regression", type=float, help="Exit 1 if a p50 grew by more than this fraction")
+    args = parser.parse_args()
+    args.latency = parse_overrides(args.latency, SERVICE_LATENCY_MS, float)
+    args.rate_limit = parse_overrides(args.rate_limit, SERVICE_RATE_LIMIT, float)
+
+    missing = [tool for tool in ("ffmpeg", "ffprobe") if shutil.which(tool) is None]
+    if missing:
+        print(f"{', '.join(missing)} not found on PATH; the audio pipeline cannot run.")
+        return 1
+
+    workdir = Path(tempfile.mkdtemp(prefix="worshipify-bench-"))
+    # Cold caches and private temp files, no real credentials, and no DB unless one was given
+    os.environ.update({
+        "WORSHIPIFY_CACHE_DIR": str(workdir / "cache"),
+        "WORSHIPIFY_TEMP_DIR": str(workdir / "temp"),
+        "SPOTIFY_CLIENT_ID": "benchmark",
+        "SPOTIFY_CLIENT_SECRET": "benchmark",
+        "LASTFM_API_KEY": "benchmark",
+        "DATABASE_URL": args.database_url or "",
+    })
+    sys.path.insert(0, str(BACKEND_PATH))
+    sys.path.insert(0, str(BACKEND_PATH / "seeding"))
+    sys.path.insert(0, str(BENCHMARK_PATH))
+
+    created_at = datetime.now(timezone.utc)
+    results = {
+        "version": RESULTS_VERSION,
+        "commit": git_commit(),
+        "created_at": created_at.isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {
+            "searches": args.searches,
+            "jobs": args.jobs,
+            "latency_ms": args.latency,
+            "rate_limit": args.rate_limit,
+            "jitter_ms": args.jitter_ms,
+            "download_latency_ms": args.download_latency_ms,
+            "audio_seconds": args.audio_seconds,
+            "seed": args.seed,
+        },
+    }
+
+    stubs = {}
+    try:
+        world, stubs = start_stand_ins(args, workdir)
+        if args.database_url:
+            prepare_database(args.database_url)
+
+        print(f"Running process_single {args.searches} times...")
+        results["process_single"] = bench_process_single(world, range(SEARCH_FIRST_TRACK, SEARCH_FIRST_TRACK + args.searches))
+
+        if args.database_url:
+            print(f"Running the worker for {args.jobs} jobs...")
+            results["worker"], songs = bench_worker(world, args.database_url, args.jobs)
+            if songs and args.searches:
+                # The worker's songs are catalogued now, so these requests take the DB fast path
+                print("Running process_single for catalogued songs...")
+                numbers = [world.index_of(track_id) for track_id in songs[:args.searches]]
+                results["process_single_catalogue"] = bench_process_single(world, numbers)
+        else:
+            print("BENCHMARK_DATABASE_URL is not set, skipping the worker benchmark.")
+    finally:
+        results["stubs"] = {name: dict(stub.stats) for name, stub in stubs.items()}
+        for stub in stubs.values():
+            stub.stop()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    output = Path(args.output) if args.output else RESULTS_DIR / f"{created_at:%Y%m%dT%H%M%S}-{results['commit'][:8]}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2))
+    print(json.dumps({key: results[key] for key in ("process_single", "process_single_catalogue", "worker") if key in results}, indent=2))
+    print(f"\nResults written to {output}")
+
+    if args.compare:
+        return compare(json.loads(Path(args.compare).read_text()), results, args.max_regression)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
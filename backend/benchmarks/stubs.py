@@ -0,0 +1,252 @@
+"""
+Local stand-ins for Spotify, Last.fm and ReccoBeats, serving a deterministic synthetic catalogue
+"""
+
+import re
+import json
+import time
+import random
+import threading
+from typing import Callable, Dict, Optional, Tuple
+from urllib.parse import urlparse, parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+WORLD_SIZE = 100_000   # Tracks in the synthetic catalogue
+WORLD_ARTISTS = 5_000  # Track n is by artist n % WORLD_ARTISTS
+SECULAR_EVERY = 10     # Every n-th track gets secular tags (exercises rejections); 0 disables
+
+CHRISTIAN_TAGS = ["christian", "worship", "ccm", "christian rock", "gospel", "praise"]
+SECULAR_TAGS = ["rock", "pop", "indie", "alternative", "dance", "electronic"]
+
+# route(method, path, query, body) -> (status, payload)
+Route = Callable[[str, str, Dict[str, str], bytes], Tuple[int, dict]]
+
+class SyntheticCatalogue:
+    """Tracks, artists, tags and similarity derived from the track number alone, so every run sees the same world."""
+
+    def __init__(self, size: int = WORLD_SIZE, artists: int = WORLD_ARTISTS, secular_every: int = SECULAR_EVERY):
+        self.size = size
+        self.artists = artists
+        self.secular_every = secular_every
+
+    @staticmethod
+    def track_id(n: int) -> str:
+        return f"bench{n:017d}" # 22 characters, like a Spotify id
+
+    @staticmethod
+    def artist_id(m: int) -> str:
+        return f"artist{m:016d}"
+
+    @staticmethod
+    def index_of(spotify_id: str, prefix: str = "bench") -> Optional[int]:
+        if spotify_id.startswith(prefix) and spotify_id[len(prefix):].isdigit():
+            return int(spotify_id[len(prefix):])
+        return None
+
+    def title(self, n: int) -> str:
+        return f"Song {n}"
+
+    def artist_name(self, m: int) -> str:
+        return f"Artist {m}"
+
+    def tempo(self, n: int) -> float:
+        return 70.0 + (n * 37) % 90
+
+    def is_secular(self, n: int) -> bool:
+        return bool(self.secular_every) and n % self.secular_every == 0
+
+    def track(self, n: int) -> dict:
+        m = n % self.artists
+        return {
+            "id": self.track_id(n),
+            "name": self.title(n),
+            "artists": [{"id": self.artist_id(m), "name": self.artist_name(m)}],
+            "album": {"name": f"Album {n // 10}", "images": []},
+            "external_urls": {"spotify": f"https://open.spotify.com/track/{self.track_id(n)}"},
+            "external_ids": {"isrc": f"BENCH{n:07d}"},
+            "preview_url": None,
+            "duration_ms": 180_000,
+            "popularity": 50,
+        }
+
+    def tags(self, n: int) -> list:
+        names = SECULAR_TAGS if self.is_secular(n) else CHRISTIAN_TAGS
+        return [{"name": name, "count": 100 - 10 * rank, "url": ""} for rank, name in enumerate(names)]
+
+    def similar(self, n: int, limit: int) -> list:
+        return [(n * 7 + k * 13) % self.size or 1 for k in range(1, limit + 1)]
+
+    def top_tracks(self, m: int, limit: int = 10) -> list:
+        return [self.track(n) for n in range(m, self.size, self.artists) if n][:limit]
+
+def _number(pattern: str, value: str) -> Optional[int]:
+    match = re.search(pattern, value or "")
+    return int(match.group(1)) if match else None
+
+def spotify_routes(world: SyntheticCatalogue) -> Route:
+    """Token, track(s), search, artist and top-tracks endpoints used through spotipy."""
+
+    def route(method, path, query, body):
+        if path == "/api/token":
+            return 200, {"access_token": "benchmark", "token_type": "Bearer", "expires_in": 3600}
+        if path == "/v1/tracks":
+            ids = query.get("ids", "").split(",")
+            return 200, {"tracks": [world.track(n) if (n := world.index_of(i)) is not None else None for i in ids]}
+        if path.startswith("/v1/tracks/"):
+            n = world.index_of(path.rsplit("/", 1)[1])
+            return (200, world.track(n)) if n is not None else (404, {"error": {"status": 404, "message": "Not found"}})
+        if path == "/v1/search":
+            q = query.get("q", "")
+            if query.get("type") == "artist":
+                m = _number(r'artist:"Artist (\d+)"', q)
+                items = [{"id": world.artist_id(m), "name": world.artist_name(m), "genres": []}] if m is not None else []
+                return 200, {"artists": {"items": items}}
+            n = _number(r'track:"Song (\d+)"', q)
+            return 200, {"tracks": {"items": [world.track(n)] if n is not None else []}}
+        if path.startswith("/v1/artists/"):
+            parts = path.split("/")
+            m = world.index_of(parts[3], "artist")
+            if m is None:
+                return 404, {"error": {"status": 404, "message": "Not found"}}
+            if path.endswith("/top-tracks"):
+                return 200, {"tracks": world.top_tracks(m)}
+            return 200, {"id": world.artist_id(m), "name": world.artist_name(m), "genres": ["worship", "ccm"]}
+        return 404, {"error": {"status": 404, "message": f"No stub for {path}"}}
+
+    return route
+
+def lastfm_routes(world: SyntheticCatalogue) -> Route:
+    """The Last.fm methods used for tagging and recommendations."""
+
+    def route(method, path, query, body):
+        api_method = query.get("method", "").lower()
+        n = _number(r"Song (\d+)", query.get("track", ""))
+        m = _number(r"Artist (\d+)", query.get("artist", ""))
+        limit = int(query.get("limit", 10))
+
+        if api_method in ("track.gettoptags", "track.gettags"):
+            return 200, {"toptags": {"tag": world.tags(n) if n is not None else []}}
+        if api_method == "album.gettoptags":
+            return 200, {"toptags": {"tag": []}}
+        if api_method == "artist.gettoptags":
+            return 200, {"toptags": {"tag": world.tags(m) if m is not None else []}}
+        if api_method == "track.getsimilar":
+            tracks = [
+                {"name": world.title(s), "artist": {"name": world.artist_name(s % world.artists)}}
+                for s in (world.similar(n, limit) if n is not None else [])
+            ]
+            return 200, {"similartracks": {"track": tracks}}
+        if api_method == "artist.getsimilar":
+            artists = [{"name": world.artist_name((m * 3 + k) % world.artists)} for k in range(1, limit + 1)] if m is not None else []
+            return 200, {"similarartists": {"artist": artists}}
+        return 200, {"error": 3, "message": "Invalid Method"}
+
+    return route
+
+def reccobeats_routes(world: SyntheticCatalogue, seed: int = 0) -> Route:
+    """Audio-feature analysis of an uploaded clip; values are random but plausible."""
+    rng = random.Random(seed)
+    lock = threading.Lock()
+
+    def route(method, path, query, body):
+        if method != "POST" or path != "/v1/analysis/audio-features":
+            return 404, {"error": f"No stub for {method} {path}"}
+        with lock:
+            features = {
+                "acousticness": rng.uniform(0.0, 0.6),
+                "danceability": rng.uniform(0.3, 0.8),
+                "energy": rng.uniform(0.3, 0.9),
+                "valence": rng.uniform(0.2, 0.8),
+                "instrumentalness": rng.uniform(0.0, 0.1),
+                "speechiness": rng.uniform(0.02, 0.1),
+                "liveness": rng.uniform(0.05, 0.3),
+                "loudness": rng.uniform(-12.0, -4.0),
+                "tempo": rng.uniform(70.0, 160.0),
+            }
+        return 200, features
+
+    return route
+
+class StubService:
+    """
+    One stand-in API on 127.0.0.1 with injected latency and HTTP 429s.
+    ``latency_ms`` (plus up to ``jitter_ms``) is slept before every response; a ``rate_limit``
+    fraction of requests is answered with 429 and ``Retry-After: 0`` instead.
+    """
+
+    def __init__(self, name: str, route: Route, latency_ms: float = 0.0, jitter_ms: float = 0.0,
+                 rate_limit: float = 0.0, seed: int = 0):
+        self.name = name
+        self.route = route
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.rate_limit = rate_limit
+        self.stats = {"requests": 0, "rate_limited": 0}
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = None
+
+    def _draw(self) -> Tuple[float, bool]:
+        with self._lock:
+            self.stats["requests"] += 1
+            delay = (self.latency_ms + self._rng.uniform(0, self.jitter_ms)) / 1000
+            limited = self._rng.random() < self.rate_limit
+            if limited:
+                self.stats["rate_limited"] += 1
+            return delay, limited
+
+    def _handler(self):
+        service = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1" # Keep-alive, like the real APIs
+
+            def _respond(self, method: str):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length) if length else b""
+                delay, limited = service._draw()
+                time.sleep(delay)
+
+                if limited:
+                    status, payload = 429, {"error": 29, "message": "Rate limit exceeded"}
+                else:
+                    url = urlparse(self.path)
+                    query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+                    status, payload = service.route(method, url.path, query, body)
+
+                data = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                if status == 429:
+                    self.send_header("Retry-After", "0")
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                self._respond("GET")
+
+            def do_POST(self):
+                self._respond("POST")
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self) -> str:
+        """Start serving on a free port; returns the base URL."""
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name=f"stub-{self.name}", daemon=True).start()
+        return self.url
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
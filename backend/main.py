@@ -4,13 +4,15 @@ Contains FastAPI methods and references to external functions
 '''
 
 import os
+import time
 import concurrent.futures
 from fastapi import FastAPI
-from typing import Optional, Dict
+from typing import Optional, Dict, Tuple
 from services.spotify import *
 from services.lastfm import *
+from services.catalogue import catalogue
 
-TEMP_DIR = "temp"
+TEMP_DIR = os.getenv("WORSHIPIFY_TEMP_DIR", "temp")
 TEMP_BASE_FILENAME = "audio"
 
 app = FastAPI()
@@ -20,29 +22,56 @@ def home():
     """Health check endpoint returning a basic running message."""
     return {"message": "Worshipify Backend is Running!"}
 
-def process_single(song: str, artist: str, idx: int) -> Dict:
-    """Process a single song through search, download and tagging pipeline."""
-    details = search_song(song, artist)
+def process_single(song: str, artist: str, idx: int, details: Optional[Dict] = None, tags: Optional[Tuple] = None,
+                   timings: Optional[Dict[str, float]] = None, use_catalogue: bool = True) -> Dict:
+    """
+    Process a single song through search, download and tagging pipeline.
+    Callers that already resolved the track can pass its ``details`` (a ``search_song`` result)
+    and ``tags`` (a ``get_tags_for_song`` result); the matching stages are then skipped.
+    Songs whose ISRC is already in christian_songs are answered from the DB (``provenance`` "catalogue")
+    unless ``use_catalogue`` is False; the seeder and re-indexer always run the pipeline.
+    If ``timings`` is given, per-stage durations in seconds are added to it.
+    """
+    if details is None:
+        details = search_song(song, artist)
     if details is None or "error" in details:
         err_msg = details.get("error", f"Could not find song: {song} by {artist}") if details else f"Could not find song: {song} by {artist}"
         raise ValueError(err_msg)
+
+    stored = catalogue.get(details.get("isrc")) if use_catalogue else None
+    if stored is not None:
+        return {
+            "secular_song_info": details,
+            "audio_features": {"raw": [], "average": vector_to_features(stored["audio_features"]), "segments": []},
+            "tags": tags if tags is not None else (stored["tags"], stored["tags_method"]),
+            "provenance": "catalogue",
+        }
+
     base_no_ext = os.path.join(TEMP_DIR, f"{TEMP_BASE_FILENAME}_{idx}")
 
     with concurrent.futures.ThreadPoolExecutor() as executor:
-        tags_future = executor.submit(get_tags_for_song, details["title"], details["artist"])
+        tags_future = executor.submit(get_tags_for_song, details["title"], details["artist"]) if tags is None else None
 
-        paths = download_audio(details["yt_url"], base_no_ext)
+        paths = download_audio(details["yt_url"], base_no_ext, timings)
 
+        started = time.perf_counter()
         raw_feature_dicts = extract_features(paths)
         segments = [normalize_features(feats) for feats in raw_feature_dicts]
         avg = merge_segments(segments)
 
-        tags = tags_future.result()
+        if timings is not None:
+            timings["analyze"] = timings.get("analyze", 0.0) + time.perf_counter() - started
+        if tags_future is not None:
+            started = time.perf_counter()
+            tags = tags_future.result()
+            if timings is not None:
+                timings["tag"] = timings.get("tag", 0.0) + time.perf_counter() - started
 
     return {
         "secular_song_info": details,
         "audio_features": {"raw": raw_feature_dicts, "average": avg, "segments": segments},
         "tags": tags,
+        "provenance": "pipeline",
     }
 
 @app.get("/search") # Visit http://127.0.0.1:8000/search?song_name=your_secular_song_name&artist_name=songs_artist_name (artist optional)
@@ -0,0 +1,32 @@
+"""
+Alembic environment: migrations are hand-written SQL, so there is no model metadata
+"""
+
+import sys
+from pathlib import Path
+
+backend_path = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_path / "seeding"))
+
+from alembic import context
+from sqlalchemy import create_engine, pool
+from db_helpers import get_database_url
+
+def run_migrations_offline():
+    """Emit the migration SQL to stdout (``alembic upgrade head --sql``)."""
+    context.configure(url=get_database_url(), literal_binds=True)
+    with context.begin_transaction():
+        context.run_migrations()
+
+def run_migrations_online():
+    """Apply migrations against ``DATABASE_URL``."""
+    engine = create_engine(get_database_url(), poolclass=pool.NullPool)
+    with engine.connect() as connection:
+        context.configure(connection=connection)
+        with context.begin_transaction():
+            context.run_migrations()
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
@@ -0,0 +1,115 @@
+"""
+Initial schema: queue, catalogue and tag tables with their hot-path indexes
+
+Every statement is idempotent so the migration can also be applied to a database
+that was created by hand before migrations existed; missing columns and indexes are added.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-19
+"""
+
+from alembic import op
+from db_helpers import QUEUE_CHANNEL
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    # Seeding queue
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS populate_queue (
+            id BIGSERIAL PRIMARY KEY,
+            spotify_track_id TEXT NOT NULL,
+            source TEXT NOT NULL,
+            enqueued_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+            status TEXT NOT NULL DEFAULT 'pending',
+            attempt_count INTEGER NOT NULL DEFAULT 0,
+            last_attempt_at TIMESTAMPTZ,
+            last_error TEXT,
+            seed_depth INTEGER NOT NULL DEFAULT 0,
+            seed_parent_spotify_id TEXT,
+            seed_batch_id TEXT
+        )
+    """)
+    op.execute("""
+        ALTER TABLE populate_queue
+            ADD COLUMN IF NOT EXISTS lease_owner TEXT,
+            ADD COLUMN IF NOT EXISTS lease_expires_at TIMESTAMPTZ,
+            ADD COLUMN IF NOT EXISTS priority SMALLINT NOT NULL DEFAULT 1,
+            ADD COLUMN IF NOT EXISTS scheduled_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+    """)
+
+    # ON CONFLICT (spotify_track_id) and the enqueue_similar_tracks membership check
+    op.execute("CREATE UNIQUE INDEX IF NOT EXISTS populate_queue_spotify_track_id ON populate_queue (spotify_track_id)")
+    # Claim path: pending jobs in order, so the claim is an index scan however large the done/failed history gets
+    # (replaced by populate_queue_pending_tier in 0007)
+    op.execute("CREATE INDEX IF NOT EXISTS populate_queue_pending_schedule ON populate_queue (scheduled_at, id) WHERE status = 'pending'")
+    # Lease reaper (expired leases) and heartbeat/release (leases by owner)
+    op.execute("CREATE INDEX IF NOT EXISTS populate_queue_processing_lease ON populate_queue (lease_expires_at) WHERE status = 'processing'")
+    op.execute("CREATE INDEX IF NOT EXISTS populate_queue_lease_owner ON populate_queue (lease_owner) WHERE lease_owner IS NOT NULL")
+
+    # Wake LISTENing async workers on every insert (one notification per statement)
+    op.execute(f"""
+        CREATE OR REPLACE FUNCTION notify_populate_queue_new() RETURNS trigger AS $$
+        BEGIN
+            PERFORM pg_notify('{QUEUE_CHANNEL}', '');
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("DROP TRIGGER IF EXISTS populate_queue_notify_insert ON populate_queue")
+    op.execute("""
+        CREATE TRIGGER populate_queue_notify_insert
+            AFTER INSERT ON populate_queue
+            FOR EACH STATEMENT EXECUTE FUNCTION notify_populate_queue_new()
+    """)
+
+    # Catalogue
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS christian_songs (
+            track_id TEXT PRIMARY KEY,
+            isrc TEXT NOT NULL,
+            title TEXT NOT NULL,
+            artist TEXT NOT NULL,
+            album TEXT,
+            tag_count INTEGER NOT NULL DEFAULT 0,
+            tags_method TEXT[],
+            audio_features DOUBLE PRECISION[] NOT NULL,
+            weighted_features DOUBLE PRECISION[] NOT NULL,
+            num_indexes INTEGER NOT NULL DEFAULT 0,
+            last_indexed TIMESTAMPTZ
+        )
+    """)
+    # check_song_exists and the enqueue ISRC filter
+    op.execute("CREATE UNIQUE INDEX IF NOT EXISTS christian_songs_isrc ON christian_songs (isrc)")
+
+    # Normalized tags
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS tags (
+            id SERIAL PRIMARY KEY,
+            name TEXT NOT NULL
+        )
+    """)
+    # ON CONFLICT (name) and the name -> id lookup
+    op.execute("CREATE UNIQUE INDEX IF NOT EXISTS tags_name ON tags (name)")
+
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS song_tags (
+            track_id TEXT NOT NULL REFERENCES christian_songs (track_id) ON DELETE CASCADE,
+            tag_id INTEGER NOT NULL REFERENCES tags (id),
+            count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (track_id, tag_id)
+        )
+    """)
+    op.execute("CREATE INDEX IF NOT EXISTS song_tags_tag_id ON song_tags (tag_id)")
+
+def downgrade():
+    op.execute("DROP TABLE IF EXISTS song_tags")
+    op.execute("DROP TABLE IF EXISTS tags")
+    op.execute("DROP TABLE IF EXISTS christian_songs")
+    op.execute("DROP TRIGGER IF EXISTS populate_queue_notify_insert ON populate_queue")
+    op.execute("DROP FUNCTION IF EXISTS notify_populate_queue_new()")
+    op.execute("DROP TABLE IF EXISTS populate_queue")
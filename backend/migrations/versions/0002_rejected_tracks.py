@@ -0,0 +1,32 @@
+"""
+Remember rejected (non-Christian) tracks so the crawl never re-enqueues them
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-19
+"""
+
+from alembic import op
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS rejected_tracks (
+            spotify_track_id TEXT PRIMARY KEY,
+            isrc TEXT,
+            reason TEXT NOT NULL,
+            rejected_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+        )
+    """)
+    op.execute("CREATE INDEX IF NOT EXISTS rejected_tracks_isrc ON rejected_tracks (isrc) WHERE isrc IS NOT NULL")
+    # Incremental Bloom filter reload streams rows newer than the snapshot watermark
+    op.execute("CREATE INDEX IF NOT EXISTS rejected_tracks_rejected_at ON rejected_tracks (rejected_at)")
+    # No backfill from failed queue rows: their last_error was also used for tracks with no tags,
+    # so it cannot tell a real rejection from a transient Last.fm miss
+
+def downgrade():
+    op.execute("DROP TABLE IF EXISTS rejected_tracks")
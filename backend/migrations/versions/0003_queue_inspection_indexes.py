@@ -0,0 +1,24 @@
+"""
+Indexes for the manager's keyset-paginated queue view
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-19
+"""
+
+from alembic import op
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    # WHERE status = :status ORDER BY enqueued_at, id (any status, not only pending)
+    op.execute("CREATE INDEX IF NOT EXISTS populate_queue_status_enqueued ON populate_queue (status, enqueued_at, id)")
+    # Unfiltered pages
+    op.execute("CREATE INDEX IF NOT EXISTS populate_queue_enqueued ON populate_queue (enqueued_at, id)")
+
+def downgrade():
+    op.execute("DROP INDEX IF EXISTS populate_queue_enqueued")
+    op.execute("DROP INDEX IF EXISTS populate_queue_status_enqueued")
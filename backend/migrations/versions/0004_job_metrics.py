@@ -0,0 +1,41 @@
+"""
+Per-job outcome and stage timings written by the workers
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-19
+"""
+
+from alembic import op
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS job_metrics (
+            id BIGSERIAL PRIMARY KEY,
+            job_id BIGINT NOT NULL,
+            worker_id TEXT NOT NULL,
+            source TEXT,
+            seed_depth INTEGER,
+            outcome TEXT NOT NULL,
+            finished_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+            total_ms INTEGER,
+            classify_ms INTEGER,
+            download_ms INTEGER,
+            trim_ms INTEGER,
+            analyze_ms INTEGER,
+            tag_ms INTEGER,
+            recommend_ms INTEGER,
+            db_write_ms INTEGER,
+            enqueue_ms INTEGER
+        )
+    """)
+    # Reports always look at a recent window
+    op.execute("CREATE INDEX IF NOT EXISTS job_metrics_finished_at ON job_metrics (finished_at)")
+
+def downgrade():
+    op.execute("DROP TABLE IF EXISTS job_metrics")
@@ -0,0 +1,26 @@
+"""
+Queue artist column and the indexes behind the crawl frontier's per-artist caps
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-19
+"""
+
+from alembic import op
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    # Normalized artist of auto-seeded jobs (frontier.artist_key); NULL for manual and imported jobs
+    op.execute("ALTER TABLE populate_queue ADD COLUMN IF NOT EXISTS artist TEXT")
+    # ARTIST_COUNTS_SQL: queued jobs per artist and catalogued songs per artist
+    op.execute("CREATE INDEX IF NOT EXISTS populate_queue_active_artist ON populate_queue (artist) WHERE status IN ('pending', 'processing')")
+    op.execute("CREATE INDEX IF NOT EXISTS christian_songs_artist_lower ON christian_songs (lower(artist))")
+
+def downgrade():
+    op.execute("DROP INDEX IF EXISTS christian_songs_artist_lower")
+    op.execute("DROP INDEX IF EXISTS populate_queue_active_artist")
+    op.execute("ALTER TABLE populate_queue DROP COLUMN IF EXISTS artist")
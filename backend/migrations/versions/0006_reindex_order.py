@@ -0,0 +1,21 @@
+"""
+Index behind the re-indexer's stalest-first selection
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-19
+"""
+
+from alembic import op
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    # reindexer.STALEST_SONGS_SQL: never-indexed songs first, then oldest last_indexed, read in index order
+    op.execute("CREATE INDEX IF NOT EXISTS christian_songs_last_indexed ON christian_songs (last_indexed ASC NULLS FIRST, track_id)")
+
+def downgrade():
+    op.execute("DROP INDEX IF EXISTS christian_songs_last_indexed")
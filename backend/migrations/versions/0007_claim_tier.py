@@ -0,0 +1,27 @@
+"""
+Claim pending jobs by tier (manual before crawl), then by scheduled_at
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-19
+"""
+
+from alembic import op
+
+revision = "0007"
+down_revision = "0006"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    # scheduling.CLAIM_ORDER_SQL; the expression must match it for the claim to read the index in order
+    op.execute("""
+        CREATE INDEX IF NOT EXISTS populate_queue_pending_tier
+        ON populate_queue ((priority > 0), scheduled_at, id) WHERE status = 'pending'
+    """)
+    # Superseded: claims no longer order by scheduled_at alone
+    op.execute("DROP INDEX IF EXISTS populate_queue_pending_schedule")
+
+def downgrade():
+    op.execute("CREATE INDEX IF NOT EXISTS populate_queue_pending_schedule ON populate_queue (scheduled_at, id) WHERE status = 'pending'")
+    op.execute("DROP INDEX IF EXISTS populate_queue_pending_tier")
@@ -0,0 +1,22 @@
+"""
+Drop the unused populate_queue_pending_enqueued index
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-19
+"""
+
+from alembic import op
+
+revision = "0008"
+down_revision = "0007"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    # Claims read populate_queue_pending_tier and pending queue pages read populate_queue_status_enqueued,
+    # so this index was only extra write cost on every enqueue and status change
+    op.execute("DROP INDEX IF EXISTS populate_queue_pending_enqueued")
+
+def downgrade():
+    op.execute("CREATE INDEX IF NOT EXISTS populate_queue_pending_enqueued ON populate_queue (enqueued_at, id) WHERE status = 'pending'")
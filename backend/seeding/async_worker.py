@@ -0,0 +1,446 @@
+"""
+Asyncio seeding worker: asyncpg for queue and writes, LISTEN/NOTIFY instead of polling
+"""
+
+import re
+import sys
+import json
+from pathlib import Path
+
+backend_path = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_path))
+
+import signal
+import asyncio
+import argparse
+import asyncpg
+from db_helpers import QUEUE_CHANNEL, AsyncQuery, get_database_url, weight_features
+from scheduling import claim_key
+from rejections import REJECTIONS, REFRESH_INTERVAL, TrackRejected, rejection_suspects, REFRESH_SQL, INSERT_REJECTION_SQL, CONFIRM_REJECTED_SQL
+from tag_cache import TAG_CACHE, UPSERT_TAGS_SQL, LOAD_TAGS_SQL
+from metrics import INSERT_METRICS_SQL, start_job_timing, timed
+from frontier import FRONTIER, PENDING_BY_DEPTH_SQL, ARTIST_COUNTS_SQL, COVERAGE_SQL, artist_key
+from services.spotify import sp
+from worker import (
+    WORKER_ID, LEASE_SECONDS, HEARTBEAT_INTERVAL, REAP_INTERVAL, MAX_ATTEMPTS, LeaseLost,
+    CLAIM_JOBS_SQL, REAP_EXPIRED_SQL, SONG_EXISTS_SQL, KNOWN_ISRCS_SQL, QUEUED_IDS_SQL, COMPLETE_JOB_SQL,
+    FAIL_JOB_SQL, RENEW_LEASES_SQL, RELEASE_LEASES_SQL, INSERT_SONG_SQL, INSERT_SONG_TAGS_SQL, ENQUEUE_SIMILAR_SQL,
+    classify_job, analyze_song_audio, fetch_similar_tracks, cleanup_temp_dir, song_params, tag_counts, enqueue_params,
+    select_similar_tracks, similar_track_keys, METRICS,
+)
+
+IDLE_WAKEUP = 60        # Seconds an idle worker waits before re-checking without a notification
+ASYNC_CONCURRENCY = 4   # Jobs processed at once by one async worker
+
+# The sync worker's statements, converted once to asyncpg's positional parameters
+CLAIM_JOBS = AsyncQuery(CLAIM_JOBS_SQL)
+REAP_EXPIRED = AsyncQuery(REAP_EXPIRED_SQL)
+SONG_EXISTS = AsyncQuery(SONG_EXISTS_SQL)
+KNOWN_ISRCS = AsyncQuery(KNOWN_ISRCS_SQL)
+QUEUED_IDS = AsyncQuery(QUEUED_IDS_SQL)
+COMPLETE_JOB = AsyncQuery(COMPLETE_JOB_SQL)
+FAIL_JOB = AsyncQuery(FAIL_JOB_SQL)
+RENEW_LEASES = AsyncQuery(RENEW_LEASES_SQL)
+RELEASE_LEASES = AsyncQuery(RELEASE_LEASES_SQL)
+INSERT_SONG = AsyncQuery(INSERT_SONG_SQL)
+INSERT_SONG_TAGS = AsyncQuery(INSERT_SONG_TAGS_SQL)
+ENQUEUE_SIMILAR = AsyncQuery(ENQUEUE_SIMILAR_SQL)
+UPSERT_TAGS = AsyncQuery(UPSERT_TAGS_SQL)
+INSERT_METRICS = AsyncQuery(INSERT_METRICS_SQL)
+PENDING_BY_DEPTH = AsyncQuery(PENDING_BY_DEPTH_SQL)
+ARTIST_COUNTS = AsyncQuery(ARTIST_COUNTS_SQL)
+COVERAGE = AsyncQuery(COVERAGE_SQL)
+REFRESH_REJECTIONS = AsyncQuery(REFRESH_SQL)
+INSERT_REJECTION = AsyncQuery(INSERT_REJECTION_SQL)
+CONFIRM_REJECTED = AsyncQuery(CONFIRM_REJECTED_SQL)
+LOAD_TAGS = AsyncQuery(LOAD_TAGS_SQL)
+
+def asyncpg_dsn(db_url: str) -> str:
+    """Strip the SQLAlchemy driver suffix (``postgresql+psycopg2://``) so asyncpg accepts the URL."""
+    return re.sub(r"^postgres(?:ql)?(?:\+\w+)?://", "postgresql://", db_url)
+
+async def notify_trigger_exists(db) -> bool:
+    """Whether migration 0001's NOTIFY trigger is installed on populate_queue."""
+    return bool(await db.fetchval("""
+        SELECT 1 FROM pg_trigger
+        WHERE tgname = 'populate_queue_notify_insert'
+          AND tgrelid = 'populate_queue'::regclass
+    """))
+
+async def claim_jobs(db, lease_owner: str, limit: int) -> list:
+    """asyncpg version of ``worker.fetch_next_jobs``."""
+    rows = await db.fetch(CLAIM_JOBS.sql, *CLAIM_JOBS.args(
+        {"lease_owner": lease_owner, "lease_seconds": float(LEASE_SECONDS), "limit": limit}
+    ))
+
+    jobs = [start_job_timing(dict(row)) for row in rows]
+    for job in jobs:
+        job["seed_depth"] = job["seed_depth"] or 0
+    return sorted(jobs, key=claim_key)
+
+async def song_exists(db, isrc: str) -> bool:
+    return await db.fetchval(SONG_EXISTS.sql, *SONG_EXISTS.args({"isrc": isrc})) is not None
+
+async def complete_job(db, job: dict, lease_owner: str):
+    """Mark a job done; raises LeaseLost if the lease is no longer held."""
+    job_id = await db.fetchval(COMPLETE_JOB.sql, *COMPLETE_JOB.args({"id": job["id"], "lease_owner": lease_owner}))
+    if job_id is None:
+        raise LeaseLost(f"Lease on job {job['id']} was lost before completion")
+
+async def insert_christian_song(db, song_info: dict, isrc: str, tags: list, method: list, audio_features: dict):
+    """
+    asyncpg version of ``worker.insert_christian_song``.
+    Returns the tag ids created by this insert, to be cached once the transaction commits.
+    """
+    await db.execute(INSERT_SONG.sql, *INSERT_SONG.args(song_params(song_info, isrc, tags, method, audio_features)))
+    if not tags:
+        return {}
+
+    counts = tag_counts(tags)
+    tag_ids, missing = TAG_CACHE.lookup(counts)
+    new_tag_ids = {}
+    if missing:
+        new_tag_ids = {row["name"]: row["id"] for row in await db.fetch(UPSERT_TAGS.sql, *UPSERT_TAGS.args({"names": missing}))}
+        tag_ids.update(new_tag_ids)
+
+    await db.execute(INSERT_SONG_TAGS.sql, *INSERT_SONG_TAGS.args({
+        "track_id": song_info["track_id"],
+        "tag_ids": [tag_ids[name] for name in counts],
+        "counts": list(counts.values()),
+    }))
+    return new_tag_ids
+
+async def enqueue_similar_tracks(db, job: dict, recommended_tracks: list, weighted_features: list = None) -> int:
+    """asyncpg version of ``worker.enqueue_similar_tracks``, sharing its crawl frontier and candidate selection."""
+    isrcs, track_ids = similar_track_keys(recommended_tracks)
+    if not track_ids:
+        return 0
+
+    seed_depth = job.get("seed_depth", 0) + 1
+    if FRONTIER.budget_is_stale():
+        FRONTIER.update_budget({row["seed_depth"]: row["count"] for row in await db.fetch(PENDING_BY_DEPTH.sql)})
+    target_adds = FRONTIER.target_adds(seed_depth, weighted_features)
+    if target_adds == 0:
+        print(f"[async-worker] Crawl budget exhausted at depth {seed_depth}, not auto-seeding.")
+        return 0
+
+    artists = list({artist_key(track.get("artist")) for track in recommended_tracks if track.get("artist")})
+    artist_counts = {row["artist"]: (row["queued"], row["catalogued"])
+                     for row in await db.fetch(ARTIST_COUNTS.sql, *ARTIST_COUNTS.args({"artists": artists}))} if artists else {}
+    recommended_tracks = FRONTIER.rank(recommended_tracks, artist_counts)
+
+    known_isrcs = {row["isrc"] for row in await db.fetch(KNOWN_ISRCS.sql, *KNOWN_ISRCS.args({"isrcs": isrcs}))}
+    queued_ids = {row["spotify_track_id"] for row in await db.fetch(QUEUED_IDS.sql, *QUEUED_IDS.args({"track_ids": track_ids}))}
+
+    rejected = set()
+    suspect_ids, suspect_isrcs = rejection_suspects(recommended_tracks)
+    if suspect_ids:
+        for row in await db.fetch(CONFIRM_REJECTED.sql, *CONFIRM_REJECTED.args({"track_ids": suspect_ids, "isrcs": suspect_isrcs})):
+            rejected.update(value for value in (row["spotify_track_id"], row["isrc"]) if value)
+
+    selected, _ = select_similar_tracks(recommended_tracks, known_isrcs, queued_ids, target_adds, rejected)
+    if not selected:
+        return 0
+
+    rows = await db.fetch(ENQUEUE_SIMILAR.sql, *ENQUEUE_SIMILAR.args(enqueue_params(job, recommended_tracks, selected)))
+    return len(rows)
+
+async def refresh_rejections(pool) -> int:
+    """asyncpg version of ``RejectionFilter.refresh``: stream the rows rejected after the watermark."""
+    added = 0
+    batch = []
+    async with pool.acquire() as db:
+        async with db.transaction():
+            async for row in db.cursor(REFRESH_REJECTIONS.sql, *REFRESH_REJECTIONS.args({"watermark": REJECTIONS.watermark}),
+                                       prefetch=10_000):
+                batch.append(tuple(row))
+                if len(batch) >= 10_000:
+                    added += REJECTIONS.add_rows(batch)
+                    batch = []
+    return added + REJECTIONS.add_rows(batch)
+
+async def load_rejections(pool):
+    """asyncpg version of ``worker.load_rejections``: restore the Bloom snapshot and stream newer rows."""
+    try:
+        REJECTIONS.restore()
+        added = await refresh_rejections(pool)
+        REJECTIONS.loaded = True
+        if added:
+            REJECTIONS.save()
+        print(f"[async-worker] Loaded {REJECTIONS.bloom.count} rejected keys ({added} new since the last snapshot)")
+    except Exception as e:
+        print(f"[async-worker] Could not load rejected tracks (run the migrations?): {e}")
+
+async def load_frontier(pool):
+    """asyncpg version of ``worker.load_frontier``: load the catalogue's feature vectors for novelty scoring."""
+    try:
+        vectors = []
+        async with pool.acquire() as db:
+            async with db.transaction():
+                async for row in db.cursor(COVERAGE.sql, prefetch=10_000):
+                    vectors.append(row["weighted_features"])
+        FRONTIER.coverage.load(vectors)
+        print(f"[async-worker] Loaded {len(vectors)} feature vectors for the crawl frontier")
+    except Exception as e:
+        print(f"[async-worker] Could not load the crawl frontier coverage: {e}")
+
+async def fail_job(pool, job: dict, error: Exception, lease_owner: str):
+    """Record a job failure unless the job was abandoned because its lease was lost."""
+    if isinstance(error, LeaseLost):
+        print(f"[async-worker] Job {job['id']} abandoned: {error}")
+        return
+
+    try:
+        async with pool.acquire() as db:
+            async with db.transaction():
+                await db.execute(FAIL_JOB.sql, *FAIL_JOB.args({"id": job["id"], "error": str(error), "lease_owner": lease_owner}))
+                if isinstance(error, TrackRejected):
+                    await db.execute(INSERT_REJECTION.sql, *INSERT_REJECTION.args(
+                        {"track_id": error.track_id, "isrc": error.isrc, "reason": str(error)}
+                    ))
+                    REJECTIONS.add(error.track_id, error.isrc)
+    except Exception as fail_error:
+        print(f"[async-worker] Could not mark job as failed (its lease will expire): {fail_error}")
+
+    print(f"[async-worker] Job {job['id']} failed: {error}")
+
+class AsyncWorker:
+    """
+    Processes up to ``concurrency`` jobs at once on one event loop.
+    Blocking work (Last.fm/Spotify classification, yt-dlp and librosa) runs in threads via
+    ``asyncio.to_thread``; all queue and result SQL goes through an asyncpg pool.
+    When the queue is empty the worker sleeps on a LISTEN connection and wakes as soon as
+    anything is inserted into populate_queue, with a slow fallback check every ``IDLE_WAKEUP`` seconds.
+    """
+
+    def __init__(self, dsn: str, concurrency: int = ASYNC_CONCURRENCY, lease_owner: str = WORKER_ID):
+        self.dsn = dsn
+        self.concurrency = concurrency
+        self.lease_owner = lease_owner
+        self.pool = None
+        self.listener = None
+        self.wakeup = asyncio.Event()
+        self.stopping = asyncio.Event()
+        self.tasks = set()
+
+    def _on_notify(self, *_):
+        self.wakeup.set()
+
+    def _on_listener_closed(self, *_):
+        print("[async-worker] LISTEN connection lost, reconnecting on next wakeup")
+        self.wakeup.set()
+
+    async def _listen(self):
+        """(Re)open the dedicated LISTEN connection; pool connections cannot hold a LISTEN."""
+        if self.listener is not None and not self.listener.is_closed():
+            return
+        try:
+            self.listener = await asyncpg.connect(self.dsn)
+            self.listener.add_termination_listener(self._on_listener_closed)
+            await self.listener.add_listener(QUEUE_CHANNEL, self._on_notify)
+        except Exception as e:
+            self.listener = None
+            print(f"[async-worker] Could not LISTEN on {QUEUE_CHANNEL}, falling back to {IDLE_WAKEUP}s checks: {e}")
+
+    async def refresh_rejections(self):
+        """Pull rows rejected by sibling workers into this process's filter."""
+        await refresh_rejections(self.pool)
+
+    async def _every(self, seconds: float, action):
+        """Run ``action`` every ``seconds`` until stopping; failures are logged and retried next tick."""
+        while not self.stopping.is_set():
+            try:
+                await asyncio.wait_for(self.stopping.wait(), timeout=seconds)
+            except asyncio.TimeoutError:
+                pass
+            if self.stopping.is_set():
+                return
+            try:
+                await action()
+            except Exception as e:
+                print(f"[async-worker] {action.__name__} failed: {e}")
+
+    async def renew_leases(self):
+        await self.pool.execute(RENEW_LEASES.sql, *RENEW_LEASES.args(
+            {"lease_owner": self.lease_owner, "lease_seconds": float(LEASE_SECONDS)}
+        ))
+
+    async def reap_expired_leases(self):
+        """Requeue expired leases and wake listening workers, since reaped jobs are not INSERTs."""
+        rows = await self.pool.fetch(REAP_EXPIRED.sql, *REAP_EXPIRED.args({"max_attempts": MAX_ATTEMPTS}))
+        reaped = sum(1 for row in rows if row["status"] == "pending")
+        if reaped:
+            print(f"[async-worker] Reaped {reaped} jobs with expired leases.")
+            await self.pool.execute("SELECT pg_notify($1, '')", QUEUE_CHANNEL)
+
+    async def release_leases(self):
+        released = await self.pool.fetch(RELEASE_LEASES.sql, *RELEASE_LEASES.args({"lease_owner": self.lease_owner}))
+        if released:
+            await self.pool.execute("SELECT pg_notify($1, '')", QUEUE_CHANNEL)
+
+    async def process_job(self, job: dict):
+        """Classify, analyze and write one claimed job."""
+        print(f"[async-worker] Got job {job['id']} for track {job['spotify_track_id']} from source {job['source']}")
+        try:
+            song_info, isrc, tags, method = await asyncio.to_thread(classify_job, job)
+            if await song_exists(self.pool, isrc):
+                raise ValueError("Track already exists in the database")
+
+            # Audio analysis and recommendation lookups are independent; run them side by side
+            audio_features, recommended_tracks = await asyncio.gather(
+                asyncio.to_thread(analyze_song_audio, song_info, job, tags, method),
+                asyncio.to_thread(fetch_similar_tracks, job),
+            )
+
+            timings = job["timings"]
+            weighted_features = weight_features(audio_features)
+            with timed(timings, "db_write"):
+                async with self.pool.acquire() as db:
+                    async with db.transaction():
+                        await complete_job(db, job, self.lease_owner)
+                        new_tag_ids = await insert_christian_song(db, song_info, isrc, tags, method, audio_features)
+                        try:
+                            with timed(timings, "enqueue"):
+                                async with db.transaction(): # Savepoint: seeding never aborts the song write
+                                    added = await enqueue_similar_tracks(db, job, recommended_tracks, weighted_features)
+                            print(f"[async-worker] Auto-seeded {added} similar tracks at depth {job['seed_depth'] + 1}.")
+                        except Exception as error:
+                            print(f"[async-worker] Non-fatal error in enqueue_similar_tracks: {error}")
+            timings["db_write"] -= timings.get("enqueue", 0.0)
+            TAG_CACHE.remember(new_tag_ids)
+            FRONTIER.coverage.add(weighted_features)
+
+            print(f"[async-worker] Job {job['id']} completed successfully.")
+            await self.record_metrics(job, "done")
+        except Exception as error:
+            outcome = "lease_lost" if isinstance(error, LeaseLost) else "rejected" if isinstance(error, TrackRejected) else "failed"
+            await fail_job(self.pool, job, error, self.lease_owner)
+            await self.record_metrics(job, outcome)
+
+    async def record_metrics(self, job: dict, outcome: str):
+        """Buffer a finished job's timings and flush them to job_metrics when due."""
+        if METRICS.record(job, outcome):
+            await self.flush_metrics()
+
+    async def flush_metrics(self):
+        rows = METRICS.take()
+        if not rows:
+            return
+        try:
+            await self.pool.execute(INSERT_METRICS.sql, *INSERT_METRICS.args({"rows": json.dumps(rows)}))
+        except Exception as e:
+            METRICS.put_back(rows)
+            print(f"[async-worker] Could not write {len(rows)} job metrics, will retry: {e}")
+
+    async def _claim(self) -> int:
+        """Claim jobs for every free slot and start them; returns the number claimed."""
+        free = self.concurrency - len(self.tasks)
+        if free <= 0:
+            return 0
+        async with self.pool.acquire() as db:
+            jobs = await claim_jobs(db, self.lease_owner, free)
+        for job in jobs:
+            task = asyncio.create_task(self.process_job(job))
+            self.tasks.add(task)
+            task.add_done_callback(self.tasks.discard)
+        return len(jobs)
+
+    async def run(self):
+        self.pool = await asyncpg.create_pool(self.dsn, min_size=1, max_size=self.concurrency + 2)
+        async with self.pool.acquire() as db:
+            if not await notify_trigger_exists(db):
+                print(f"[async-worker] No NOTIFY trigger on populate_queue (run the migrations); new jobs are seen every {IDLE_WAKEUP}s")
+        await load_rejections(self.pool)
+        await load_frontier(self.pool)
+        try:
+            TAG_CACHE.remember({row["name"]: row["id"] for row in await self.pool.fetch(LOAD_TAGS.sql)})
+            print(f"[async-worker] Cached {len(TAG_CACHE)} tag ids")
+        except Exception as e:
+            print(f"[async-worker] Could not warm the tag cache: {e}")
+        await self._listen()
+
+        background = [
+            asyncio.create_task(self._every(HEARTBEAT_INTERVAL, self.renew_leases)),
+            asyncio.create_task(self._every(REAP_INTERVAL, self.reap_expired_leases)),
+            asyncio.create_task(self._every(REFRESH_INTERVAL, self.refresh_rejections)),
+        ]
+        await self.reap_expired_leases()
+
+        try:
+            while not self.stopping.is_set():
+                # Clear before claiming so a NOTIFY arriving mid-claim still wakes the next wait
+                self.wakeup.clear()
+                try:
+                    claimed = await self._claim()
+                except Exception as e:
+                    print(f"[async-worker] Database transaction error (connection drop?): {e}")
+                    await self._wait(5)
+                    continue
+
+                if claimed:
+                    continue
+                if self.tasks:
+                    # All slots busy or nothing new: wake on a finished job, a notification or stop
+                    await self._wait(IDLE_WAKEUP, *self.tasks)
+                else:
+                    await self._listen()
+                    await self._wait(IDLE_WAKEUP)
+
+            if self.tasks:
+                print(f"[async-worker] Draining {len(self.tasks)} in-flight jobs...")
+                await asyncio.gather(*self.tasks, return_exceptions=True)
+        finally:
+            for task in background:
+                task.cancel()
+            await self.flush_metrics()
+            try:
+                await self.release_leases()
+            except Exception as e:
+                print(f"[async-worker] Could not release leases on shutdown (they will expire): {e}")
+            if self.listener is not None and not self.listener.is_closed():
+                await self.listener.close()
+            await self.pool.close()
+
+    async def _wait(self, timeout: float, *tasks):
+        """Wait until a notification, a stop request, any of ``tasks`` finishing, or ``timeout``."""
+        waiters = [asyncio.create_task(self.wakeup.wait()), asyncio.create_task(self.stopping.wait())]
+        try:
+            await asyncio.wait([*waiters, *tasks], timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for waiter in waiters:
+                waiter.cancel()
+
+    def stop(self):
+        if not self.stopping.is_set():
+            print("[async-worker] Stop requested, finishing in-flight jobs...")
+        self.stopping.set()
+
+async def run_async_worker(concurrency: int = ASYNC_CONCURRENCY):
+    worker = AsyncWorker(asyncpg_dsn(get_database_url()), concurrency=concurrency)
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(signum, worker.stop)
+        except (NotImplementedError, AttributeError, ValueError):
+            pass # Windows: Ctrl+C surfaces as KeyboardInterrupt instead
+    await worker.run()
+
+def main():
+    """
+    Start the async worker from the command line.
+    """
+    parser = argparse.ArgumentParser(description="Worshipify asyncio seeding worker")
+    parser.add_argument("--concurrency", type=int, default=ASYNC_CONCURRENCY, help="Jobs processed at once")
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(run_async_worker(args.concurrency))
+    except KeyboardInterrupt:
+        print("\n[async-worker] Interrupted by user. Unfinished leases expire and are requeued.")
+    finally:
+        print(f"[async-worker] Spotify cache stats: {sp.stats.snapshot()}")
+        REJECTIONS.save()
+        cleanup_temp_dir()
+
+if __name__ == "__main__":
+    main()
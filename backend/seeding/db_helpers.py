@@ -3,13 +3,20 @@ Helper functions for database operations
 '''
 
 import os
+import re
 import math
 from pathlib import Path
 from pyexpat import features
 from dotenv import load_dotenv
 from sqlalchemy import create_engine, text
+from scheduling import job_priority, schedule_delays
 
-def connect_to_db():
+QUEUE_CHANNEL = "populate_queue_new" # NOTIFY channel fired by inserts into populate_queue (migration 0001)
+
+_NAMED_PARAM = re.compile(r"(?<![:\w]):(\w+)") # ``:name``, but not a ``::type`` cast
+
+def get_database_url() -> str:
+    """Return ``DATABASE_URL`` from the environment or ``backend/.env``."""
     # Load environment variables from ../.env
     env_path = Path(__file__).resolve().parent.parent / ".env"
     load_dotenv(env_path)
@@ -18,12 +25,42 @@ def connect_to_db():
     db_url = os.getenv("DATABASE_URL")
     if not db_url:
         raise RuntimeError("DATABASE_URL is missing or .env failed to load")
+    return db_url
+
+class AsyncQuery:
+    """
+    A shared SQLAlchemy ``text()`` statement (``:name`` parameters) converted once for asyncpg
+    (``$n``), so the sync and async workers run the same SQL. A name used several times maps to
+    one ``$n``; statements must not contain ``:word`` inside string literals.
+    """
+
+    def __init__(self, sql: str):
+        self.names = []
+        self.sql = _NAMED_PARAM.sub(self._number, sql)
+
+    def _number(self, match) -> str:
+        name = match.group(1)
+        if name not in self.names:
+            self.names.append(name)
+        return f"${self.names.index(name) + 1}"
+
+    def args(self, params: dict) -> list:
+        """Positional arguments for asyncpg, in ``$n`` order."""
+        return [params[name] for name in self.names]
+
+def connect_to_db(**engine_options):
+    """
+    Create the SQLAlchemy engine from ``DATABASE_URL``.
+    Extra keyword arguments (e.g. ``pool_size``) are passed to ``create_engine``.
+    """
+    db_url = get_database_url()
 
     # Create normal SQLAlchemy engine (sync)
     engine = create_engine(
         db_url,
         echo = False, # Print SQL queries
-        pool_pre_ping = True # Avoid stale connections
+        pool_pre_ping = True, # Avoid stale connections
+        **engine_options
     )
 
     return engine
@@ -43,6 +80,41 @@ def test_db_connection(engine):
         print(f"Failed to connect to the database: {error}")
         exit(1) # Don't proceed if DB connection fails
 
+def bulk_enqueue(db, spotify_track_ids: list, source: str, seed_depth: int = 0,
+                 seed_parent_spotify_id: str = None, seed_batch_id: str = None, first_rank: int = 0) -> list:
+    """
+    Insert many tracks into populate_queue with a single statement.
+    Each row is scheduled by ``seeding.scheduling``; ``first_rank`` continues the batch's
+    fairness spacing across chunks. Tracks already in the queue are skipped; returns the IDs
+    that were actually inserted.
+    """
+    if not spotify_track_ids:
+        return []
+
+    priority = job_priority(source, seed_depth)
+    delays = schedule_delays([priority] * len(spotify_track_ids), first_rank)
+
+    result = db.execute(text("""
+        INSERT INTO populate_queue (
+            spotify_track_id, source, seed_depth, seed_parent_spotify_id, seed_batch_id, priority, scheduled_at
+        )
+        SELECT t.spotify_track_id, :source, :seed_depth, :seed_parent_spotify_id, :seed_batch_id,
+               :priority, NOW() + make_interval(secs => t.delay)
+        FROM unnest(CAST(:spotify_track_ids AS text[]), CAST(:delays AS float8[])) AS t(spotify_track_id, delay)
+        ON CONFLICT (spotify_track_id) DO NOTHING
+        RETURNING spotify_track_id
+    """), {
+        "spotify_track_ids": list(spotify_track_ids),
+        "delays": delays,
+        "source": source,
+        "seed_depth": seed_depth,
+        "seed_parent_spotify_id": seed_parent_spotify_id,
+        "seed_batch_id": seed_batch_id,
+        "priority": priority,
+    })
+
+    return [row.spotify_track_id for row in result]
+
 def weight_features(features: dict) -> list:
     """
     Apply weights to audio features following the similarity algorithm.
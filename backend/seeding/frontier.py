@@ -0,0 +1,190 @@
+"""
+Crawl frontier planner: how many similar tracks a finished job may enqueue, and which ones
+"""
+
+import time
+import threading
+import numpy as np
+from sqlalchemy import text
+
+MAX_PENDING = 50_000        # Global pending budget; the crawl stops expanding when it is used up
+MAX_SEED_DEPTH = 8          # Jobs deeper than this never enqueue children
+BASE_ADDS = 5               # Children per job with an empty queue and average novelty
+MAX_ADDS = 8                # Upper bound per job, reached only in sparsely covered regions
+ARTIST_QUEUE_CAP = 2        # Pending/processing jobs allowed per artist
+ARTIST_CATALOGUE_CAP = 20   # Catalogued songs after which an artist is considered covered
+BUDGET_REFRESH = 30         # Seconds a pending-count snapshot is reused
+COVERAGE_NEIGHBOURS = 10    # Neighbours used to measure how crowded a point of feature space is
+COVERAGE_INITIAL_ROWS = 1024 # Starting rows of the coverage buffer; it doubles whenever it fills up
+
+PENDING_BY_DEPTH_SQL = """
+    SELECT seed_depth, COUNT(*) AS count
+    FROM populate_queue
+    WHERE status = 'pending'
+    GROUP BY seed_depth
+"""
+
+COVERAGE_SQL = "SELECT weighted_features FROM christian_songs WHERE weighted_features IS NOT NULL"
+
+# One round trip; each scalar subquery is an index lookup (see migration 0005)
+ARTIST_COUNTS_SQL = """
+    SELECT a.artist,
+           (SELECT COUNT(*) FROM populate_queue q
+            WHERE q.artist = a.artist AND q.status IN ('pending', 'processing')) AS queued,
+           (SELECT COUNT(*) FROM christian_songs s
+            WHERE lower(s.artist) = a.artist) AS catalogued
+    FROM unnest(CAST(:artists AS text[])) AS a(artist)
+"""
+
+def artist_key(name) -> str:
+    """Normalized artist name stored in ``populate_queue.artist``."""
+    return (name or "").strip().lower()
+
+def depth_cap(depth: int) -> int:
+    """Pending jobs allowed at one seed depth: half the global budget per extra hop, so the crawl grows breadth-first."""
+    return MAX_PENDING >> max(0, depth - 1)
+
+class FeatureCoverage:
+    """
+    Weighted feature vectors of the catalogue, used to tell crowded regions of feature space from sparse ones.
+    Candidates have no audio features before they are processed, so a job's own vector stands in for
+    its neighbourhood: children of a song in a sparse region are the most likely to add something new.
+    """
+
+    def __init__(self):
+        self._buffer = np.empty((COVERAGE_INITIAL_ROWS, 9))
+        self._size = 0
+        self._reference = None
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self._size
+
+    def load(self, vectors):
+        with self._lock:
+            rows = np.asarray(list(vectors), dtype=float).reshape(-1, 9)
+            self._buffer = np.empty((max(COVERAGE_INITIAL_ROWS, len(rows) * 2), 9))
+            self._buffer[:len(rows)] = rows
+            self._size = len(rows)
+            self._reference = None
+
+    def add(self, vector):
+        """Append one vector, doubling the buffer when it is full so appends stay amortised O(1)."""
+        with self._lock:
+            if self._size == len(self._buffer):
+                grown = np.empty((len(self._buffer) * 2, 9))
+                grown[:self._size] = self._buffer[:self._size]
+                self._buffer = grown
+            self._buffer[self._size] = vector
+            self._size += 1
+
+    def _matrix(self):
+        return self._buffer[:self._size]
+
+    def _crowding(self, matrix, vector) -> float:
+        """Mean distance to the nearest ``COVERAGE_NEIGHBOURS`` catalogued songs."""
+        distances = np.linalg.norm(matrix - vector, axis=1)
+        k = min(COVERAGE_NEIGHBOURS, len(distances) - 1)
+        return float(np.partition(distances, k)[:k + 1].mean())
+
+    def novelty(self, vector) -> float:
+        """
+        Return how sparse the region around ``vector`` is compared to a typical catalogued song,
+        clipped to [0.5, 1.5] (1.0 when there is not enough catalogue to tell).
+        """
+        with self._lock:
+            matrix = self._matrix()
+            if len(matrix) <= COVERAGE_NEIGHBOURS * 2:
+                return 1.0
+            if self._reference is None or len(matrix) > self._reference[1] * 2:
+                sample = matrix[np.random.default_rng(0).choice(len(matrix), size=min(200, len(matrix)), replace=False)]
+                self._reference = (float(np.median([self._crowding(matrix, point) for point in sample])) or 1.0, len(matrix))
+            crowding = self._crowding(matrix, np.asarray(vector, dtype=float))
+        return float(np.clip(crowding / self._reference[0], 0.5, 1.5))
+
+class FrontierPlanner:
+    """
+    Applies the crawl budget to recursive seeding:
+        - backpressure: fewer children as the pending queue fills, none once ``MAX_PENDING`` is reached
+        - per-depth caps (``depth_cap``) and a hard ``MAX_SEED_DEPTH``
+        - per-artist caps on queued and catalogued songs
+        - novelty ranking: unseen artists first, more children for songs in sparse feature space
+    Holds no connection; callers run the ``*_SQL`` queries and pass the results in.
+    """
+
+    def __init__(self):
+        self.coverage = FeatureCoverage()
+        self._pending_by_depth = None
+        self._refreshed_at = 0.0
+        self._lock = threading.Lock()
+
+    def budget_is_stale(self) -> bool:
+        return time.monotonic() - self._refreshed_at >= BUDGET_REFRESH
+
+    def update_budget(self, pending_by_depth: dict):
+        with self._lock:
+            self._pending_by_depth = dict(pending_by_depth)
+            self._refreshed_at = time.monotonic()
+
+    def target_adds(self, child_depth: int, parent_vector=None) -> int:
+        """How many children a job may enqueue at ``child_depth``."""
+        if child_depth > MAX_SEED_DEPTH:
+            return 0
+        with self._lock:
+            pending_by_depth = self._pending_by_depth or {}
+        total_pending = sum(pending_by_depth.values())
+        remaining = MAX_PENDING - total_pending
+        depth_remaining = depth_cap(child_depth) - pending_by_depth.get(child_depth, 0)
+        if remaining <= 0 or depth_remaining <= 0:
+            return 0
+
+        novelty = self.coverage.novelty(parent_vector) if parent_vector is not None else 1.0
+        target = round(BASE_ADDS * (1 - total_pending / MAX_PENDING) * novelty)
+        adds = min(max(1, min(target, MAX_ADDS)), remaining, depth_remaining)
+        with self._lock:
+            # Count the adds against the snapshot so concurrent jobs don't overshoot it before the next refresh
+            if self._pending_by_depth is not None:
+                self._pending_by_depth[child_depth] = self._pending_by_depth.get(child_depth, 0) + adds
+        return adds
+
+    def rank(self, candidates: list, artist_counts: dict) -> list:
+        """
+        Drop candidates whose artist is at a cap and order the rest by expected novelty.
+        ``artist_counts`` maps ``artist_key`` to ``(queued, catalogued)``. Ties keep recommendation order.
+        """
+        scored = []
+        taken = {}
+        for position, track in enumerate(candidates):
+            key = artist_key(track.get("artist"))
+            queued, catalogued = artist_counts.get(key, (0, 0))
+            queued += taken.get(key, 0)
+            if queued >= ARTIST_QUEUE_CAP or catalogued >= ARTIST_CATALOGUE_CAP:
+                continue
+            taken[key] = taken.get(key, 0) + 1
+
+            # Unseen artists score highest; every song we already hold or queue for them lowers the score
+            score = 1.0 / (1 + catalogued + queued)
+            scored.append((-score, position, track))
+
+        return [track for _, _, track in sorted(scored, key=lambda item: item[:2])]
+
+FRONTIER = FrontierPlanner()
+
+def refresh_budget(db, planner: FrontierPlanner = FRONTIER):
+    """Re-read pending counts per depth when the snapshot is older than ``BUDGET_REFRESH``."""
+    if planner.budget_is_stale():
+        planner.update_budget({row.seed_depth: row.count for row in db.execute(text(PENDING_BY_DEPTH_SQL))})
+
+def fetch_artist_counts(db, candidates: list) -> dict:
+    """Return ``{artist_key: (queued, catalogued)}`` for the candidates' artists."""
+    artists = list({artist_key(track.get("artist")) for track in candidates if track.get("artist")})
+    if not artists:
+        return {}
+    rows = db.execute(text(ARTIST_COUNTS_SQL), {"artists": artists})
+    return {row.artist: (row.queued, row.catalogued) for row in rows}
+
+def load_coverage(db, planner: FrontierPlanner = FRONTIER) -> int:
+    """Load the catalogue's weighted feature vectors; returns how many were loaded."""
+    rows = db.execution_options(stream_results=True, yield_per=10_000).execute(text(COVERAGE_SQL))
+    planner.coverage.load(row.weighted_features for row in rows)
+    return len(planner.coverage)
@@ -8,9 +8,17 @@ from pathlib import Path
 backend_path = Path(__file__).parent.parent
 sys.path.insert(0, str(backend_path))
 
+import re
+import json
 import time
-from db_helpers import connect_to_db, test_db_connection
-from services.spotify import validate_spotify_track, validate_spotify_album, validate_spotify_playlist, sp
+import argparse
+import contextlib
+import concurrent.futures
+from db_helpers import connect_to_db, test_db_connection, bulk_enqueue
+from scheduling import job_priority
+from rejections import recheck_rejections, REJECTION_TTL_DAYS
+from metrics import STAGES
+from services.spotify import detect_spotify_id_type, parse_spotify_id, get_tracks, iter_album_tracks, iter_playlist_tracks, sp, SPOTIFY_BATCH_SIZE
 from typing import Optional
 from sqlalchemy import text
 from sqlalchemy.exc import IntegrityError
@@ -19,6 +27,8 @@ add_song_inputs = ["1", "1.", "add", "add song", "add song to queue", "a"]
 view_queue_inputs = ["2", "2.", "view", "view queue", "v"]
 exit_inputs = ["3", "3.", "exit", "e"]
 
+BULK_INSERT_CHUNK = 1000 # Rows per transaction when bulk enqueueing
+
 def command_line_interface():
     """
     Command line interface for the manager.
@@ -44,48 +54,78 @@ def add_song_to_queue(engine, spotify_track_id: str):
 
         with engine.begin() as db:
             db.execute(text("""
-                INSERT INTO populate_queue (spotify_track_id, source, seed_depth)
-                VALUES (:spotify_track_id, 'manual_single', 0)
-            """), {"spotify_track_id": spotify_track_id})
+                INSERT INTO populate_queue (spotify_track_id, source, seed_depth, priority, scheduled_at)
+                VALUES (:spotify_track_id, 'manual_single', 0, :priority, NOW())
+            """), {"spotify_track_id": spotify_track_id, "priority": job_priority("manual_single")})
         print(f"[manager] Added track {song_name} ({spotify_track_id}) to the queue.\n")
     except IntegrityError:
         print(f"[manager] Failed to add track to the queue: Track {song_name} ({spotify_track_id}) already exists in the queue")
     except Exception as error:
         print(f"[manager] Failed to add track to the queue: {error}\n")
 
-def add_album_to_queue(engine, spotify_album_id: str):
+def add_tracks_to_queue(engine, spotify_track_ids: list):
     """
-    Adds all tracks from an album to the population queue.
+    Adds several tracks to the population queue.
+    Track info is resolved with one batch request per 50 tracks.
     """
+    if len(spotify_track_ids) == 1:
+        add_song_to_queue(engine, spotify_track_ids[0])
+        return
+
     try:
-        album_tracks = sp.album_tracks(spotify_album_id)
-        if album_tracks is None:
-            print(f"[manager] Failed to retrieve album tracks for {spotify_album_id}.\n")
-            return
-        
-        tracks_dict = {}
-        for item in album_tracks["items"]:
-            if item.get("id"):
-                track_id = item["id"]
-                track_name = item["name"]
-                tracks_dict[track_id] = track_name
+        track_infos = get_tracks(spotify_track_ids)
+    except Exception as error:
+        print(f"[manager] Failed to look up tracks, nothing was added (try again later): {error}\n")
+        return
+    found_ids = [track_id for track_id, track_info in track_infos.items() if track_info is not None]
+    for track_id in track_infos.keys() - set(found_ids):
+        print(f"[manager] Failed to retrieve song info for {track_id}, skipping.")
 
-        added_count = 0
-        skipped_count = 0
+    try:
+        with engine.begin() as db:
+            inserted = bulk_enqueue(db, found_ids, "manual_single")
+    except Exception as error:
+        print(f"[manager] Failed to add tracks to the queue: {error}\n")
+        return
 
-        for track_id, track_name in tracks_dict.items():
-            try:
-                with engine.begin() as db:
-                    db.execute(text("""
-                        INSERT INTO populate_queue (spotify_track_id, source, seed_depth)
-                        VALUES (:spotify_track_id, 'manual_album', 0)
-                    """), {"spotify_track_id": track_id})
-                    print(f"[manager] Added: {track_name} ({track_id})")
-                    added_count += 1
-            except IntegrityError:
-                print(f"[manager] Track {track_name} ({track_id}) already exists in the queue, skipping.")
+    for track_id in inserted:
+        print(f"[manager] Added: {track_infos[track_id].get('name')} ({track_id})")
+
+    print(f"[manager] Added {len(inserted)} tracks to the queue. Skipped {len(track_infos) - len(inserted)} tracks.\n")
+
+def _ingest_track_pages(engine, pages, source: str):
+    """
+    Write a stream of ``(track_id, name)`` pages to the queue, one bulk insert per page.
+    Returns ``(added_count, skipped_count)``; duplicates within the stream count as skipped.
+    """
+    seen = set()
+    added_count = 0
+    skipped_count = 0
+
+    for page in pages:
+        track_ids = []
+        for track_id, _ in page:
+            if track_id in seen:
                 skipped_count += 1
-        
+                continue
+            seen.add(track_id)
+            track_ids.append(track_id)
+
+        with engine.begin() as db:
+            inserted = bulk_enqueue(db, track_ids, source, first_rank=len(seen) - len(track_ids))
+
+        added_count += len(inserted)
+        skipped_count += len(track_ids) - len(inserted)
+        print(f"[manager] Queued {added_count} tracks so far, skipped {skipped_count}.")
+
+    return added_count, skipped_count
+
+def add_album_to_queue(engine, spotify_album_id: str):
+    """
+    Adds all tracks from an album to the population queue.
+    """
+    try:
+        added_count, skipped_count = _ingest_track_pages(engine, iter_album_tracks(spotify_album_id), "manual_album")
         print(f"[manager] Added album {spotify_album_id} with {added_count} tracks to the queue. Skipped {skipped_count} tracks.\n")
     except Exception as error:
         print(f"[manager] Failed to add album to the queue: {error}\n")
@@ -95,57 +135,104 @@ def add_playlist_to_queue(engine, spotify_playlist_id: str):
     Adds all tracks from a playlist to the population queue.
     """
     try:
-        playlist_tracks = sp.playlist_items(spotify_playlist_id)
-        if playlist_tracks is None:
-            print(f"[manager] Failed to retrieve playlist tracks for {spotify_playlist_id}.\n")
-            return
-
-        tracks_dict = {}
-        for item in playlist_tracks["items"]:
-            if item.get("track") and item["track"].get("id"):
-                track_id = item["track"]["id"]
-                track_name = item["track"]["name"]
-                tracks_dict[track_id] = track_name
-
-        added_count = 0
-        skipped_count = 0
-
-        for track_id, track_name in tracks_dict.items():
-            try:
-                with engine.begin() as db:
-                    db.execute(text("""
-                        INSERT INTO populate_queue (spotify_track_id, source, seed_depth)
-                        VALUES (:spotify_track_id, 'manual_playlist', 0)
-                    """), {"spotify_track_id": track_id})
-                    print(f"[manager] Added: {track_name} ({track_id})")
-                    added_count += 1
-            except IntegrityError:
-                print(f"[manager] Track {track_name} ({track_id}) already exists in the queue, skipping.")
-                skipped_count += 1
-        
+        added_count, skipped_count = _ingest_track_pages(engine, iter_playlist_tracks(spotify_playlist_id), "manual_playlist")
         print(f"[manager] Added playlist {spotify_playlist_id} with {added_count} tracks to the queue. Skipped {skipped_count} tracks.\n")
     except Exception as error:
         print(f"[manager] Failed to add playlist to the queue: {error}\n")
 
+QUEUE_STATUSES = {"1": "pending", "2": "processing", "3": "done", "4": "failed"}
+QUEUE_PAGE_SIZE = 50
+
+# Keyset page over populate_queue_status_enqueued / populate_queue_enqueued (migration 0003)
+QUEUE_PAGE_SQL = """
+    SELECT id, spotify_track_id, source, enqueued_at, status, attempt_count, last_attempt_at, last_error
+    FROM populate_queue
+    WHERE (CAST(:status AS text) IS NULL OR status = :status)
+      AND (CAST(:after_enqueued_at AS timestamptz) IS NULL OR (enqueued_at, id) > (:after_enqueued_at, :after_id))
+    ORDER BY enqueued_at ASC, id ASC
+    LIMIT :page_size
+"""
+
+def queue_summary(db, top_errors: int = 10) -> dict:
+    """
+    Aggregate the queue in one GROUP BY: counts per status, per source and per depth,
+    plus the most common failure messages.
+    """
+    rows = db.execute(text("""
+        SELECT status,
+               source,
+               seed_depth,
+               CASE WHEN status = 'failed' THEN COALESCE(last_error, '(no error recorded)') END AS failure,
+               GROUPING(status) AS by_status,
+               GROUPING(source) AS by_source,
+               GROUPING(seed_depth) AS by_depth,
+               COUNT(*) AS count
+        FROM populate_queue
+        GROUP BY GROUPING SETS (
+            (status),
+            (source),
+            (seed_depth),
+            (CASE WHEN status = 'failed' THEN COALESCE(last_error, '(no error recorded)') END)
+        )
+    """)).fetchall()
+
+    # GROUPING() is 0 for the column a row is grouped by
+    summary = {"total": 0, "by_status": {}, "by_source": {}, "by_depth": {}, "failures": []}
+    for row in rows:
+        if row.by_status == 0:
+            summary["by_status"][row.status] = row.count
+            summary["total"] += row.count
+        elif row.by_source == 0:
+            summary["by_source"][row.source] = row.count
+        elif row.by_depth == 0:
+            summary["by_depth"][row.seed_depth] = row.count
+        elif row.failure is not None:
+            summary["failures"].append({"error": row.failure, "count": row.count})
+
+    summary["by_depth"] = dict(sorted(summary["by_depth"].items(), key=lambda item: (item[0] is None, item[0] or 0)))
+    summary["failures"] = sorted(summary["failures"], key=lambda failure: -failure["count"])[:top_errors]
+    return summary
+
+def fetch_queue_page(db, status: str = None, after: tuple = None, page_size: int = QUEUE_PAGE_SIZE) -> list:
+    """
+    Return one page of queue rows in ``(enqueued_at, id)`` order, optionally filtered by status.
+    ``after`` is the ``(enqueued_at, id)`` of the last row of the previous page (keyset pagination),
+    so every page is an index range scan no matter how deep into the queue it is.
+    """
+    after_enqueued_at, after_id = after if after else (None, None)
+    return db.execute(text(QUEUE_PAGE_SQL), {
+        "status": status,
+        "after_enqueued_at": after_enqueued_at,
+        "after_id": after_id,
+        "page_size": page_size,
+    }).mappings().all()
+
+def print_queue_summary(summary: dict):
+    """Print the output of ``queue_summary``."""
+    print(f"[manager] Queue summary ({summary['total']} jobs):")
+    print("  By status: " + ", ".join(f"{status}: {count}" for status, count in summary["by_status"].items()))
+    print("  By source: " + ", ".join(f"{source}: {count}" for source, count in summary["by_source"].items()))
+    print("  By depth:  " + ", ".join(f"{depth}: {count}" for depth, count in summary["by_depth"].items()))
+    if summary["failures"]:
+        print("  Top failures:")
+        for failure in summary["failures"]:
+            print(f"    {failure['count']:>7}  {failure['error']}")
+    print("")
+
 def view_queue(engine):
     """
-    Displays the current population queue.
+    Displays the queue summary, then the chosen rows one page at a time.
     """
     with engine.connect() as db:
-        result = db.execute(text("""
-            SELECT id, spotify_track_id, source, enqueued_at, status, attempt_count, last_attempt_at, last_error
-            FROM populate_queue
-            ORDER BY enqueued_at ASC
-        """))
-
-        rows = result.mappings().all()
-        if len(rows) == 0:
+        summary = queue_summary(db)
+        if summary["total"] == 0:
             print("[manager] Population queue is empty.\n")
             return
+        print_queue_summary(summary)
 
         print("[manager] Choose a status to filter by:")
         print("   1. pending")
-        print("   2. in_progress")
+        print("   2. processing")
         print("   3. completed")
         print("   4. failed")
         print("   5. all records\n")
@@ -153,29 +240,334 @@ def view_queue(engine):
         status_choice = input("[manager] Enter your choice (or press Enter for all): ")
         print("")
 
-        if status_choice == "1":
-            rows = [row for row in rows if row["status"] == "pending"]
-        elif status_choice == "2":
-            rows = [row for row in rows if row["status"] == "in_progress"]
-        elif status_choice == "3":
-            rows = [row for row in rows if row["status"] == "done"]
-        elif status_choice == "4":
-            rows = [row for row in rows if row["status"] == "failed"]
-        elif status_choice == "5" or status_choice == "":
-            pass
-        else:
+        if status_choice not in QUEUE_STATUSES and status_choice not in ("5", ""):
             print("[manager] Invalid choice, showing all records.\n")
-    
+        status = QUEUE_STATUSES.get(status_choice)
+
         print("[manager] Current Population Queue:")
         print("-----------------------------------")
-        for row in rows:
-            print(f"  ID: {row['id']}, Track ID: {row['spotify_track_id']}, Status: {row['status']}, Source: {row['source']}, Enqueued At: {row['enqueued_at']}, Attempts: {row['attempt_count']}, Last Attempt At: {row['last_attempt_at']}, Last Error: {row['last_error']}")
+        after = None
+        while True:
+            rows = fetch_queue_page(db, status, after)
+            for row in rows:
+                print(f"  ID: {row['id']}, Track ID: {row['spotify_track_id']}, Status: {row['status']}, Source: {row['source']}, Enqueued At: {row['enqueued_at']}, Attempts: {row['attempt_count']}, Last Attempt At: {row['last_attempt_at']}, Last Error: {row['last_error']}")
+
+            if len(rows) < QUEUE_PAGE_SIZE:
+                break
+            after = (rows[-1]["enqueued_at"], rows[-1]["id"])
+            if input("[manager] Press Enter for the next page, or q to stop: ").strip().lower() == "q":
+                break
         print("")
 
+def worker_metrics(db, hours: float = 1.0) -> dict:
+    """
+    Summarize job_metrics over the last ``hours``: outcomes, throughput, p50/p95 per stage,
+    and an ETA for the pending backlog at the current throughput.
+    """
+    stage_columns = ["total", *STAGES]
+    percentiles = ",\n".join(
+        f"percentile_cont(0.5) WITHIN GROUP (ORDER BY {stage}_ms) AS {stage}_p50, "
+        f"percentile_cont(0.95) WITHIN GROUP (ORDER BY {stage}_ms) AS {stage}_p95"
+        for stage in stage_columns
+    )
+    row = db.execute(text(f"""
+        SELECT COUNT(*) AS finished,
+               COUNT(*) FILTER (WHERE outcome = 'done') AS done,
+               COUNT(*) FILTER (WHERE outcome = 'failed') AS failed,
+               COUNT(*) FILTER (WHERE outcome = 'rejected') AS rejected,
+               COUNT(*) FILTER (WHERE outcome = 'lease_lost') AS lease_lost,
+               COUNT(DISTINCT worker_id) AS workers,
+               {percentiles}
+        FROM job_metrics
+        WHERE finished_at >= NOW() - make_interval(secs => :seconds)
+    """), {"seconds": hours * 3600}).mappings().one()
+
+    # Separate scalar subqueries so each count can use its own index
+    backlog = db.execute(text("""
+        SELECT (SELECT COUNT(*) FROM populate_queue WHERE status = 'pending') AS pending,
+               (SELECT COUNT(*) FROM populate_queue WHERE enqueued_at >= NOW() - make_interval(secs => :seconds)) AS enqueued
+    """), {"seconds": hours * 3600}).mappings().one()
+
+    throughput = row["finished"] / hours
+    enqueue_rate = backlog["enqueued"] / hours
+    net_drain = throughput - enqueue_rate
+
+    return {
+        "window_hours": hours,
+        "workers": row["workers"],
+        "outcomes": {outcome: row[outcome] for outcome in ("done", "failed", "rejected", "lease_lost")},
+        "jobs_per_hour": round(throughput, 1),
+        "songs_added_per_hour": round(row["done"] / hours, 1),
+        "enqueued_per_hour": round(enqueue_rate, 1),
+        "pending": backlog["pending"],
+        "eta_hours": round(backlog["pending"] / throughput, 1) if throughput else None,
+        "eta_hours_with_growth": round(backlog["pending"] / net_drain, 1) if net_drain > 0 else None,
+        "stages_ms": {
+            stage: {"p50": row[f"{stage}_p50"], "p95": row[f"{stage}_p95"]}
+            for stage in stage_columns
+        },
+    }
+
+def print_worker_metrics(metrics: dict):
+    """Print the output of ``worker_metrics``."""
+    print(f"[manager] Worker metrics, last {metrics['window_hours']:g}h ({metrics['workers']} workers):")
+    print("  Outcomes: " + ", ".join(f"{outcome}: {count}" for outcome, count in metrics["outcomes"].items()))
+    print(f"  Throughput: {metrics['jobs_per_hour']} jobs/h ({metrics['songs_added_per_hour']} songs added/h), "
+          f"enqueued {metrics['enqueued_per_hour']} jobs/h")
+    print("  Stage latency (ms):")
+    for stage, values in metrics["stages_ms"].items():
+        if values["p50"] is not None:
+            print(f"    {stage:<10} p50 {values['p50']:>9.0f}   p95 {values['p95']:>9.0f}")
+
+    if metrics["eta_hours"] is None:
+        print(f"  Pending: {metrics['pending']}, no jobs finished in this window so there is no ETA")
+    else:
+        growth = (f"{metrics['eta_hours_with_growth']}h including new enqueues" if metrics["eta_hours_with_growth"] is not None
+                  else "but the backlog is growing faster than it drains")
+        print(f"  Pending: {metrics['pending']}, ETA {metrics['eta_hours']}h at current throughput, {growth}")
+    print("")
+
+def read_references(lines) -> list:
+    """
+    Split input lines into Spotify references.
+    Blank lines and anything after a ``#`` are ignored; several references may share a line.
+    """
+    references = []
+    for line in lines:
+        line = line.split("#", 1)[0]
+        references.extend(ref for ref in re.split(r"[\s,]+", line.strip()) if ref)
+    return references
+
+def _collect_tracks(iter_pages, spotify_id: str) -> list:
+    """Drain a paged track stream into a list of track IDs."""
+    return [track_id for page in iter_pages(spotify_id) for track_id, _ in page]
+
+def resolve_references(references: list, concurrency: int) -> dict:
+    """
+    Resolve mixed track/album/playlist references into deduplicated track IDs.
+    Explicit track IDs and bare IDs are checked as tracks in batches of 50; only bare IDs that
+    are not tracks are probed as album or playlist. Probes and album/playlist expansion run on
+    a bounded thread pool.
+    Returns ``{"tracks": {source: [track_id, ...]}, "invalid": [...], "errors": [...]}``.
+    """
+    invalid = []
+    errors = []
+    kinds = {}
+    bare_ids = {}
+
+    # 1. Classify references locally; URIs and URLs cost no network calls
+    for ref in dict.fromkeys(references):
+        kind, spotify_id = parse_spotify_id(ref)
+        if spotify_id is None:
+            invalid.append(ref)
+        elif kind is None:
+            bare_ids.setdefault(spotify_id, ref)
+        else:
+            kinds.setdefault(kind, []).append(spotify_id)
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=concurrency) as executor:
+        collection_futures = {}
+        def expand(kind: str, spotify_id: str):
+            iter_pages = iter_album_tracks if kind == "album" else iter_playlist_tracks
+            collection_futures[executor.submit(_collect_tracks, iter_pages, spotify_id)] = (kind, spotify_id)
+
+        for kind in ("album", "playlist"):
+            for spotify_id in dict.fromkeys(kinds.get(kind, [])):
+                expand(kind, spotify_id)
+
+        # 2. Validate explicit and bare IDs as tracks, one request per 50
+        track_ids = list(dict.fromkeys(kinds.get("track", []) + list(bare_ids)))
+        track_futures = {
+            executor.submit(get_tracks, track_ids[start:start + SPOTIFY_BATCH_SIZE]): track_ids[start:start + SPOTIFY_BATCH_SIZE]
+            for start in range(0, len(track_ids), SPOTIFY_BATCH_SIZE)
+        }
+
+        valid_tracks = set()
+        not_tracks = []
+        for future, batch in track_futures.items():
+            try:
+                track_infos = future.result()
+            except Exception as error:
+                # Transient (rate limit, server error): report every ID so the batch can be retried
+                errors.extend({"reference": bare_ids.get(track_id, track_id), "error": str(error)} for track_id in batch)
+                continue
+            for track_id, track_info in track_infos.items():
+                if track_info is not None:
+                    valid_tracks.add(track_id)
+                elif track_id in bare_ids:
+                    not_tracks.append(track_id)
+                else:
+                    invalid.append(track_id)
+
+        # 3. Only bare IDs that are not tracks are probed as album or playlist
+        probe_futures = {
+            executor.submit(detect_spotify_id_type, spotify_id, ("album", "playlist")): spotify_id
+            for spotify_id in not_tracks
+        }
+        for future in concurrent.futures.as_completed(probe_futures):
+            ref = bare_ids[probe_futures[future]]
+            try:
+                kind, spotify_id = future.result()
+            except Exception as error:
+                errors.append({"reference": ref, "error": str(error)})
+                continue
+            if kind is None:
+                invalid.append(ref)
+            else:
+                expand(kind, spotify_id)
+
+        expanded = {}
+        for future, (kind, spotify_id) in list(collection_futures.items()):
+            try:
+                expanded.setdefault(kind, []).extend(future.result())
+            except Exception as error:
+                errors.append({"reference": spotify_id, "error": str(error)})
+
+    # 4. Deduplicate across all inputs; direct track references win over collections
+    seen = set()
+    tracks = {}
+    sources = [
+        ("manual_single", [track_id for track_id in track_ids if track_id in valid_tracks]),
+        ("manual_album", expanded.get("album", [])),
+        ("manual_playlist", expanded.get("playlist", [])),
+    ]
+    duplicates = 0
+    for source, ids in sources:
+        for track_id in ids:
+            if track_id in seen:
+                duplicates += 1
+                continue
+            seen.add(track_id)
+            tracks.setdefault(source, []).append(track_id)
+
+    return {"tracks": tracks, "invalid": invalid, "errors": errors, "duplicates": duplicates}
+
+def enqueue_references(engine, references: list, concurrency: int = 8) -> dict:
+    """
+    Non-interactive bulk enqueue of mixed Spotify references.
+    Returns a summary dict suitable for JSON output.
+    """
+    started = time.monotonic()
+    resolved = resolve_references(references, concurrency)
+
+    added = 0
+    already_queued = 0
+    for source, track_ids in resolved["tracks"].items():
+        for start in range(0, len(track_ids), BULK_INSERT_CHUNK):
+            chunk = track_ids[start:start + BULK_INSERT_CHUNK]
+            with engine.begin() as db:
+                inserted = bulk_enqueue(db, chunk, source, first_rank=start)
+            added += len(inserted)
+            already_queued += len(chunk) - len(inserted)
+
+    return {
+        "references": len(references),
+        "tracks_resolved": sum(len(ids) for ids in resolved["tracks"].values()),
+        "duplicates": resolved["duplicates"],
+        "added": added,
+        "already_queued": already_queued,
+        "invalid": resolved["invalid"],
+        "errors": resolved["errors"],
+        "elapsed_seconds": round(time.monotonic() - started, 2),
+    }
+
+def run_enqueue(args) -> int:
+    """
+    Entry point for ``manager.py enqueue``.
+    Progress goes to stderr so stdout carries only the JSON summary.
+    """
+    with contextlib.redirect_stdout(sys.stderr):
+        if args.file == "-":
+            references = read_references(sys.stdin)
+        else:
+            with open(args.file, "r", encoding="utf-8") as handle:
+                references = read_references(handle)
+
+        engine = connect_to_db()
+        test_db_connection(engine)
+        summary = enqueue_references(engine, references, concurrency=args.concurrency)
+
+    print(json.dumps(summary))
+    return 1 if summary["errors"] else 0
+
+def run_stats(args) -> int:
+    """Entry point for ``manager.py stats``: print the queue summary, as JSON with ``--json``."""
+    with contextlib.redirect_stdout(sys.stderr):
+        engine = connect_to_db()
+        test_db_connection(engine)
+
+    with engine.connect() as db:
+        summary = queue_summary(db, top_errors=args.top_errors)
+
+    if args.json:
+        print(json.dumps(summary, default=str))
+    else:
+        print_queue_summary(summary)
+    return 0
+
+def run_metrics(args) -> int:
+    """Entry point for ``manager.py metrics``: worker throughput, stage latency and backlog ETA."""
+    with contextlib.redirect_stdout(sys.stderr):
+        engine = connect_to_db()
+        test_db_connection(engine)
+
+    with engine.connect() as db:
+        metrics = worker_metrics(db, hours=args.hours)
+
+    if args.json:
+        print(json.dumps(metrics, default=str))
+    else:
+        print_worker_metrics(metrics)
+    return 0
+
+def run_recheck_rejections(args) -> int:
+    """Entry point for ``manager.py recheck-rejections``: send rejected tracks back through classification."""
+    engine = connect_to_db()
+    test_db_connection(engine)
+
+    with engine.begin() as db:
+        requeued = recheck_rejections(db, include_live=args.all)
+
+    scope = "rejected" if args.all else f"rejected more than {REJECTION_TTL_DAYS} days ago"
+    print(f"[manager] Re-enqueued {requeued} tracks {scope} for a new classification")
+    return 0
+
+def parse_args(argv=None):
+    """Parse command line arguments; no subcommand starts the interactive manager."""
+    parser = argparse.ArgumentParser(description="Worshipify seeding manager")
+    subparsers = parser.add_subparsers(dest="command")
+
+    enqueue_parser = subparsers.add_parser("enqueue", help="Enqueue track/album/playlist IDs or URLs without prompts")
+    enqueue_parser.add_argument("--file", default="-", help="File with one or more references per line ('-' for stdin, the default)")
+    enqueue_parser.add_argument("--concurrency", type=int, default=8, help="Maximum concurrent Spotify lookups")
+
+    stats_parser = subparsers.add_parser("stats", help="Print queue counts per status, source and depth, and the top failures")
+    stats_parser.add_argument("--json", action="store_true", help="Print the summary as JSON")
+    stats_parser.add_argument("--top-errors", type=int, default=10, help="Number of distinct failure messages to show")
+
+    metrics_parser = subparsers.add_parser("metrics", help="Print worker throughput, p50/p95 stage latency and the backlog ETA")
+    metrics_parser.add_argument("--hours", type=float, default=1.0, help="Window to report on (default: last hour)")
+    metrics_parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+
+    recheck_parser = subparsers.add_parser("recheck-rejections", help="Re-enqueue rejected tracks so they are classified again")
+    recheck_parser.add_argument("--all", action="store_true", help=f"Include rejections younger than {REJECTION_TTL_DAYS} days")
+
+    return parser.parse_args(argv)
+
 def main():
     """
     Main function to run the manager for the database population worker.
     """
+    args = parse_args()
+    if args.command == "enqueue":
+        sys.exit(run_enqueue(args))
+    if args.command == "stats":
+        sys.exit(run_stats(args))
+    if args.command == "metrics":
+        sys.exit(run_metrics(args))
+    if args.command == "recheck-rejections":
+        sys.exit(run_recheck_rejections(args))
+
     # Create DB engine
     engine = connect_to_db()
 
@@ -189,16 +581,25 @@ def main():
         print("")
 
         if choice.lower() in add_song_inputs:
-            spotify_track_id = input("[manager] Enter Spotify Track/Album/Playlist ID: ")
+            user_input = input("[manager] Enter Spotify Track/Album/Playlist IDs or URLs (separate several with spaces or commas): ")
             print("")
-            if validate_spotify_track(spotify_track_id):
-                add_song_to_queue(engine, spotify_track_id)
-            elif validate_spotify_album(spotify_track_id):
-                add_album_to_queue(engine, spotify_track_id)
-            elif validate_spotify_playlist(spotify_track_id):
-                add_playlist_to_queue(engine, spotify_track_id)
-            else:
-                print(f"[manager] Invalid Spotify Track ID: {spotify_track_id}\n")
+
+            track_ids = []
+            for reference in re.split(r"[\s,]+", user_input.strip()):
+                if not reference:
+                    continue
+                kind, spotify_id = detect_spotify_id_type(reference)
+                if kind == "track":
+                    track_ids.append(spotify_id)
+                elif kind == "album":
+                    add_album_to_queue(engine, spotify_id)
+                elif kind == "playlist":
+                    add_playlist_to_queue(engine, spotify_id)
+                else:
+                    print(f"[manager] Invalid Spotify Track ID: {reference}\n")
+
+            if track_ids:
+                add_tracks_to_queue(engine, list(dict.fromkeys(track_ids)))
         
         elif choice.lower() in view_queue_inputs:
             view_queue(engine)
@@ -0,0 +1,100 @@
+"""
+Per-job stage timings, buffered into the job_metrics table
+"""
+
+import json
+import time
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from sqlalchemy import text
+
+# Stage columns in job_metrics, in pipeline order (milliseconds)
+STAGES = ("classify", "download", "trim", "analyze", "tag", "recommend", "db_write", "enqueue")
+
+FLUSH_SIZE = 50       # Buffered rows that trigger a flush
+FLUSH_INTERVAL = 30   # Seconds after which a non-empty buffer is flushed anyway
+MAX_BUFFER = 5_000    # Rows kept when the DB is unreachable; older rows are dropped
+
+# One statement per flush: the batch is sent as a single JSON array
+INSERT_METRICS_SQL = f"""
+    INSERT INTO job_metrics (job_id, worker_id, source, seed_depth, outcome, finished_at, total_ms, {", ".join(f"{stage}_ms" for stage in STAGES)})
+    SELECT job_id, worker_id, source, seed_depth, outcome, finished_at, total_ms, {", ".join(f"{stage}_ms" for stage in STAGES)}
+    FROM jsonb_to_recordset(CAST(:rows AS jsonb)) AS r(
+        job_id BIGINT, worker_id TEXT, source TEXT, seed_depth INTEGER, outcome TEXT,
+        finished_at TIMESTAMPTZ, total_ms INTEGER, {", ".join(f"{stage}_ms INTEGER" for stage in STAGES)}
+    )
+"""
+
+@contextmanager
+def timed(timings: dict, stage: str):
+    """Add the wall time of the block to ``timings[stage]`` (seconds); a None ``timings`` disables timing."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        if timings is not None:
+            timings[stage] = timings.get(stage, 0.0) + time.perf_counter() - start
+
+def start_job_timing(job: dict) -> dict:
+    """Attach an empty timing ledger to a freshly claimed job."""
+    job["timings"] = {}
+    job["claimed_at"] = time.perf_counter()
+    return job
+
+class MetricsRecorder:
+    """Thread-safe buffer of finished-job rows; the owner flushes it with ``flush_metrics``."""
+
+    def __init__(self, worker_id: str):
+        self.worker_id = worker_id
+        self._rows = []
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+
+    def record(self, job: dict, outcome: str) -> bool:
+        """Buffer one finished job. Returns True when the buffer is due for a flush."""
+        timings = job.get("timings") or {}
+        claimed_at = job.get("claimed_at")
+        row = {
+            "job_id": job["id"],
+            "worker_id": self.worker_id,
+            "source": job.get("source"),
+            "seed_depth": job.get("seed_depth"),
+            "outcome": outcome,
+            "finished_at": datetime.now(timezone.utc).isoformat(),
+            "total_ms": round((time.perf_counter() - claimed_at) * 1000) if claimed_at else None,
+        }
+        for stage in STAGES:
+            row[f"{stage}_ms"] = round(timings[stage] * 1000) if stage in timings else None
+
+        with self._lock:
+            self._rows.append(row)
+            del self._rows[:-MAX_BUFFER]
+            return len(self._rows) >= FLUSH_SIZE or time.monotonic() - self._last_flush >= FLUSH_INTERVAL
+
+    def take(self) -> list:
+        """Remove and return the buffered rows."""
+        with self._lock:
+            rows, self._rows = self._rows, []
+            self._last_flush = time.monotonic()
+            return rows
+
+    def put_back(self, rows: list):
+        """Return rows from a failed flush to the front of the buffer."""
+        with self._lock:
+            self._rows[:0] = rows
+            del self._rows[:-MAX_BUFFER]
+
+def flush_metrics(engine, recorder: MetricsRecorder) -> int:
+    """Write the buffered rows in one statement; on failure they are kept for the next flush."""
+    rows = recorder.take()
+    if not rows:
+        return 0
+    try:
+        with engine.begin() as db:
+            db.execute(text(INSERT_METRICS_SQL), {"rows": json.dumps(rows)})
+    except Exception as e:
+        recorder.put_back(rows)
+        print(f"[metrics] Could not write {len(rows)} job metrics, will retry: {e}")
+        return 0
+    return len(rows)
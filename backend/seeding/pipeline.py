@@ -0,0 +1,181 @@
+"""
+Pipelined worker: batched job claiming with overlapping processing stages
+"""
+
+import sys
+from pathlib import Path
+
+backend_path = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_path))
+
+import time
+import queue
+import threading
+from services.spotify import get_tracks
+from worker import (
+    WORKER_ID, METRICS, REAP_INTERVAL, LeaseHeartbeat, fetch_next_jobs, release_leases,
+    validate_track_info, analyze_song_audio, fetch_similar_tracks,
+    write_job_results, fail_claimed_job, record_job_metrics, load_rejections, refresh_rejections, warm_tag_cache, load_frontier, _reap, _sleep_unless_stopped,
+)
+from rejections import REJECTIONS, REFRESH_INTERVAL
+from metrics import flush_metrics
+
+class JobPipeline:
+    """
+    Runs claimed jobs through three bounded stages, each with its own thread pool and queue:
+        1. metadata: Christian classification and recommendation lookups (network bound)
+        2. audio: download, trim and feature extraction (network + CPU bound)
+        3. write: one short transaction per job (DB bound)
+    Stages overlap across jobs, so a slow ffmpeg run never leaves the network idle and vice versa.
+    """
+
+    def __init__(self, engine, batch_size: int = 8, metadata_workers: int = 4, audio_workers: int = 2,
+                 write_workers: int = 1, lease_owner: str = WORKER_ID, on_heartbeat=None):
+        self.engine = engine
+        self.batch_size = batch_size
+        self.lease_owner = lease_owner
+        self.on_heartbeat = on_heartbeat
+        self.max_in_flight = batch_size * 2
+
+        self.metadata_queue = queue.Queue(maxsize=batch_size)
+        self.audio_queue = queue.Queue(maxsize=audio_workers * 2)
+        self.write_queue = queue.Queue(maxsize=write_workers * 4)
+
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._threads = (
+            [threading.Thread(target=self._stage, args=(self.metadata_queue, self._metadata), name=f"metadata-{i}", daemon=True) for i in range(metadata_workers)] +
+            [threading.Thread(target=self._stage, args=(self.audio_queue, self._audio), name=f"audio-{i}", daemon=True) for i in range(audio_workers)] +
+            [threading.Thread(target=self._stage, args=(self.write_queue, self._write), name=f"write-{i}", daemon=True) for i in range(write_workers)]
+        )
+
+    @property
+    def in_flight(self) -> int:
+        with self._lock:
+            return self._in_flight
+
+    def _finish(self, job: dict, error: Exception = None):
+        """Account for a job leaving the pipeline, recording a failure if there was one."""
+        if error is not None:
+            fail_claimed_job(self.engine, job, error, self.lease_owner)
+        else:
+            print(f"[pipeline] Job {job['id']} completed successfully.")
+            record_job_metrics(self.engine, job, "done")
+        with self._lock:
+            self._in_flight -= 1
+        if self.on_heartbeat:
+            self.on_heartbeat(True)
+
+    def _stage(self, inbox: queue.Queue, handler):
+        """Stage loop: handle items until stopping and the pipeline has drained."""
+        while True:
+            try:
+                item = inbox.get(timeout=0.5)
+            except queue.Empty:
+                if self._stopping.is_set() and self.in_flight == 0:
+                    return
+                continue
+
+            job = item[0]
+            try:
+                handler(*item)
+            except Exception as error:
+                self._finish(job, error)
+
+    def _metadata(self, job: dict):
+        song_info, isrc, tags, method = validate_track_info(self.engine, job)
+        recommended_tracks = fetch_similar_tracks(job)
+        self.audio_queue.put((job, song_info, isrc, tags, method, recommended_tracks))
+
+    def _audio(self, job: dict, song_info: dict, isrc: str, tags: list, method: list, recommended_tracks: list):
+        audio_features = analyze_song_audio(song_info, job, tags, method)
+        self.write_queue.put((job, song_info, isrc, tags, method, audio_features, recommended_tracks))
+
+    def _write(self, job: dict, song_info: dict, isrc: str, tags: list, method: list, audio_features: dict, recommended_tracks: list):
+        write_job_results(self.engine, job, song_info, isrc, tags, method, audio_features, recommended_tracks, self.lease_owner)
+        self._finish(job)
+
+    def claim(self) -> int:
+        """
+        Claim as many jobs as there is pipeline capacity for, in one round trip.
+        Track metadata for the whole batch is prefetched with the batch endpoint.
+        Returns the number of jobs claimed.
+        """
+        capacity = min(self.batch_size, self.max_in_flight - self.in_flight)
+        if capacity <= 0:
+            return 0
+
+        with self.engine.begin() as db:
+            jobs = fetch_next_jobs(db, self.lease_owner, limit=capacity)
+        if not jobs:
+            return 0
+
+        try:
+            get_tracks([job["spotify_track_id"] for job in jobs]) # Warm the Spotify cache for the metadata stage
+        except Exception as e:
+            print(f"[pipeline] Batch track prefetch failed, jobs will look tracks up individually: {e}")
+
+        with self._lock:
+            self._in_flight += len(jobs)
+        for job in jobs:
+            print(f"[pipeline] Claimed job {job['id']} for track {job['spotify_track_id']} from source {job['source']}")
+            self.metadata_queue.put((job,))
+        return len(jobs)
+
+    def run(self, should_stop=lambda: False):
+        """Claim and process jobs until ``should_stop()`` returns True, then drain in-flight jobs."""
+        load_rejections(self.engine)
+        warm_tag_cache(self.engine)
+        load_frontier(self.engine)
+        for thread in self._threads:
+            thread.start()
+
+        heartbeat = LeaseHeartbeat(self.engine, self.lease_owner)
+        heartbeat.start()
+        next_reap = 0.0
+        next_refresh = time.monotonic() + REFRESH_INTERVAL
+
+        try:
+            while not should_stop():
+                try:
+                    claimed = self.claim()
+                except Exception as e:
+                    print(f"[pipeline] Database transaction error (connection drop?): {e}")
+                    _sleep_unless_stopped(5, should_stop)
+                    continue
+
+                if time.monotonic() >= next_reap:
+                    next_reap = time.monotonic() + REAP_INTERVAL
+                    _reap(self.engine)
+                if time.monotonic() >= next_refresh:
+                    next_refresh = time.monotonic() + REFRESH_INTERVAL
+                    refresh_rejections(self.engine)
+
+                if claimed == 0:
+                    if self.in_flight == 0:
+                        if self.on_heartbeat:
+                            self.on_heartbeat(False)
+                        print("[pipeline] No jobs found, sleeping for 3 seconds...")
+                        _sleep_unless_stopped(3, should_stop)
+                    else:
+                        _sleep_unless_stopped(0.5, should_stop)
+
+            print(f"[pipeline] Draining {self.in_flight} in-flight jobs...")
+            self._stopping.set()
+            for thread in self._threads:
+                thread.join()
+        finally:
+            self._stopping.set()
+            heartbeat.stop()
+            REJECTIONS.save()
+            flush_metrics(self.engine, METRICS)
+            try:
+                with self.engine.begin() as db:
+                    release_leases(db, self.lease_owner)
+            except Exception as e:
+                print(f"[pipeline] Could not release leases on shutdown (they will expire): {e}")
+
+def run_pipeline(engine, should_stop=lambda: False, on_heartbeat=None, batch_size: int = 8):
+    """Pipelined counterpart of ``worker.run_worker``."""
+    JobPipeline(engine, batch_size=batch_size, on_heartbeat=on_heartbeat).run(should_stop)
@@ -0,0 +1,179 @@
+"""
+Re-indexer: refresh the audio features of the stalest catalogued songs under a rate budget
+"""
+
+import sys
+import json
+import time
+import signal
+import argparse
+import threading
+from pathlib import Path
+
+backend_path = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_path))
+
+from sqlalchemy import text
+from db_helpers import connect_to_db, test_db_connection, weight_features
+from worker import cleanup_job_files, _sleep_unless_stopped
+from services.spotify import search_song, features_to_vector, sp
+from main import process_single
+
+REINDEX_BATCH_SIZE = 20   # Songs selected and written back per round trip
+REINDEX_RATE = 6.0        # Songs per minute; each costs a Spotify lookup, a YouTube download and a ReccoBeats call
+REINDEX_BURST = 3         # Songs that may start back to back after an idle period
+REINDEX_MIN_AGE = 30      # Days before an indexed song is due again; never-indexed songs are always due
+REINDEX_IDLE = 600        # Seconds to wait when no song is due
+
+# Oldest first, never-indexed songs before everything else (christian_songs_last_indexed, migration 0006)
+STALEST_SONGS_SQL = """
+    SELECT track_id, title, artist, last_indexed
+    FROM christian_songs
+    WHERE last_indexed IS NULL OR last_indexed < NOW() - make_interval(days => :min_age)
+    ORDER BY last_indexed ASC NULLS FIRST, track_id ASC
+    LIMIT :limit
+"""
+
+# One statement per batch. Songs whose analysis failed keep their vectors but still move to the
+# back of the line; rows re-indexed by someone else since they were selected are left alone.
+UPDATE_FEATURES_SQL = """
+    UPDATE christian_songs s
+    SET audio_features = COALESCE(r.audio_features, s.audio_features),
+        weighted_features = COALESCE(r.weighted_features, s.weighted_features),
+        num_indexes = s.num_indexes + CASE WHEN r.audio_features IS NULL THEN 0 ELSE 1 END,
+        last_indexed = NOW()
+    FROM jsonb_to_recordset(CAST(:rows AS jsonb)) AS r(
+        track_id TEXT, audio_features DOUBLE PRECISION[], weighted_features DOUBLE PRECISION[], seen_indexed TIMESTAMPTZ
+    )
+    WHERE s.track_id = r.track_id
+      AND s.last_indexed IS NOT DISTINCT FROM r.seen_indexed
+"""
+
+class RateBudget:
+    """Token bucket: ``rate`` acquisitions per minute on average, at most ``burst`` at once."""
+
+    def __init__(self, rate: float = REINDEX_RATE, burst: int = REINDEX_BURST):
+        self.rate = rate / 60.0
+        self.burst = max(1, burst)
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, should_stop=lambda: False) -> bool:
+        """Block until a token is available; returns False if ``should_stop()`` became True first."""
+        while not should_stop():
+            with self._lock:
+                self._refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return True
+                wait = (1 - self.tokens) / self.rate
+            _sleep_unless_stopped(wait, should_stop)
+        return False
+
+def select_stalest(engine, limit: int = REINDEX_BATCH_SIZE, min_age_days: int = REINDEX_MIN_AGE) -> list:
+    """Return the songs most overdue for re-indexing."""
+    with engine.connect() as db:
+        rows = db.execute(text(STALEST_SONGS_SQL), {"limit": limit, "min_age": min_age_days})
+        return [dict(row._mapping) for row in rows]
+
+def reanalyze_song(song: dict, idx: int):
+    """Re-run feature extraction for one catalogued song; returns the averaged features, or None on failure."""
+    try:
+        details = search_song(track_id=song["track_id"])
+        if not details or "error" in details:
+            raise ValueError(details.get("error") if details else "Spotify lookup failed")
+        # Tags are kept as stored; passing them skips the Last.fm lookups
+        song_data = process_single(song["title"], song["artist"], idx=idx, details=details, tags=([], []),
+                                   use_catalogue=False)
+        return song_data["audio_features"]["average"]
+    except Exception as e:
+        print(f"[reindexer] Could not re-analyze {song['track_id']} ({song['title']} by {song['artist']}): {e}")
+        return None
+    finally:
+        cleanup_job_files(idx)
+
+def write_batch(engine, results: list) -> int:
+    """Write ``(song, features or None)`` pairs back in one UPDATE; returns the rows updated."""
+    rows = []
+    for song, features in results:
+        rows.append({
+            "track_id": song["track_id"],
+            "audio_features": features_to_vector(features) if features else None,
+            "weighted_features": weight_features(features) if features else None,
+            "seen_indexed": song["last_indexed"].isoformat() if song["last_indexed"] else None,
+        })
+    with engine.begin() as db:
+        return db.execute(text(UPDATE_FEATURES_SQL), {"rows": json.dumps(rows)}).rowcount
+
+def reindex_batch(engine, budget: RateBudget, songs: list, should_stop=lambda: False) -> tuple:
+    """Re-analyze a batch under the rate budget and write it back; returns ``(refreshed, failed)``."""
+    results = []
+    for song in songs:
+        if not budget.acquire(should_stop):
+            break
+        # Negative idx keeps temp files apart from worker jobs sharing the directory
+        results.append((song, reanalyze_song(song, -(len(results) + 1))))
+
+    if not results:
+        return 0, 0
+    updated = write_batch(engine, results)
+    failed = sum(1 for _, features in results if features is None)
+    print(f"[reindexer] Re-indexed {len(results) - failed} songs ({failed} failed, {len(results) - updated} changed elsewhere)")
+    return len(results) - failed, failed
+
+def run_reindexer(engine, rate: float = REINDEX_RATE, batch_size: int = REINDEX_BATCH_SIZE,
+                  min_age_days: int = REINDEX_MIN_AGE, once: bool = False, should_stop=lambda: False):
+    """Keep refreshing the stalest songs until ``should_stop()`` (or, with ``once``, until none are due)."""
+    budget = RateBudget(rate)
+    total = 0
+    while not should_stop():
+        try:
+            songs = select_stalest(engine, batch_size, min_age_days)
+            if not songs:
+                if once:
+                    break
+                print(f"[reindexer] No songs due, sleeping for {REINDEX_IDLE} seconds...")
+                _sleep_unless_stopped(REINDEX_IDLE, should_stop)
+                continue
+            refreshed, _ = reindex_batch(engine, budget, songs, should_stop)
+            total += refreshed
+        except Exception as e:
+            print(f"[reindexer] Database transaction error (connection drop?): {e}")
+            _sleep_unless_stopped(5, should_stop)
+    print(f"[reindexer] Stopped after re-indexing {total} songs.")
+    return total
+
+def main():
+    parser = argparse.ArgumentParser(description="Refresh stored audio features, stalest songs first")
+    parser.add_argument("--rate", type=float, default=REINDEX_RATE, help="Songs re-analyzed per minute")
+    parser.add_argument("--batch-size", type=int, default=REINDEX_BATCH_SIZE, help="Songs selected and written per round trip")
+    parser.add_argument("--min-age-days", type=int, default=REINDEX_MIN_AGE, help="Days before an indexed song is due again")
+    parser.add_argument("--once", action="store_true", help="Exit when no song is due instead of waiting")
+    args = parser.parse_args()
+
+    engine = connect_to_db()
+    test_db_connection(engine)
+
+    stop_event = threading.Event()
+    def request_stop(signum, _frame):
+        print(f"[reindexer] Received signal {signum}, finishing the current song...")
+        stop_event.set()
+    signal.signal(signal.SIGTERM, request_stop)
+    signal.signal(signal.SIGINT, request_stop)
+
+    try:
+        run_reindexer(engine, args.rate, args.batch_size, args.min_age_days, args.once, stop_event.is_set)
+    finally:
+        print(f"[reindexer] Spotify cache stats: {sp.stats.snapshot()}")
+        # Only our own (negative) indices: the temp directory may be shared with running workers
+        for idx in range(1, args.batch_size + 1):
+            cleanup_job_files(-idx)
+
+if __name__ == "__main__":
+    main()
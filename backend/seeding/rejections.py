@@ -0,0 +1,222 @@
+"""
+Remembered rejections: tracks classified as non-Christian are not crawled again until the rejection expires
+"""
+
+import os
+import sys
+import math
+import pickle
+import hashlib
+import threading
+from pathlib import Path
+
+backend_path = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_path))
+
+from sqlalchemy import text
+from services.cache import CACHE_DIR
+
+BLOOM_CAPACITY = 4_000_000  # Keys (track ids + ISRCs) before the false-positive rate degrades
+BLOOM_ERROR_RATE = 0.01     # ~4.8 MB of bits at full capacity
+BLOOM_SNAPSHOT_FILE = os.path.join(CACHE_DIR, "rejections.bloom")
+BLOOM_VERSION = 1           # Bump when the bit layout or hashing changes
+REFRESH_INTERVAL = 60       # Seconds between pulls of rows rejected by other workers
+REJECTION_TTL_DAYS = 180    # Rejections older than this no longer block a track, so tags that changed get re-checked
+
+# Live rows rejected after the watermark; the 10-minute overlap catches rows committed late
+REFRESH_SQL = f"""
+    SELECT spotify_track_id, isrc, rejected_at
+    FROM rejected_tracks
+    WHERE rejected_at > NOW() - INTERVAL '{REJECTION_TTL_DAYS} days'
+      AND (CAST(:watermark AS timestamptz) IS NULL
+           OR rejected_at > CAST(:watermark AS timestamptz) - INTERVAL '10 minutes')
+    ORDER BY rejected_at
+"""
+
+# A re-check that rejects the track again restarts its TTL
+INSERT_REJECTION_SQL = """
+    INSERT INTO rejected_tracks (spotify_track_id, isrc, reason)
+    VALUES (:track_id, :isrc, :reason)
+    ON CONFLICT (spotify_track_id) DO UPDATE
+    SET isrc = EXCLUDED.isrc, reason = EXCLUDED.reason, rejected_at = NOW()
+"""
+
+CONFIRM_REJECTED_SQL = f"""
+    SELECT spotify_track_id, isrc
+    FROM rejected_tracks
+    WHERE (spotify_track_id = ANY(:track_ids) OR isrc = ANY(:isrcs))
+      AND rejected_at > NOW() - INTERVAL '{REJECTION_TTL_DAYS} days'
+"""
+
+# Re-check path: put the failed queue rows of rejected tracks back to pending and forget the rejection,
+# so the next classification decides again. Only expired rejections unless :include_live.
+RECHECK_REJECTIONS_SQL = f"""
+    WITH requeued AS (
+        UPDATE populate_queue AS q
+        SET status = 'pending',
+            attempt_count = 0,
+            last_error = NULL,
+            scheduled_at = NOW(),
+            lease_owner = NULL,
+            lease_expires_at = NULL
+        FROM rejected_tracks AS r
+        WHERE q.spotify_track_id = r.spotify_track_id
+          AND q.status = 'failed'
+          AND (CAST(:include_live AS boolean) OR r.rejected_at <= NOW() - INTERVAL '{REJECTION_TTL_DAYS} days')
+        RETURNING q.spotify_track_id
+    )
+    DELETE FROM rejected_tracks
+    WHERE spotify_track_id IN (SELECT spotify_track_id FROM requeued)
+    RETURNING spotify_track_id
+"""
+
+class TrackRejected(ValueError):
+    """Raised when a job's track is definitively not wanted in the catalogue, so it should never be retried."""
+
+    def __init__(self, message: str, track_id: str, isrc: str = None):
+        super().__init__(message)
+        self.track_id = track_id
+        self.isrc = isrc
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings (double hashing on one BLAKE2b digest)."""
+
+    def __init__(self, capacity: int = BLOOM_CAPACITY, error_rate: float = BLOOM_ERROR_RATE):
+        self.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key: str):
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, key: str) -> bool:
+        """Set the key's bits; returns False (and leaves ``count`` alone) when they were all set already."""
+        new = False
+        for position in self._positions(key):
+            if not self.bits[position >> 3] & (1 << (position & 7)):
+                self.bits[position >> 3] |= 1 << (position & 7)
+                new = True
+        if new:
+            self.count += 1
+        return new
+
+    def __contains__(self, key: str) -> bool:
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+class RejectionFilter:
+    """
+    In-memory fast path over the ``rejected_tracks`` table.
+    A hit only means "maybe", so callers confirm hits against the table (see ``confirm_rejected``).
+    A miss is definitive up to the last ``refresh``: workers pull rows rejected by their siblings
+    every ``REFRESH_INTERVAL`` seconds, so a track rejected elsewhere can slip through for that long.
+    The bits are snapshotted to disk with a watermark so a restart only streams rows rejected
+    since the last snapshot.
+    Bits are never cleared, so keys whose rejection passed ``REJECTION_TTL_DAYS`` stay in the filter;
+    their hits fail confirmation, so the track can be enqueued and classified again.
+    """
+
+    def __init__(self, snapshot_file: str = BLOOM_SNAPSHOT_FILE):
+        self.snapshot_file = snapshot_file
+        self.bloom = BloomFilter()
+        self.watermark = None # rejected_at of the newest row already in the filter
+        self.loaded = False
+        self._lock = threading.Lock()
+
+    def add(self, track_id: str, isrc: str = None) -> bool:
+        """Add a rejected track; returns whether the filter did not already hold it."""
+        with self._lock:
+            new = self.bloom.add(f"t:{track_id}")
+            if isrc:
+                new = self.bloom.add(f"i:{isrc}") or new
+            return new
+
+    def might_be_rejected(self, track_id: str, isrc: str = None) -> bool:
+        with self._lock:
+            return f"t:{track_id}" in self.bloom or bool(isrc and f"i:{isrc}" in self.bloom)
+
+    def add_rows(self, rows) -> int:
+        """
+        Add ``(spotify_track_id, isrc, rejected_at)`` rows, advancing the watermark.
+        Returns how many rows were new to the filter, so the overlap window re-read on every refresh counts nothing.
+        """
+        added = 0
+        for track_id, isrc, rejected_at in rows:
+            if self.add(track_id, isrc):
+                added += 1
+            if self.watermark is None or rejected_at > self.watermark:
+                self.watermark = rejected_at
+        return added
+
+    def load(self, engine):
+        """Restore the snapshot (if any) and stream the rows rejected after it."""
+        self.restore()
+        added = self.refresh(engine)
+        self.loaded = True
+        if added:
+            self.save()
+        print(f"[rejections] Loaded {self.bloom.count} rejected keys ({added} new since the last snapshot)")
+
+    def refresh(self, engine) -> int:
+        """Stream the rows rejected after the watermark (by any worker); returns how many were new."""
+        with engine.connect() as db:
+            rows = db.execution_options(stream_results=True, yield_per=10_000).execute(text(REFRESH_SQL), {"watermark": self.watermark})
+            return self.add_rows(rows)
+
+    def restore(self):
+        """Load the on-disk snapshot if it matches the current filter layout."""
+        try:
+            with open(self.snapshot_file, "rb") as handle:
+                version, size, hashes, watermark, count, bits = pickle.load(handle)
+        except (OSError, pickle.UnpicklingError, EOFError, ValueError, TypeError):
+            return
+        if version != BLOOM_VERSION or size != self.bloom.size or hashes != self.bloom.hashes:
+            return
+        self.bloom.bits = bytearray(bits)
+        self.bloom.count = count
+        self.watermark = watermark
+
+    def save(self):
+        """Write the snapshot atomically; failures only cost a longer rebuild next start."""
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.snapshot_file)), exist_ok=True)
+            tmp_file = f"{self.snapshot_file}.{os.getpid()}.tmp"
+            with self._lock:
+                state = (BLOOM_VERSION, self.bloom.size, self.bloom.hashes, self.watermark, self.bloom.count, bytes(self.bloom.bits))
+            with open(tmp_file, "wb") as handle:
+                pickle.dump(state, handle, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_file, self.snapshot_file)
+        except OSError as e:
+            print(f"[rejections] Could not save Bloom snapshot: {e}")
+
+REJECTIONS = RejectionFilter()
+
+def record_rejection(db, track_id: str, isrc: str, reason: str):
+    """Persist a rejection and add it to this process's filter."""
+    db.execute(text(INSERT_REJECTION_SQL), {"track_id": track_id, "isrc": isrc, "reason": reason})
+    REJECTIONS.add(track_id, isrc)
+
+def recheck_rejections(db, include_live: bool = False) -> int:
+    """Re-enqueue rejected tracks for classification (expired rejections only, unless ``include_live``); returns how many."""
+    return len(db.execute(text(RECHECK_REJECTIONS_SQL), {"include_live": include_live}).fetchall())
+
+def rejection_suspects(recommended_tracks: list, rejections: RejectionFilter = REJECTIONS):
+    """Return the track ids and ISRCs of candidates the Bloom filter flags; usually both empty."""
+    track_ids, isrcs = [], []
+    for track in recommended_tracks:
+        track_id, isrc = track.get("track_id"), track.get("isrc")
+        if track_id and rejections.might_be_rejected(track_id, isrc):
+            track_ids.append(track_id)
+            if isrc:
+                isrcs.append(isrc)
+    return track_ids, isrcs
+
+def confirm_rejected(db, track_ids: list, isrcs: list) -> set:
+    """Check Bloom hits against the table; returns the rejected track ids and ISRCs."""
+    if not track_ids:
+        return set()
+    rows = db.execute(text(CONFIRM_REJECTED_SQL), {"track_ids": track_ids, "isrcs": isrcs}).fetchall()
+    return {row.spotify_track_id for row in rows} | {row.isrc for row in rows if row.isrc}
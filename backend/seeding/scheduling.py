@@ -0,0 +1,43 @@
+"""
+Queue scheduling policy: which pending job a worker should claim next
+
+Workers claim in ``(tier, scheduled_at, id)`` order, where the tier is manual (``priority`` 0)
+or crawl (everything else). A manual seed therefore overtakes any crawl backlog, however
+old. Within a tier, every job gets a ``scheduled_at`` timestamp when it is enqueued, and
+workers claim the earliest one. That timestamp is the enqueue time plus a delay:
+    - priority: auto-seeded tracks wait PRIORITY_DELAY per seed depth behind shallower ones
+    - fairness: the n-th track of one batch (playlist, album, parent track) is pushed back
+      n * FAIRNESS_SPACING, capped at MAX_FAIRNESS_DELAY, so a large batch interleaves with
+      others instead of starving them, without its tail falling hours behind
+    - aging: delays are fixed at enqueue time, so a deep crawl job that has waited longer
+      than its delay is claimed before newer shallow ones
+"""
+
+MANUAL_PRIORITY = 0       # Sources starting with "manual_"; the only jobs in the first claim tier
+AUTO_PRIORITY = 1         # Everything else (auto-seeded crawl)
+MAX_PRIORITY = 10         # Depths past this stop lowering priority further
+PRIORITY_DELAY = 15 * 60  # Seconds of waiting one priority level is worth within a tier
+FAIRNESS_SPACING = 5      # Seconds between consecutive jobs of the same batch
+MAX_FAIRNESS_DELAY = 3600 # Seconds a batch's tail is pushed back at most
+
+# Claim order; populate_queue_pending_tier (migration 0007) is built on the same expression
+CLAIM_ORDER_SQL = "(priority > 0) ASC, scheduled_at ASC, id ASC"
+
+def job_priority(source: str, seed_depth: int = 0) -> int:
+    """Lower runs first: manual seeds, then auto-seeded tracks one level per hop."""
+    base = MANUAL_PRIORITY if source.startswith("manual") else AUTO_PRIORITY
+    return min(base + (seed_depth or 0), MAX_PRIORITY)
+
+def claim_key(job: dict) -> tuple:
+    """Sort key matching ``CLAIM_ORDER_SQL``, for jobs claimed together."""
+    return (job["priority"] > MANUAL_PRIORITY, job["scheduled_at"], job["id"])
+
+def schedule_delays(priorities: list, first_rank: int = 0) -> list:
+    """
+    Return the delay in seconds after ``NOW()`` at which each job of one batch becomes due.
+    ``first_rank`` continues the fairness spacing when a batch is inserted in several chunks.
+    """
+    return [
+        float(priority * PRIORITY_DELAY + min((first_rank + rank) * FAIRNESS_SPACING, MAX_FAIRNESS_DELAY))
+        for rank, priority in enumerate(priorities)
+    ]
@@ -0,0 +1,161 @@
+"""
+Supervisor running several seeding workers in parallel processes
+"""
+
+import os
+import sys
+from pathlib import Path
+
+backend_path = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_path))
+
+import time
+import shutil
+import signal
+import argparse
+import multiprocessing
+
+WORKSPACE_ROOT = backend_path / "workspaces"
+HEALTH_INTERVAL = 30       # Seconds between health summaries
+STALE_HEARTBEAT = 15 * 60  # Seconds without a heartbeat before a worker is reported as stuck
+RESTART_BACKOFF = 5        # Seconds to wait before restarting a crashed worker
+DRAIN_TIMEOUT = 10 * 60    # Seconds to let in-flight jobs finish after SIGTERM
+
+def _worker_process(index: int, workspace: str, stop_event, status, engine_options: dict, pipeline_batch: int = 0):
+    """
+    Entry point of one worker process.
+    The workspace is set before the worker modules are imported so their temp directory lands inside it.
+    """
+    os.environ["WORSHIPIFY_TEMP_DIR"] = os.path.join(workspace, "temp")
+
+    # Ctrl+C goes to the whole process group; let the supervisor decide when to stop
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, lambda *_: stop_event.set())
+
+    import worker
+    from db_helpers import connect_to_db
+
+    def heartbeat(handled_job: bool):
+        status[0] = time.time()
+        if handled_job:
+            status[1] += 1
+
+    engine = connect_to_db(**engine_options)
+    print(f"[supervisor] Worker {index} started (pid {os.getpid()}, workspace {workspace})")
+    status[0] = time.time()
+    if pipeline_batch:
+        from pipeline import run_pipeline
+        run_pipeline(engine, should_stop=stop_event.is_set, on_heartbeat=heartbeat, batch_size=pipeline_batch)
+    else:
+        worker.run_worker(engine, should_stop=stop_event.is_set, on_heartbeat=heartbeat)
+    worker.cleanup_temp_dir()
+    engine.dispose()
+    print(f"[supervisor] Worker {index} drained and exited")
+
+class WorkerSlot:
+    """Book-keeping for one supervised worker process."""
+
+    def __init__(self, index: int, workspace: Path, context):
+        self.index = index
+        self.workspace = workspace
+        self.status = context.Array("d", 2) # [last heartbeat, jobs handled]
+        self.process = None
+        self.restarts = 0
+        self.restart_at = 0.0
+
+    def start(self, context, stop_event, engine_options: dict, pipeline_batch: int = 0):
+        shutil.rmtree(self.workspace, ignore_errors=True)
+        self.workspace.mkdir(parents=True, exist_ok=True)
+        self.status[0] = time.time()
+        self.process = context.Process(
+            target=_worker_process,
+            args=(self.index, str(self.workspace), stop_event, self.status, engine_options, pipeline_batch),
+            name=f"worshipify-worker-{self.index}",
+        )
+        self.process.start()
+
+def _print_health(slots: list):
+    """Print one line per worker with liveness, heartbeat age and job count."""
+    now = time.time()
+    for slot in slots:
+        alive = slot.process is not None and slot.process.is_alive()
+        age = now - slot.status[0]
+        state = "alive" if alive else "down"
+        if alive and age > STALE_HEARTBEAT:
+            state = "stuck?"
+        print(f"[supervisor] worker {slot.index}: {state}, last heartbeat {age:.0f}s ago, "
+              f"jobs handled {int(slot.status[1])}, restarts {slot.restarts}")
+
+def supervise(num_workers: int, engine_options: dict, workspace_root: Path = WORKSPACE_ROOT, drain_timeout: float = DRAIN_TIMEOUT,
+              pipeline_batch: int = 0):
+    """
+    Run ``num_workers`` worker processes until SIGTERM/SIGINT, restarting any that crash.
+    On shutdown every worker finishes its current job before exiting; a worker killed
+    past the drain timeout leaves a lease that expires and is requeued by the reaper.
+    A non-zero ``pipeline_batch`` runs each process as a pipelined worker claiming that many jobs at a time.
+    """
+    context = multiprocessing.get_context("spawn")
+    stop_event = context.Event()
+
+    def request_stop(signum, _frame):
+        if not stop_event.is_set():
+            print(f"[supervisor] Received signal {signum}, draining workers...")
+        stop_event.set()
+
+    signal.signal(signal.SIGTERM, request_stop)
+    signal.signal(signal.SIGINT, request_stop)
+
+    slots = [WorkerSlot(index, workspace_root / f"worker-{index}", context) for index in range(num_workers)]
+    for slot in slots:
+        slot.start(context, stop_event, engine_options, pipeline_batch)
+
+    next_health = time.monotonic() + HEALTH_INTERVAL
+    while not stop_event.is_set():
+        for slot in slots:
+            if slot.process.is_alive():
+                continue
+            if slot.restart_at == 0.0:
+                print(f"[supervisor] Worker {slot.index} exited with code {slot.process.exitcode}, restarting in {RESTART_BACKOFF}s")
+                slot.restart_at = time.monotonic() + RESTART_BACKOFF
+            elif time.monotonic() >= slot.restart_at:
+                slot.restarts += 1
+                slot.restart_at = 0.0
+                slot.start(context, stop_event, engine_options, pipeline_batch)
+
+        if time.monotonic() >= next_health:
+            _print_health(slots)
+            next_health = time.monotonic() + HEALTH_INTERVAL
+
+        time.sleep(1)
+
+    # Drain: workers stop after their current job; force-stop anything past the deadline
+    deadline = time.monotonic() + drain_timeout
+    for slot in slots:
+        slot.process.join(max(0.0, deadline - time.monotonic()))
+    for slot in slots:
+        if slot.process.is_alive():
+            print(f"[supervisor] Worker {slot.index} did not drain in time, terminating (its lease expires and the job is requeued)")
+            slot.process.kill()
+            slot.process.join()
+
+    shutil.rmtree(workspace_root, ignore_errors=True)
+    print("[supervisor] All workers stopped.")
+
+def main():
+    """
+    Start the supervisor from the command line.
+    """
+    parser = argparse.ArgumentParser(description="Run several seeding workers in parallel")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Number of worker processes (default: CPU count)")
+    parser.add_argument("--pool-size", type=int, default=2, help="DB connection pool size per worker process")
+    parser.add_argument("--pipeline-batch", type=int, default=0, help="Run pipelined workers claiming this many jobs at a time (0 = one job at a time)")
+    parser.add_argument("--drain-timeout", type=float, default=DRAIN_TIMEOUT, help="Seconds to wait for in-flight jobs on shutdown")
+    args = parser.parse_args()
+
+    # Pipelined workers touch the DB from several stage threads at once
+    engine_options = {"pool_size": args.pool_size, "max_overflow": 6 if args.pipeline_batch else 0}
+    print(f"[supervisor] Starting {args.workers} workers")
+    supervise(args.workers, engine_options, drain_timeout=args.drain_timeout, pipeline_batch=args.pipeline_batch)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Process-wide tag name -> id cache for song tag inserts
+"""
+
+import threading
+from sqlalchemy import text
+
+LOAD_TAGS_SQL = "SELECT id, name FROM tags"
+
+# Inserts missing names and returns ids for all of them in one round trip. DO UPDATE (instead of
+# DO NOTHING) makes conflicting rows visible to RETURNING, so a worker racing another on the same
+# new tag still gets its id; sorting keeps concurrent upserts from deadlocking.
+UPSERT_TAGS_SQL = """
+    WITH input AS (
+        SELECT DISTINCT name FROM unnest(CAST(:names AS text[])) AS t(name) ORDER BY name
+    )
+    INSERT INTO tags (name)
+    SELECT name FROM input
+    ON CONFLICT (name) DO UPDATE SET name = EXCLUDED.name
+    RETURNING id, name
+"""
+
+class TagCache:
+    """
+    Tag ids by normalized name. The vocabulary is small and append-only, so it is loaded once at
+    worker start and only ever grows. Ids created inside a transaction must be ``remember``ed only
+    after it commits, otherwise a rollback would leave the cache pointing at a tag that never existed.
+    """
+
+    def __init__(self):
+        self._ids = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def remember(self, tag_ids: dict):
+        with self._lock:
+            self._ids.update(tag_ids)
+
+    def lookup(self, names) -> tuple:
+        """Return ``({name: id}, [missing names])`` for the given names."""
+        found, missing = {}, []
+        with self._lock:
+            for name in names:
+                tag_id = self._ids.get(name)
+                if tag_id is None:
+                    missing.append(name)
+                else:
+                    found[name] = tag_id
+        return found, missing
+
+    def warm(self, db) -> int:
+        """Load the whole tags table; returns the number of cached tags."""
+        self.remember({row.name: row.id for row in db.execute(text(LOAD_TAGS_SQL))})
+        return len(self)
+
+TAG_CACHE = TagCache()
+
+def upsert_tags(db, names: list) -> dict:
+    """Ensure the tags exist and return ``{name: id}`` for them (single statement, concurrency-safe)."""
+    if not names:
+        return {}
+    return {row.name: row.id for row in db.execute(text(UPSERT_TAGS_SQL), {"names": list(names)})}
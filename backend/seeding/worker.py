@@ -9,16 +9,177 @@ from pathlib import Path
 backend_path = Path(__file__).parent.parent
 sys.path.insert(0, str(backend_path))
 
+import glob
 import time
+import argparse
+import uuid
+import socket
+import threading
 from db_helpers import connect_to_db, test_db_connection, weight_features
+from scheduling import CLAIM_ORDER_SQL, claim_key, job_priority, schedule_delays
+from tag_cache import TAG_CACHE, upsert_tags
+from metrics import MetricsRecorder, flush_metrics, start_job_timing, timed
+from rejections import REJECTIONS, REFRESH_INTERVAL, TrackRejected, record_rejection, rejection_suspects, confirm_rejected
+from frontier import FRONTIER, artist_key, refresh_budget, fetch_artist_counts, load_coverage
 from services.lastfm import is_song_christian, get_similar_tracks_by_id
-from services.spotify import features_to_vector
+from services.spotify import features_to_vector, sp
 from main import process_single
 from typing import Optional
 from sqlalchemy import text
-TEMP_DIR = "temp"
+TEMP_DIR = os.getenv("WORSHIPIFY_TEMP_DIR", "temp")
 TEMP_BASE_FILENAME = "audio"
 
+# Job leases: a claimed job belongs to this worker until its lease expires
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+LEASE_SECONDS = 300       # Lease length granted on claim and on every renewal
+HEARTBEAT_INTERVAL = 60   # Seconds between lease renewals
+REAP_INTERVAL = 60        # Seconds between sweeps for expired leases
+MAX_ATTEMPTS = 3          # Expired leases past this many attempts are marked failed
+
+# Queue and result statements, shared with async_worker (via db_helpers.AsyncQuery) and
+# tests/test_query_plans.py, so every runtime executes the same SQL
+CLAIM_JOBS_SQL = f"""
+    UPDATE populate_queue
+    SET status = 'processing',
+        lease_owner = :lease_owner,
+        lease_expires_at = NOW() + make_interval(secs => :lease_seconds),
+        last_attempt_at = NOW(),
+        last_error = NULL
+    WHERE id IN (
+        SELECT id
+        FROM populate_queue
+        WHERE status = 'pending'
+        ORDER BY {CLAIM_ORDER_SQL}
+        LIMIT :limit
+        FOR UPDATE SKIP LOCKED
+    )
+    RETURNING id,
+              spotify_track_id,
+              source,
+              enqueued_at,
+              status,
+              seed_depth,
+              seed_parent_spotify_id,
+              seed_batch_id,
+              priority,
+              scheduled_at
+"""
+
+REAP_EXPIRED_SQL = """
+    UPDATE populate_queue
+    SET status = CASE WHEN attempt_count + 1 >= :max_attempts THEN 'failed' ELSE 'pending' END,
+        attempt_count = attempt_count + 1,
+        last_error = 'Lease expired before the job finished',
+        lease_owner = NULL,
+        lease_expires_at = NULL
+    WHERE status = 'processing'
+      AND lease_expires_at < NOW()
+    RETURNING status
+"""
+
+SONG_EXISTS_SQL = """
+    SELECT isrc
+    FROM christian_songs
+    WHERE isrc = :isrc
+"""
+
+COMPLETE_JOB_SQL = """
+    UPDATE populate_queue
+    SET status = 'done',
+        lease_owner = NULL,
+        lease_expires_at = NULL
+    WHERE id = :id
+      AND lease_owner = :lease_owner
+      AND status = 'processing'
+    RETURNING id
+"""
+
+FAIL_JOB_SQL = """
+    UPDATE populate_queue
+    SET status = 'failed',
+        last_error = :error,
+        last_attempt_at = NOW(),
+        attempt_count = attempt_count + 1,
+        lease_owner = NULL,
+        lease_expires_at = NULL
+    WHERE id = :id
+      AND lease_owner = :lease_owner
+"""
+
+RENEW_LEASES_SQL = """
+    UPDATE populate_queue
+    SET lease_expires_at = NOW() + make_interval(secs => :lease_seconds)
+    WHERE lease_owner = :lease_owner
+      AND status = 'processing'
+"""
+
+RELEASE_LEASES_SQL = """
+    UPDATE populate_queue
+    SET status = 'pending',
+        lease_owner = NULL,
+        lease_expires_at = NULL
+    WHERE lease_owner = :lease_owner
+      AND status = 'processing'
+    RETURNING id
+"""
+
+INSERT_SONG_SQL = """
+    INSERT INTO christian_songs (
+        track_id,
+        isrc,
+        title,
+        artist,
+        album,
+        tag_count,
+        tags_method,
+        audio_features,
+        weighted_features,
+        num_indexes,
+        last_indexed
+    ) VALUES (
+        :track_id,
+        :isrc,
+        :title,
+        :artist,
+        :album,
+        :tag_count,
+        :tags_method,
+        :audio_features,
+        :weighted_features,
+        1,
+        NOW()
+    )
+"""
+
+INSERT_SONG_TAGS_SQL = """
+    INSERT INTO song_tags (track_id, tag_id, count)
+    SELECT :track_id, t.tag_id, t.count
+    FROM unnest(CAST(:tag_ids AS int[]), CAST(:counts AS int[])) AS t(tag_id, count)
+    ON CONFLICT (track_id, tag_id) DO NOTHING
+"""
+
+ENQUEUE_SIMILAR_SQL = """
+    INSERT INTO populate_queue (
+        spotify_track_id, source, seed_depth, seed_parent_spotify_id, seed_batch_id, priority, scheduled_at, artist
+    )
+    SELECT t.spotify_track_id, t.source, :seed_depth, :seed_parent_spotify_id, :seed_batch_id,
+           t.priority, NOW() + make_interval(secs => t.delay), t.artist
+    FROM unnest(
+        CAST(:track_ids AS text[]), CAST(:sources AS text[]),
+        CAST(:priorities AS int[]), CAST(:delays AS float8[]), CAST(:artists AS text[])
+    ) AS t(spotify_track_id, source, priority, delay, artist)
+    ON CONFLICT (spotify_track_id) DO NOTHING
+    RETURNING spotify_track_id
+"""
+
+KNOWN_ISRCS_SQL = "SELECT isrc FROM christian_songs WHERE isrc = ANY(:isrcs)"
+QUEUED_IDS_SQL = "SELECT spotify_track_id FROM populate_queue WHERE spotify_track_id = ANY(:track_ids)"
+
+METRICS = MetricsRecorder(WORKER_ID)
+
+class LeaseLost(Exception):
+    """Raised when a job's lease was reaped or taken over before its results were written."""
+
 def cleanup_temp_dir():
     """Removes all files in the temp directory and then removes the directory itself."""
     try:
@@ -31,84 +192,137 @@ def cleanup_temp_dir():
     except Exception as e:
         print(f"[worker] Temp cleanup failed: {e}")
 
-def _fail_job(db, job_id: int, error_message: str):
+def cleanup_job_files(job_id: int):
+    """Remove the temp files of a single job, leaving other in-flight jobs untouched."""
+    base = os.path.join(TEMP_DIR, f"{TEMP_BASE_FILENAME}_{job_id}")
+    for file_path in glob.glob(f"{base}.*") + glob.glob(f"{base}_clip*"):
+        try:
+            os.remove(file_path)
+        except OSError as e:
+            print(f"[worker] Temp cleanup failed for {file_path}: {e}")
+
+def _fail_job(db, job_id: int, error_message: str, lease_owner: str = WORKER_ID):
     """
-    Mark a job as failed in the populate_queue table.
+    Mark a job as failed in the populate_queue table and release its lease.
+    Does nothing if the lease is no longer held by ``lease_owner``.
     """
-    db.execute(text("""
-        UPDATE populate_queue
-        SET status = 'failed',
-            last_error = :error,
-            last_attempt_at = NOW(),
-            attempt_count = attempt_count + 1
-        WHERE id = :id
-    """), {"id": job_id, "error": error_message})
+    db.execute(text(FAIL_JOB_SQL), {"id": job_id, "error": error_message, "lease_owner": lease_owner})
 
-def fetch_next_job(db) -> Optional[dict]:
+def fetch_next_jobs(db, lease_owner: str = WORKER_ID, limit: int = 1) -> list:
+    """
+    Claim up to ``limit`` pending jobs from the populate_queue table in one round trip.
+    The rows are marked 'processing' with a lease for ``lease_owner`` in the caller's
+    (short) transaction, so no lock is held while the jobs are worked on.
+    Jobs are taken manual tier first, then in ``scheduled_at`` order (see ``scheduling``).
+    Returns a list of job dictionaries in that order.
     """
-    Fetch the next job from the populate_queue table.
-    Locks the row to prevent other workers from processing it.
+    rows = db.execute(text(CLAIM_JOBS_SQL), {"lease_owner": lease_owner, "lease_seconds": LEASE_SECONDS, "limit": limit}).fetchall()
+
+    jobs = [
+        {
+            "id": row.id,
+            "spotify_track_id": row.spotify_track_id,
+            "source": row.source,
+            "enqueued_at": row.enqueued_at,
+            "status": row.status,
+            "seed_depth": row.seed_depth if hasattr(row, 'seed_depth') else 0,
+            "seed_parent_spotify_id": row.seed_parent_spotify_id if hasattr(row, 'seed_parent_spotify_id') else None,
+            "seed_batch_id": row.seed_batch_id if hasattr(row, 'seed_batch_id') else None,
+            "priority": row.priority,
+            "scheduled_at": row.scheduled_at
+        }
+        for row in rows
+    ]
+    return sorted((start_job_timing(job) for job in jobs), key=claim_key)
+
+def fetch_next_job(db, lease_owner: str = WORKER_ID) -> Optional[dict]:
+    """
+    Claim the next pending job from the populate_queue table.
     Returns a dictionary with job details or None if no pending jobs.
-    If the worker is interrupted, the transaction is rolled back.
-    """
-    row = db.execute(text("""
-        SELECT id,
-               spotify_track_id,
-               source,
-               enqueued_at,
-               status,
-               seed_depth,
-               seed_parent_spotify_id,
-               seed_batch_id
-        FROM populate_queue
-        WHERE status = 'pending'
-        ORDER BY enqueued_at ASC
-        LIMIT 1
-        FOR UPDATE SKIP LOCKED
-    """)).fetchone()
+    """
+    jobs = fetch_next_jobs(db, lease_owner, limit=1)
+    return jobs[0] if jobs else None
+
+def renew_leases(db, lease_owner: str = WORKER_ID) -> int:
+    """
+    Extend the lease on every job currently held by ``lease_owner``.
+    Returns the number of leases renewed.
+    """
+    result = db.execute(text(RENEW_LEASES_SQL), {"lease_owner": lease_owner, "lease_seconds": LEASE_SECONDS})
+    return result.rowcount
+
+def release_leases(db, lease_owner: str = WORKER_ID) -> int:
+    """
+    Return every job held by ``lease_owner`` to the pending state, e.g. on shutdown.
+    """
+    result = db.execute(text(RELEASE_LEASES_SQL), {"lease_owner": lease_owner})
+    return result.rowcount
+
+def reap_expired_leases(db) -> int:
+    """
+    Requeue jobs whose worker stopped renewing their lease (crash, kill, lost connection).
+    Jobs that have already used ``MAX_ATTEMPTS`` attempts are marked failed instead.
+    """
+    result = db.execute(text(REAP_EXPIRED_SQL), {"max_attempts": MAX_ATTEMPTS})
+    return result.rowcount
+
+def complete_job(db, job: dict, lease_owner: str = WORKER_ID):
+    """
+    Mark a job as done and release its lease.
+    Raises LeaseLost if the lease is no longer held, which rolls back the caller's writes.
+    """
+    row = db.execute(text(COMPLETE_JOB_SQL), {"id": job["id"], "lease_owner": lease_owner}).fetchone()
 
     if row is None:
-        return None
-    
-    return {
-        "id": row.id,
-        "spotify_track_id": row.spotify_track_id,
-        "source": row.source,
-        "enqueued_at": row.enqueued_at,
-        "status": row.status,
-        "seed_depth": row.seed_depth if hasattr(row, 'seed_depth') else 0,
-        "seed_parent_spotify_id": row.seed_parent_spotify_id if hasattr(row, 'seed_parent_spotify_id') else None,
-        "seed_batch_id": row.seed_batch_id if hasattr(row, 'seed_batch_id') else None
-    }
+        raise LeaseLost(f"Lease on job {job['id']} was lost before completion")
+
+class LeaseHeartbeat(threading.Thread):
+    """Background thread renewing this worker's leases every ``HEARTBEAT_INTERVAL`` seconds."""
+
+    def __init__(self, engine, lease_owner: str = WORKER_ID):
+        super().__init__(name="lease-heartbeat", daemon=True)
+        self.engine = engine
+        self.lease_owner = lease_owner
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(HEARTBEAT_INTERVAL):
+            try:
+                with self.engine.begin() as db:
+                    renew_leases(db, self.lease_owner)
+            except Exception as e:
+                print(f"[worker] Lease heartbeat failed: {e}")
+
+    def stop(self):
+        self.stopped.set()
 
 def check_song_exists(db, isrc: str) -> bool:
     """
     Check if a song with the given ISRC already exists in the christian_songs table.
     """
-    existing_song = db.execute(text("""
-        SELECT isrc
-        FROM christian_songs
-        WHERE isrc = :isrc
-    """), {"isrc": isrc}).fetchone()
+    existing_song = db.execute(text(SONG_EXISTS_SQL), {"isrc": isrc}).fetchone()
 
     return existing_song is not None
 
-def validate_track_info(db, job: dict):
+def classify_job(job: dict):
     """
-    Validate and retrieve track information
-    Raises ValueError if validation fails
+    Classify a job's track and retrieve its info from Last.fm and Spotify, without touching the DB.
+    Raises TrackRejected for non-Christian tracks and ValueError if validation fails
     """
-    # Retrieve necessary info from Last.fm and Spotify
-    result = is_song_christian(job["spotify_track_id"])
+    with timed(job.get("timings"), "classify"):
+        result = is_song_christian(job["spotify_track_id"])
     is_christian, tags, method, isrc, song_info = result
 
+    # A verdict reached from actual tags is final; missing data may be transient and is only failed
+    if not is_christian and tags:
+        raise TrackRejected("Track determined to be non-Christian", job["spotify_track_id"], (song_info or {}).get("isrc"))
+
     validations = [
-        (not is_christian, "Track determined to be non-Christian"),
+        (not is_christian, "No tags found for track"),
         (song_info is None, "Failed to retrieve song info from Spotify"),
         (isrc is None, "Failed to retrieve ISRC"),
         (tags is None, "Failed to retrieve tags"),
         (method is None, "Failed to retrieve method"),
-        (isrc and check_song_exists(db, isrc), "Track already exists in the database")
     ]
 
     for condition, message in validations:
@@ -123,226 +337,372 @@ def validate_track_info(db, job: dict):
     
     return song_info, isrc, tags, method
 
-def insert_christian_song(db, song_info: dict, job: dict, isrc: str, tags: list, method: list):
+def validate_track_info(engine, job: dict):
+    """
+    Validate and retrieve track information
+    Raises ValueError if validation fails
+    """
+    song_info, isrc, tags, method = classify_job(job)
+
+    with engine.connect() as db:
+        if check_song_exists(db, isrc):
+            raise ValueError("Track already exists in the database")
+
+    return song_info, isrc, tags, method
+
+def analyze_song_audio(song_info: dict, job: dict, tags: list = None, method: list = None) -> dict:
     """
-    Insert a new Christian song into the christian_songs table.
+    Run the audio pipeline for a validated song. Touches no database state.
+    The validated Spotify details (and tags, when given) are passed through, so the audio
+    analyzed is the classified track and no search or tag lookup is repeated.
+    Returns the averaged audio features.
     """
+    prefetched_tags = (tags, method) if tags is not None else None
     try:
-        song_data = process_single(song_info["title"], song_info["artist"], idx=job["id"])
+        song_data = process_single(song_info["title"], song_info["artist"], idx=job["id"],
+                                   details=song_info, tags=prefetched_tags, timings=job.get("timings"),
+                                   use_catalogue=False) # validate_track_info already ruled the song out
     except Exception as err:
         raise ValueError(f"Error processing song audio: {err}")
     finally:
-        cleanup_temp_dir()
-    
-    audio_features = song_data["audio_features"]["average"]
-    weighted_features = weight_features(audio_features)
+        cleanup_job_files(job["id"])
 
-    db.execute(text("""
-        INSERT INTO christian_songs (
-            track_id,
-            isrc,
-            title,
-            artist,
-            album,
-            tag_count,
-            tags_method,
-            audio_features,
-            weighted_features,
-            num_indexes,
-            last_indexed
-        ) VALUES (
-            :track_id,
-            :isrc,
-            :title,
-            :artist,
-            :album,
-            :tag_count,
-            :tags_method,
-            :audio_features,
-            :weighted_features,
-            :num_indexes,
-            :last_indexed
-        )
-    """), {
+    return song_data["audio_features"]["average"]
+
+def song_params(song_info: dict, isrc: str, tags: list, method: list, audio_features: dict) -> dict:
+    """Parameters of ``INSERT_SONG_SQL`` for one analyzed song."""
+    return {
         "track_id": song_info["track_id"],
         "isrc": isrc,
         "title": song_info["title"],
-        "artist": song_info["artist"],  
+        "artist": song_info["artist"],
         "album": song_info.get("album"),
         "tag_count": len(tags) if tags else 0,
         "tags_method": method,
         "audio_features": features_to_vector(audio_features),
-        "weighted_features": weighted_features,
-        "num_indexes": 0,
-        "last_indexed": None
-    })
+        "weighted_features": weight_features(audio_features),
+    }
+
+def tag_counts(tags: list) -> dict:
+    """``{normalized tag name: count}``, keeping the first count of a repeated name."""
+    counts = {}
+    for tag in tags:
+        counts.setdefault(tag["name"].strip().lower(), tag["count"])
+    return counts
+
+def insert_christian_song(db, song_info: dict, job: dict, isrc: str, tags: list, method: list, audio_features: dict):
+    """
+    Insert a new Christian song into the christian_songs table, with its tags.
+    Returns the tag ids created by this insert; pass them to ``TAG_CACHE.remember`` once committed.
+    """
+    db.execute(text(INSERT_SONG_SQL), song_params(song_info, isrc, tags, method, audio_features))
 
     # Insert the tags into the normalized tags and song_tags tables
-    if tags:
-        # 1. Ensure all tags exist in the tags table
-        db.execute(text("""
-            INSERT INTO tags (name)
-            VALUES (:name)
-            ON CONFLICT (name) DO NOTHING
-        """), [{"name": tag["name"].strip().lower()} for tag in tags])
-
-        # 2. Get the IDs of those tags
-        tag_names = tuple(tag["name"].strip().lower() for tag in tags)
-        tag_records = db.execute(text("""
-            SELECT id, name FROM tags WHERE name IN :names
-        """), {"names": tag_names}).fetchall()
-        
-        tag_id_map = {row.name: row.id for row in tag_records}
-
-        # 3. Insert into the join table
-        join_rows = [
-            {
-                "track_id": song_info["track_id"],
-                "tag_id": tag_id_map[tag["name"].strip().lower()],
-                "count": tag["count"],
-            }
-            for tag in tags
-        ]
-
-        db.execute(
-            text("""
-                INSERT INTO song_tags (track_id, tag_id, count)
-                VALUES (:track_id, :tag_id, :count)
-                ON CONFLICT (track_id, tag_id) DO NOTHING
-            """),
-            join_rows,
-        )
-
-def enqueue_similar_tracks(db, job: dict):
-    """
-    Fetch similar tracks from Spotify and enqueue them safely in the populate_queue.
-    Implements depth-based expansion, filtering, and queue backpressure.
+    if not tags:
+        return {}
+
+    counts = tag_counts(tags)
+
+    # Cached ids cover almost every tag; only unseen names cost an upsert
+    tag_id_map, missing = TAG_CACHE.lookup(counts)
+    new_tag_ids = upsert_tags(db, missing)
+    tag_id_map.update(new_tag_ids)
+
+    db.execute(text(INSERT_SONG_TAGS_SQL), {
+        "track_id": song_info["track_id"],
+        "tag_ids": [tag_id_map[name] for name in counts],
+        "counts": list(counts.values()),
+    })
+
+    return new_tag_ids
+
+def enqueue_params(job: dict, recommended_tracks: list, selected: dict) -> dict:
+    """Parameters of ``ENQUEUE_SIMILAR_SQL`` for the ``{track_id: source}`` children of ``job``."""
+    seed_depth = job.get("seed_depth", 0) + 1
+    artists = {track["track_id"]: artist_key(track["artist"]) for track in recommended_tracks if track.get("track_id") in selected}
+    priorities = [job_priority(source, seed_depth) for source in selected.values()]
+    return {
+        "track_ids": list(selected),
+        "sources": list(selected.values()),
+        "priorities": priorities,
+        "delays": schedule_delays(priorities),
+        "artists": [artists[track_id] for track_id in selected],
+        "seed_depth": seed_depth,
+        "seed_parent_spotify_id": job["spotify_track_id"],
+        "seed_batch_id": str(uuid.uuid4()), # Batch ID for debugging
+    }
+
+def fetch_similar_tracks(job: dict, fetch_limit: int = 50) -> list:
+    """
+    Fetch recommendation candidates for a job from the external APIs, outside any transaction.
     """
     try:
-        # Generate batch ID for debugging
-        import uuid
-        batch_id = str(uuid.uuid4())
+        with timed(job.get("timings"), "recommend"):
+            return get_similar_tracks_by_id(job["spotify_track_id"], limit=fetch_limit) or []
+    except Exception as error:
+        print(f"[worker] Non-fatal error fetching similar tracks: {error}")
+        return []
+
+def select_similar_tracks(recommended_tracks: list, known_isrcs: set, queued_ids: set, target_adds: int = 5,
+                          rejected: set = frozenset()):
+    """
+    Pick the recommendation candidates to enqueue, in recommendation order.
+    ``known_isrcs`` and ``queued_ids`` are the candidates already in christian_songs / populate_queue;
+    ``rejected`` holds track ids and ISRCs previously classified as non-Christian.
+    Returns ``({track_id: source}, skipped_counts)``.
+    """
+    selected = {}
+    skipped = {"missing_info": 0, "rejected": 0, "in_db": 0, "in_queue": 0}
+
+    for track in recommended_tracks:
+        if len(selected) >= target_adds:
+            break
+
+        track_id = track.get("track_id")
+        if not track_id or not track.get("title") or not track.get("artist"):
+            skipped["missing_info"] += 1
+        elif track_id in rejected or (track.get("isrc") and track["isrc"] in rejected):
+            skipped["rejected"] += 1
+        elif track.get("isrc") and track["isrc"] in known_isrcs:
+            skipped["in_db"] += 1
+        elif track_id in queued_ids or track_id in selected:
+            skipped["in_queue"] += 1
+        else:
+            # Resolve specific source API
+            selected[track_id] = f"auto_seeded_{track.get('source_api', 'unknown')}"
+
+    return selected, skipped
+
+def similar_track_keys(recommended_tracks: list):
+    """Return the ISRCs and track ids of candidates worth checking against the DB."""
+    isrcs = list({track["isrc"] for track in recommended_tracks if track.get("isrc")})
+    track_ids = list({track["track_id"] for track in recommended_tracks if track.get("track_id")})
+    return isrcs, track_ids
 
-        # 1. Uncapped Gating (Fetch up to 5 tracks recursively every time)
+def enqueue_similar_tracks(db, job: dict, recommended_tracks: list, weighted_features: list = None):
+    """
+    Enqueue previously fetched similar tracks safely in the populate_queue.
+    The crawl frontier (see frontier.py) decides how many children the job may add from the
+    queue budget, depth and the job's novelty, and ranks candidates to favour unseen artists.
+    Costs four queries however many candidates there are: artist counts, one ISRC check, one
+    queue check and one multi-row insert of the survivors, plus a pending-count refresh every
+    ``BUDGET_REFRESH`` seconds. Known rejections are dropped via the in-memory Bloom filter;
+    only its (rare) hits cost another query.
+    Runs in a savepoint so a failure here never aborts the caller's transaction.
+    """
+    savepoint = None
+    try:
         current_depth = job.get('seed_depth', 0)
-        target_adds = 5
-        fetch_limit = 50
-            
-        # Get recommendations
-        recommended_tracks = get_similar_tracks_by_id(job["spotify_track_id"], limit=fetch_limit)
         if not recommended_tracks:
             return
 
+        savepoint = db.begin_nested()
+
+        refresh_budget(db)
+        target_adds = FRONTIER.target_adds(current_depth + 1, weighted_features)
+        if target_adds == 0:
+            savepoint.commit()
+            print(f"[worker] Crawl budget exhausted at depth {current_depth + 1}, not auto-seeding.")
+            return
+        recommended_tracks = FRONTIER.rank(recommended_tracks, fetch_artist_counts(db, recommended_tracks))
+
+        isrcs, track_ids = similar_track_keys(recommended_tracks)
+        known_isrcs = {row.isrc for row in db.execute(text(KNOWN_ISRCS_SQL), {"isrcs": isrcs})} if isrcs else set()
+        queued_ids = {row.spotify_track_id for row in db.execute(text(QUEUED_IDS_SQL), {"track_ids": track_ids})} if track_ids else set()
+
+        rejected = confirm_rejected(db, *rejection_suspects(recommended_tracks))
+
+        selected, skipped = select_similar_tracks(recommended_tracks, known_isrcs, queued_ids, target_adds, rejected)
+
         added = 0
-        skipped_missing_info = 0
-        skipped_in_db = 0
-        skipped_in_queue = 0
-
-        for track in recommended_tracks:
-            if added >= target_adds:
-                break
-                
-            title = track.get("title", "")
-            artist = track.get("artist", "")
-            track_id = track.get("track_id")
-            
-            # Pre-enqueue filtering
-            if not track_id or not title or not artist:
-                skipped_missing_info += 1
-                continue
-
-            # Check if track is already in christian_songs
-            isrc = track.get("isrc")
-            if isrc and check_song_exists(db, isrc):
-                skipped_in_db += 1
-                continue
-                
-            # Check if track is already in populate_queue
-            in_queue = db.execute(text("""
-                SELECT 1 FROM populate_queue WHERE spotify_track_id = :spotify_track_id
-            """), {"spotify_track_id": track_id}).scalar()
-            if in_queue:
-                skipped_in_queue += 1
-                continue
-                
-            # Resolve specific source API
-            source_api = track.get("source_api", "unknown")
-            source_str = f'auto_seeded_{source_api}'
-            
-            # Attempt insertion with ON CONFLICT DO NOTHING to avoid IntegrityErrors poisoning the transaction
-            result = db.execute(text("""
-                INSERT INTO populate_queue (
-                    spotify_track_id, source, seed_depth, seed_parent_spotify_id, seed_batch_id
-                ) VALUES (
-                    :spotify_track_id, :source, :seed_depth, :seed_parent_spotify_id, :seed_batch_id
-                ) ON CONFLICT (spotify_track_id) DO NOTHING
-            """), {
-                "spotify_track_id": track_id,
-                "source": source_str,
-                "seed_depth": current_depth + 1,
-                "seed_parent_spotify_id": job["spotify_track_id"],
-                "seed_batch_id": batch_id
-            })
-            if result.rowcount > 0:
-                added += 1
-
-        print(f"[worker] Auto-seeded {added} similar tracks at depth {current_depth + 1}. Skipped {skipped_in_db} (in DB), {skipped_in_queue} (in queue), {skipped_missing_info} (missing info).")
+        if selected:
+            # ON CONFLICT DO NOTHING covers tracks enqueued by another worker since the check
+            result = db.execute(text(ENQUEUE_SIMILAR_SQL), enqueue_params(job, recommended_tracks, selected))
+            added = len(result.fetchall())
+
+        savepoint.commit()
+        print(f"[worker] Auto-seeded {added}/{target_adds} similar tracks at depth {current_depth + 1}. Skipped {skipped['rejected']} (rejected), {skipped['in_db']} (in DB), {skipped['in_queue']} (in queue), {skipped['missing_info']} (missing info).")
     except Exception as error:
+        if savepoint is not None and savepoint.is_active:
+            savepoint.rollback()
         print(f"[worker] Non-fatal error in enqueue_similar_tracks: {error}")
 
-def process_next_job(db):
+def write_job_results(engine, job: dict, song_info: dict, isrc: str, tags: list, method: list,
+                      audio_features: dict, recommended_tracks: list, lease_owner: str = WORKER_ID):
+    """
+    Write a finished job in one short transaction: complete it, insert the song and enqueue similar tracks.
+    Raises LeaseLost (rolling everything back) if the lease is no longer held.
+    """
+    timings = job.get("timings")
+    weighted_features = weight_features(audio_features)
+    with timed(timings, "db_write"), engine.begin() as db:
+        # Completing first locks the row and confirms the lease is still ours
+        complete_job(db, job, lease_owner)
+
+        # Insert the Christian song into the christian_songs table
+        new_tag_ids = insert_christian_song(db, song_info, job, isrc, tags, method, audio_features)
+
+        # Enqueue similar tracks based on recommendation API (Recursive Seeding)
+        with timed(timings, "enqueue"):
+            enqueue_similar_tracks(db, job, recommended_tracks, weighted_features)
+
+    if timings is not None and "enqueue" in timings:
+        timings["db_write"] -= timings["enqueue"]
+    TAG_CACHE.remember(new_tag_ids)
+    FRONTIER.coverage.add(weighted_features)
+
+def record_job_metrics(engine, job: dict, outcome: str):
+    """Buffer a finished job's timings, flushing the buffer to job_metrics when it is due."""
+    if METRICS.record(job, outcome):
+        flush_metrics(engine, METRICS)
+
+def fail_claimed_job(engine, job: dict, error: Exception, lease_owner: str = WORKER_ID):
+    """Record a job failure, or report it if the job was abandoned because its lease was lost."""
+    if isinstance(error, LeaseLost):
+        print(f"[worker] Job {job['id']} abandoned: {error}")
+        record_job_metrics(engine, job, "lease_lost")
+        return
+    record_job_metrics(engine, job, "rejected" if isinstance(error, TrackRejected) else "failed")
+
+    try:
+        with engine.begin() as db:
+            _fail_job(db, job["id"], str(error), lease_owner)
+            if isinstance(error, TrackRejected):
+                record_rejection(db, error.track_id, error.isrc, str(error))
+    except Exception as fail_error:
+        print(f"[worker] Could not mark job as failed (its lease will expire): {fail_error}")
+
+    print(f"[worker] Job {job['id']} failed: {error}")
+
+def process_next_job(engine, lease_owner: str = WORKER_ID):
     """
     Process the next job in the populate_queue table.
-    Processes one job at a time, then moves onto the next.
-    Sleeps if no jobs are available, and retries.
+    The job is claimed in a short transaction, all external work runs outside any
+    transaction, and the results plus completion are written in a second short one.
+    Returns False if there was no job to process.
     """
-    job = fetch_next_job(db)
+    with engine.begin() as db:
+        job = fetch_next_job(db, lease_owner)
     if job is None:
         return False  # No job found
     
     print(f"[worker] Got job {job['id']} for track {job['spotify_track_id']} from source {job['source']}")
 
     try:
-        # Use a savepoint so that if an SQL error occurs, it doesn't abort the entire transaction.
-        # This allows us to safely call _fail_job(db) if needed, without encountering InFailedSqlTransaction.
-        with db.begin_nested():
-            # Validate and retrieve track info
-            song_info, isrc, tags, method = validate_track_info(db, job)
-
-            # Mark job as in progress
-            db.execute(text("""
-                UPDATE populate_queue
-                SET status = 'processing',
-                    last_error = NULL
-                WHERE id = :id
-            """), {"id": job["id"]})
-
-            print(f"[worker] Processing track {job['spotify_track_id']}...")
-
-            # Insert the Christian song into the christian_songs table
-            insert_christian_song(db, song_info, job, isrc, tags, method)
-
-            # Enqueue similar tracks based on recommendation API (Recursive Seeding)
-            enqueue_similar_tracks(db, job)
-
-            # Mark as completed
-            db.execute(text("""
-                UPDATE populate_queue
-                SET status = 'done'
-                WHERE id = :id
-            """), {"id": job["id"]})
+        # Validate and retrieve track info
+        song_info, isrc, tags, method = validate_track_info(engine, job)
+
+        print(f"[worker] Processing track {job['spotify_track_id']}...")
+
+        # External work: audio analysis and recommendation lookups
+        audio_features = analyze_song_audio(song_info, job, tags, method)
+        recommended_tracks = fetch_similar_tracks(job)
+
+        write_job_results(engine, job, song_info, isrc, tags, method, audio_features, recommended_tracks, lease_owner)
 
         print(f"[worker] Job {job['id']} completed successfully.")
-        return True
+        record_job_metrics(engine, job, "done")
 
     except Exception as error:
+        fail_claimed_job(engine, job, error, lease_owner)
+
+    return True
+
+def load_rejections(engine):
+    """Warm the rejected-track Bloom filter; without it every candidate is simply enqueued as before."""
+    try:
+        REJECTIONS.load(engine)
+    except Exception as e:
+        print(f"[worker] Could not load rejected tracks (run the migrations?): {e}")
+
+def refresh_rejections(engine):
+    """Pull rows rejected by sibling workers since the last load; failures are retried next time."""
+    try:
+        REJECTIONS.refresh(engine)
+    except Exception as e:
+        print(f"[worker] Could not refresh rejected tracks: {e}")
+
+def warm_tag_cache(engine):
+    """Load the tag vocabulary so song inserts skip the tag round trips; misses are upserted on demand."""
+    try:
+        with engine.connect() as db:
+            print(f"[worker] Cached {TAG_CACHE.warm(db)} tag ids")
+    except Exception as e:
+        print(f"[worker] Could not warm the tag cache: {e}")
+
+def load_frontier(engine):
+    """Load the catalogue's feature vectors for novelty scoring; without them every job counts as average."""
+    try:
+        with engine.connect() as db:
+            print(f"[worker] Loaded {load_coverage(db)} feature vectors for the crawl frontier")
+    except Exception as e:
+        print(f"[worker] Could not load the crawl frontier coverage: {e}")
+
+def run_worker(engine, should_stop=lambda: False, on_heartbeat=None):
+    """
+    Process jobs until ``should_stop()`` returns True.
+    The stop flag is checked between jobs, so an in-flight job always finishes; if the
+    process dies instead, its lease expires and another worker's reaper requeues the job.
+    ``on_heartbeat(handled_job)`` is called after every poll for health reporting.
+    """
+    load_rejections(engine)
+    warm_tag_cache(engine)
+    load_frontier(engine)
+    heartbeat = LeaseHeartbeat(engine)
+    heartbeat.start()
+    next_reap = 0.0
+    next_refresh = time.monotonic() + REFRESH_INTERVAL
+
+    try:
+        while not should_stop():
+            _poll_once(engine, should_stop, on_heartbeat)
+            if time.monotonic() >= next_reap:
+                next_reap = time.monotonic() + REAP_INTERVAL
+                _reap(engine)
+            if time.monotonic() >= next_refresh:
+                next_refresh = time.monotonic() + REFRESH_INTERVAL
+                refresh_rejections(engine)
+    finally:
+        heartbeat.stop()
+        REJECTIONS.save()
+        flush_metrics(engine, METRICS)
         try:
-            _fail_job(db, job["id"], str(error))
-        except Exception as fail_error:
-            print(f"[worker] Could not mark job as failed (connection may be dead): {fail_error}")
-            
-        print(f"[worker] Job {job['id']} failed: {error}")
-        return True
+            with engine.begin() as db:
+                release_leases(db)
+        except Exception as e:
+            print(f"[worker] Could not release leases on shutdown (they will expire): {e}")
+
+def _reap(engine):
+    """Requeue jobs with expired leases; failures are logged and retried next sweep."""
+    try:
+        with engine.begin() as db:
+            reaped = reap_expired_leases(db)
+        if reaped:
+            print(f"[worker] Reaped {reaped} jobs with expired leases.")
+    except Exception as e:
+        print(f"[worker] Lease reaper failed: {e}")
+
+def _poll_once(engine, should_stop, on_heartbeat):
+    """Process at most one job, sleeping briefly if the queue is empty or the DB is unreachable."""
+    try:
+        has_job = process_next_job(engine)
+
+        if on_heartbeat:
+            on_heartbeat(has_job)
+
+        if not has_job:
+            print("[worker] No jobs found, sleeping for 3 seconds...")
+            _sleep_unless_stopped(3, should_stop)
+    except Exception as e:
+        print(f"[worker] Database transaction error (connection drop?): {e}")
+        print("[worker] Reconnecting in 5 seconds...")
+        _sleep_unless_stopped(5, should_stop)
+
+def _sleep_unless_stopped(seconds: float, should_stop):
+    """Sleep in short steps so a stop request is noticed promptly."""
+    deadline = time.monotonic() + seconds
+    while not should_stop() and time.monotonic() < deadline:
+        time.sleep(min(0.5, deadline - time.monotonic()))
 
 def main():
     """
@@ -350,6 +710,11 @@ def main():
     Sleeps when no jobs are available.
     Exits by keyboard interrupt.
     """
+    parser = argparse.ArgumentParser(description="Worshipify seeding worker")
+    parser.add_argument("--pipeline", action="store_true", help="Claim jobs in batches and overlap classification, audio and DB stages")
+    parser.add_argument("--batch-size", type=int, default=8, help="Jobs claimed per round trip in pipeline mode")
+    args = parser.parse_args()
+
     # Create DB engine
     engine = connect_to_db()
 
@@ -357,21 +722,15 @@ def main():
     test_db_connection(engine)
 
     try:
-        while True:
-            try:
-                with engine.begin() as db:
-                    has_job = process_next_job(db)
-
-                if not has_job:
-                    print("[worker] No jobs found, sleeping for 3 seconds...")
-                    time.sleep(3)
-            except Exception as e:
-                print(f"[worker] Database transaction error (connection drop?): {e}")
-                print("[worker] Reconnecting in 5 seconds...")
-                time.sleep(5)
+        if args.pipeline:
+            from pipeline import run_pipeline
+            run_pipeline(engine, batch_size=args.batch_size)
+        else:
+            run_worker(engine)
 
     except KeyboardInterrupt:
-        print("\n[worker] Interrupted by user. Worker shutting down. Database rolled back.")
+        print("\n[worker] Interrupted by user. Worker shutting down. Leases released.")
+        print(f"[worker] Spotify cache stats: {sp.stats.snapshot()}")
         cleanup_temp_dir()
         time.sleep(1)
 
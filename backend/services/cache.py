@@ -0,0 +1,152 @@
+'''
+read-through response caching shared by the API, manager and worker
+'''
+
+import os
+import json
+import time
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+CACHE_DIR = os.getenv("WORSHIPIFY_CACHE_DIR", os.path.join(os.path.dirname(__file__), "..", "cache"))
+
+MISSING = object()
+
+def make_key(*parts) -> str:
+    """Build a stable cache key from JSON-serialisable parts."""
+    return json.dumps(parts, sort_keys=True, separators=(",", ":"), default=str)
+
+class PersistentCache:
+    """
+    Two-level TTL cache: an in-process LRU in front of a SQLite file.
+    Entries are stored as JSON so any process sharing the file can read them.
+    With ``max_entries`` set, the store is trimmed back under the cap by dropping
+    expired rows first and then the rows closest to expiry.
+    """
+
+    EVICTION_CHECK_EVERY = 256 # Writes between size checks
+
+    def __init__(self, name: str, memory_size: int = 2048, path: Optional[str] = None, max_entries: Optional[int] = None):
+        self.name = name
+        self.memory_size = memory_size
+        self.max_entries = max_entries
+        self._writes = 0
+        self.path = path or os.path.join(CACHE_DIR, f"{name}.sqlite")
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+
+    def _connect(self):
+        """Open the SQLite store lazily so importing a module never touches disk."""
+        if self._db is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            db = sqlite3.connect(self.path, timeout=30, check_same_thread=False, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.execute("""
+                CREATE TABLE IF NOT EXISTS cache (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    expires_at REAL NOT NULL
+                )
+            """)
+            db.execute("CREATE INDEX IF NOT EXISTS cache_expires_at ON cache (expires_at)")
+            self._db = db
+        return self._db
+
+    def _remember(self, key: str, value: Any, expires_at: float):
+        """Insert into the in-process LRU, evicting the least recently used entry."""
+        self._memory[key] = (value, expires_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
+
+    def get(self, key: str) -> Any:
+        """Return the cached value for ``key`` or ``MISSING``."""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if entry[1] > now:
+                    self._memory.move_to_end(key)
+                    return entry[0]
+                del self._memory[key]
+
+            try:
+                row = self._connect().execute(
+                    "SELECT value, expires_at FROM cache WHERE key = ?", (key,)
+                ).fetchone()
+            except sqlite3.Error:
+                return MISSING
+
+            if row is None or row[1] <= now:
+                return MISSING
+
+            value = json.loads(row[0])
+            self._remember(key, value, row[1])
+            return value
+
+    def set(self, key: str, value: Any, ttl: float):
+        """Store ``value`` under ``key`` for ``ttl`` seconds."""
+        expires_at = time.time() + ttl
+        with self._lock:
+            self._remember(key, value, expires_at)
+            try:
+                self._connect().execute(
+                    "INSERT OR REPLACE INTO cache (key, value, expires_at) VALUES (?, ?, ?)",
+                    (key, json.dumps(value, separators=(",", ":")), expires_at),
+                )
+                self._writes += 1
+                if self.max_entries and self._writes % self.EVICTION_CHECK_EVERY == 0:
+                    self._evict()
+            except sqlite3.Error:
+                pass # The memory tier still serves this process
+
+    def _evict(self):
+        """Trim the SQLite store to 90% of ``max_entries``; caller holds the lock."""
+        db = self._connect()
+        db.execute("DELETE FROM cache WHERE expires_at <= ?", (time.time(),))
+        count = db.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+        excess = count - int(self.max_entries * 0.9)
+        if count > self.max_entries and excess > 0:
+            db.execute("""
+                DELETE FROM cache WHERE key IN (
+                    SELECT key FROM cache ORDER BY expires_at ASC LIMIT ?
+                )
+            """, (excess,))
+
+    def purge_expired(self) -> int:
+        """Delete expired rows from the SQLite store and return how many were removed."""
+        with self._lock:
+            try:
+                cursor = self._connect().execute("DELETE FROM cache WHERE expires_at <= ?", (time.time(),))
+                return cursor.rowcount
+            except sqlite3.Error:
+                return 0
+
+class CacheStats:
+    """Thread-safe hit/miss counters keyed by endpoint."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits: Dict[str, int] = {}
+        self.misses: Dict[str, int] = {}
+
+    def hit(self, endpoint: str, count: int = 1):
+        with self._lock:
+            self.hits[endpoint] = self.hits.get(endpoint, 0) + count
+
+    def miss(self, endpoint: str, count: int = 1):
+        with self._lock:
+            self.misses[endpoint] = self.misses.get(endpoint, 0) + count
+
+    def snapshot(self) -> Dict[str, Dict[str, int]]:
+        """Return per-endpoint ``{"hits", "misses"}`` counts."""
+        with self._lock:
+            endpoints = set(self.hits) | set(self.misses)
+            return {
+                endpoint: {"hits": self.hits.get(endpoint, 0), "misses": self.misses.get(endpoint, 0)}
+                for endpoint in sorted(endpoints)
+            }
@@ -0,0 +1,106 @@
+'''
+read-through lookup of songs already analyzed into the christian_songs catalogue
+'''
+
+import os
+import time
+import threading
+from pathlib import Path
+from collections import OrderedDict
+from typing import Dict, Optional
+from dotenv import load_dotenv
+from sqlalchemy import create_engine, text
+
+CATALOGUE_CACHE_SIZE = 4096   # ISRCs kept in the in-process LRU
+CATALOGUE_CACHE_TTL = 600     # Seconds a stored song stays cached (re-indexing may update it)
+CATALOGUE_MISS_TTL = 60       # Seconds an ISRC known to be absent stays cached
+CATALOGUE_POOL_SIZE = 2       # Connections kept open for lookups
+CATALOGUE_RETRY_AFTER = 60    # Seconds lookups stay off after the database could not be reached
+
+# One round trip: the song and its tags, in stored tag order
+LOOKUP_SQL = """
+    SELECT s.track_id, s.audio_features, s.tags_method,
+           COALESCE(
+               json_agg(json_build_object('name', t.name, 'count', st.count) ORDER BY st.count DESC, t.name)
+                   FILTER (WHERE t.id IS NOT NULL),
+               '[]'
+           ) AS tags
+    FROM christian_songs s
+    LEFT JOIN song_tags st ON st.track_id = s.track_id
+    LEFT JOIN tags t ON t.id = st.tag_id
+    WHERE s.isrc = :isrc
+    GROUP BY s.track_id
+"""
+
+class CatalogueLookup:
+    """
+    ISRC -> stored features and tags, behind an LRU with TTLs (absent ISRCs are cached too).
+    The engine is created on first use from ``DATABASE_URL``; without it, or while the
+    database is unreachable, every lookup returns None and callers run the full pipeline.
+    """
+
+    def __init__(self, database_url: Optional[str] = None):
+        self.database_url = database_url
+        self._engine = None
+        self._disabled_until = 0.0
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        if self._engine is None:
+            if self.database_url is None:
+                load_dotenv(Path(__file__).resolve().parent.parent / ".env")
+                self.database_url = os.getenv("DATABASE_URL") or ""
+            if not self.database_url:
+                return None
+            self._engine = create_engine(self.database_url, pool_size=CATALOGUE_POOL_SIZE, max_overflow=2,
+                                         pool_pre_ping=True)
+        return self._engine
+
+    def _remember(self, isrc: str, value: Optional[Dict], ttl: float):
+        self._memory[isrc] = (value, time.monotonic() + ttl)
+        self._memory.move_to_end(isrc)
+        while len(self._memory) > CATALOGUE_CACHE_SIZE:
+            self._memory.popitem(last=False)
+
+    def get(self, isrc: Optional[str]) -> Optional[Dict]:
+        """Return ``{"track_id", "audio_features", "tags", "tags_method"}`` for a catalogued ISRC, else None."""
+        if not isrc:
+            return None
+        with self._lock:
+            entry = self._memory.get(isrc)
+            if entry is not None and entry[1] > time.monotonic():
+                self._memory.move_to_end(isrc)
+                return entry[0]
+            if time.monotonic() < self._disabled_until:
+                return None
+
+        try:
+            engine = self._connect()
+            if engine is None:
+                return None
+            with engine.connect() as db:
+                row = db.execute(text(LOOKUP_SQL), {"isrc": isrc}).fetchone()
+        except Exception as e:
+            with self._lock:
+                self._disabled_until = time.monotonic() + CATALOGUE_RETRY_AFTER
+            print(f"[catalogue] Lookup unavailable, running the full pipeline: {e}")
+            return None
+
+        value = None
+        if row is not None:
+            value = {
+                "track_id": row.track_id,
+                "audio_features": list(row.audio_features),
+                "tags": list(row.tags),
+                "tags_method": list(row.tags_method or []),
+            }
+        with self._lock:
+            self._remember(isrc, value, CATALOGUE_CACHE_TTL if value else CATALOGUE_MISS_TTL)
+        return value
+
+    def invalidate(self, isrc: str):
+        with self._lock:
+            self._memory.pop(isrc, None)
+
+catalogue = CatalogueLookup()
@@ -9,103 +9,179 @@ backend_path = Path(__file__).parent.parent
 sys.path.insert(0, str(backend_path))
 
 import os
-import json
-import re
+import random
+import itertools
+import contextlib
+import concurrent.futures
+from collections import deque
+from typing import Optional
 import requests
+from requests.adapters import HTTPAdapter
 from services.spotify import *
+from services.tag_matcher import load_tag_matcher
+from services.cache import PersistentCache, MISSING, make_key
 from dotenv import load_dotenv
 
 load_dotenv()
 LASTFM_API_KEY = os.getenv("LASTFM_API_KEY")
 BASE_URL = "http://ws.audioscrobbler.com/2.0/"
-GENRES_FILE = os.path.join(os.path.dirname(__file__), "..", "data", "genres.txt")
-
-_nonword_re = re.compile(r"[^\w]+")
-_word_re    = re.compile(r"\w+")
-
-def _load_genre_filter():
-    """Load allowed genre keywords from ``genres.txt``."""
-    genre_filters = set()
-    with open(GENRES_FILE, "r", encoding = "utf-8") as txt:
-        for line in txt:
-            line = line.strip()
-            if not line:
-                continue
-            try:
-                line_contents = json.loads(line)
-                name = line_contents.get("name", "").lower()
-            except json.JSONDecodeError:
-                continue
-            name = name.strip()
-            if not name:
-                continue
+LASTFM_TIMEOUT = 10 # Seconds per Last.fm request
+SIMILAR_RESOLVE_WORKERS = 8 # Concurrent Spotify lookups when resolving similar tracks
 
-            genre_filters.add(name)
+# Tag fallback stages for concurrent lookups (indexes into the method list); a stage is only
+# started once every earlier one came back empty, so a hit on the first method costs one request
+TAG_LOOKUP_STAGES = ((0,), (1, 2), (3,))
 
-            bare = _nonword_re.sub("", name)
-            if bare:
-                genre_filters.add(bare)
-            
-            for word in _word_re.findall(name):
-                genre_filters.add(word)
+# Last.fm responses are cached by (method, normalized params)
+LASTFM_CACHE_TTL = 7 * 24 * 3600         # Responses with usable results
+LASTFM_NEGATIVE_CACHE_TTL = 24 * 3600    # Empty, sparse or "not found" responses
+LASTFM_CACHE_MAX_ENTRIES = 200_000
+LASTFM_TRANSIENT_ERRORS = {8, 11, 16, 29} # Operation failed, offline, temporary, rate limited
 
-    return genre_filters
+_lastfm_cache = PersistentCache("lastfm", max_entries = LASTFM_CACHE_MAX_ENTRIES)
 
-def _normalize_genre(name: str):
-    """Normalize a genre string for comparison."""
-    return _nonword_re.sub("", name.lower().strip())
+# Artist-level Christian verdicts keyed by Spotify artist ID
+ARTIST_VERDICT_TTL = 30 * 24 * 3600
+ARTIST_VERDICT_MAX_ENTRIES = 100_000
+_artist_verdicts = PersistentCache("artist_verdicts", max_entries = ARTIST_VERDICT_MAX_ENTRIES)
+
+# Shared keep-alive session so fallback lookups reuse pooled connections
+_session = requests.Session()
+_session.mount("http://", HTTPAdapter(pool_connections = 4, pool_maxsize = 16))
+_session.mount("https://", HTTPAdapter(pool_connections = 4, pool_maxsize = 16))
+
+MATCHER = load_tag_matcher()
+ALLOWED_GENRES = MATCHER.allowed
 
 def _apply_christian_tag_filter(tags: list):
     """Filter tags to only include Christian-related ones."""
-    christian_keywords = {"christian", "ccm", "worship", "gospel", "chh", "jesus", "bible", "christ"}
-    filtered = []
-    for tag in tags:
-        name = tag.get("name", "").lower().strip()
-        # Check if any Christian keyword is contained in the tag name
-        if any(keyword in name for keyword in christian_keywords):
-            filtered.append(tag)
-    return filtered
-
-ALLOWED_GENRES = _load_genre_filter()
-
-def get_tags_for_song(song_name: str, artist_name: str, limit: int = 5):
-    """Return a filtered list of tags from Last.fm for a given song."""
-    def _get_spotify_artist_genres(artist_name: str):
-        # Use Spotify artist genres as tags
-        artist_info = search_song(artist_name = artist_name)
-        if not artist_info:
-            return []
-        track_id = artist_info.get("track_id")
-        if not track_id:
-            return []
-        try:
+    verdicts = MATCHER.classify(tag.get("name", "") for tag in tags)
+    return [tag for tag, (_, _, _, christian) in zip(tags, verdicts) if christian]
+
+def _get_spotify_artist_genres(artist_name: str, artist_id: Optional[str] = None):
+    """Use Spotify artist genres as tags; the artist is looked up by name unless ``artist_id`` is known."""
+    try:
+        if not artist_id:
+            artist_info = search_song(artist_name = artist_name)
+            if not artist_info:
+                return []
+            track_id = artist_info.get("track_id")
+            if not track_id:
+                return []
             track = sp.track(track_id)
             if not track or not track.get("artists"):
                 return []
             artist_id = track["artists"][0]["id"]
-            artist = sp.artist(artist_id)
-            if not artist:
-                return []
-            genres = artist.get("genres", [])
-            tags = [{"name": genre, "count": 100, "url": ""} for genre in genres]
-            return tags
-        except SpotifyException:
+        artist = sp.artist(artist_id)
+        if not artist:
             return []
+        genres = artist.get("genres", [])
+        tags = [{"name": genre, "count": 100, "url": ""} for genre in genres]
+        return tags
+    except SpotifyException:
+        return []
 
-    def _call(method, **kwargs):
-        if method != "spotify":
-            params = {
-                "method": method,
-                "api_key": LASTFM_API_KEY,
-                "format": "json",
-                "autocorrect": 1,
-                **kwargs
-            }
-            results = requests.get(BASE_URL, params = params)
-            results.raise_for_status()
-            tags = results.json().get("toptags", {}).get("tag", [])
-            return tags if isinstance(tags, list) else [tags]
+def _count_results(data: dict) -> int:
+    """Count the items in a Last.fm response such as ``{"toptags": {"tag": [...]}}``."""
+    if "error" in data:
+        return 0
+    for section in data.values():
+        if isinstance(section, dict):
+            for items in section.values():
+                if isinstance(items, list):
+                    return len(items)
+                if isinstance(items, dict):
+                    return 1
+    return 0
+
+def _lastfm_get(method: str, min_results: int = 1, **kwargs) -> dict:
+    """
+    Call a Last.fm API method over the shared keep-alive session.
+    Responses are cached; those with fewer than ``min_results`` items use the shorter negative TTL.
+    """
+    cache_key = make_key(method, {
+        name: value.lower().strip() if isinstance(value, str) else value
+        for name, value in kwargs.items()
+    })
+    cached = _lastfm_cache.get(cache_key)
+    if cached is not MISSING:
+        return cached
+
+    params = {
+        "method": method,
+        "api_key": LASTFM_API_KEY,
+        "format": "json",
+        "autocorrect": 1,
+        **kwargs
+    }
+    results = _session.get(BASE_URL, params = params, timeout = LASTFM_TIMEOUT)
+    results.raise_for_status()
+    data = results.json()
+
+    if data.get("error") not in LASTFM_TRANSIENT_ERRORS:
+        ttl = LASTFM_CACHE_TTL if _count_results(data) >= min_results else LASTFM_NEGATIVE_CACHE_TTL
+        _lastfm_cache.set(cache_key, data, ttl)
+    return data
+
+def _fetch_toptags(method: str, kwargs: dict) -> list:
+    """Return the raw tag list for one fallback method."""
+    min_results = 1 if method == "artist.gettoptags" else 5
+    tags = _lastfm_get(method, min_results = min_results, **kwargs).get("toptags", {}).get("tag", [])
+    return tags if isinstance(tags, list) else [tags]
+
+def _select_tags(method: str, raw_tags: list, artist_name: str, limit: int):
+    """
+    Apply the genre whitelist to one method's raw tags.
+    Returns ``(filtered_tags, source_message)``; the message is None when
+    the method had enough tags but none of them passed the filter.
+    """
+    if not raw_tags or (len(raw_tags) < 5 and method != "artist.gettoptags"):
+        return [], f"Method {method} returned {len(raw_tags) if raw_tags else 0} raw tags, therefore not used"
+
+    seen = set()
+    filtered_tags = []
+    DISSALLOWED_TAGS = {"usa", "american", "seen live", "french", "german", artist_name.lower()}
+
+    verdicts = MATCHER.classify(tag.get("name", "") for tag in raw_tags)
+    for tag, (name, norm, allowed, _) in zip(raw_tags, verdicts):
+        if (norm in seen or name in DISSALLOWED_TAGS or artist_name.lower() in name):
+            continue
+
+        if allowed:
+            filtered_tags.append({
+                "name": name,
+                "count": int(tag.get("count", 0)),
+                "url": tag.get("url", "")
+            })
+            seen.add(norm)
+
+        if len(filtered_tags) >= limit:
+            break
+
+    if filtered_tags:
+        return filtered_tags, f"Method {method} returned {len(raw_tags)} raw tags, therefore was used"
+    return [], None
+
+def get_tags_for_song(song_name: str, artist_name: str, limit: int = 5, concurrent_lookups: bool = False,
+                      artist_id: Optional[str] = None):
+    """
+    Return a filtered list of tags from Last.fm for a given song.
+    With ``concurrent_lookups`` the fallbacks run in ``TAG_LOOKUP_STAGES``: the two middle
+    methods are requested together, and the artist lookup overlaps the Spotify genre lookup.
+    Results are still applied in priority order. This costs at most one request more than
+    sequential lookups (an album call whose track-level sibling already qualified).
+    """
+    filtered_tags, sources, _, _ = _get_tags_with_method(song_name, artist_name, limit, concurrent_lookups, artist_id)
+    return filtered_tags, sources
 
+def _get_tags_with_method(song_name: str, artist_name: str, limit: int, concurrent_lookups: bool,
+                          artist_id: Optional[str], artist_verdict: Optional[dict] = None):
+    """
+    ``get_tags_for_song`` that also returns the last fallback method tried and whether
+    that method's request failed (so its empty result says nothing about the song).
+    A stored ``artist_verdict`` replaces the artist-level lookups (method ``"artist_verdict"``)
+    once the track-level methods have fallen through.
+    """
     attempts = [
         ("track.gettoptags", {"artist": artist_name, "track": song_name}),
         ("track.getTags", {"artist": artist_name, "track": song_name}),
@@ -113,56 +189,81 @@ def get_tags_for_song(song_name: str, artist_name: str, limit: int = 5):
         ("artist.gettoptags", {"artist": artist_name}),
     ]
 
-    seen = set()
+    executor = None
+    futures = {}
+    spotify_future = None
+    if concurrent_lookups:
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers = 2)
+
     filtered_tags = []
-    raw_tags = []
-    DISSALLOWED_TAGS = {"usa", "american", "seen live", "french", "german", artist_name.lower()}
     sources = []
     method = None
+    lookup_failed = False
 
-    for method, kwargs in attempts:
-        try:
-            raw_tags = _call(method, **kwargs)
-
-            if not raw_tags or (len(raw_tags) < 5 and method != "artist.gettoptags"):
-                sources.append(f"Method {method} returned {len(raw_tags) if raw_tags else 0} raw tags, therefore not used")
-                continue
-
-            for tag in raw_tags:
-                name = tag.get("name", "").lower().strip()
-                norm = _normalize_genre(name)
-
-                if (norm in seen or name in DISSALLOWED_TAGS or artist_name.lower() in name):
-                    continue
+    try:
+        for idx, (method, kwargs) in enumerate(attempts):
+            if method == "artist.gettoptags" and artist_verdict is not None:
+                method = "artist_verdict"
+                filtered_tags = list(artist_verdict["tags"])
+                sources.extend(artist_verdict["methods"] + ["Track-level tags fell through; used stored artist verdict"])
+                lookup_failed = False
+                break
 
-                if (name in ALLOWED_GENRES or norm in ALLOWED_GENRES or any(word in ALLOWED_GENRES for word in _word_re.findall(name))):
-                    filtered_tags.append({
-                        "name": name,
-                        "count": int(tag.get("count", 0)),
-                        "url": tag.get("url", "")
-                    })
-                    seen.add(norm)
+            if executor and idx not in futures:
+                # Every earlier stage came back empty; start the whole next stage
+                stage = next(stage for stage in TAG_LOOKUP_STAGES if idx in stage)
+                for position in stage:
+                    futures[position] = executor.submit(_fetch_toptags, *attempts[position])
+                if method == "artist.gettoptags":
+                    # Track-level methods fell through; overlap the Spotify genre lookup with the artist call
+                    spotify_future = executor.submit(_get_spotify_artist_genres, artist_name, artist_id)
 
-                if len(filtered_tags) >= limit:
-                    break
+            try:
+                raw_tags = futures[idx].result() if executor else _fetch_toptags(method, kwargs)
+                lookup_failed = False
+            except Exception:
+                lookup_failed = True
+                continue
 
+            filtered_tags, message = _select_tags(method, raw_tags, artist_name, limit)
+            if message:
+                sources.append(message)
             if filtered_tags:
-                sources.append(f"Method {method} returned {len(raw_tags)} raw tags, therefore was used")
                 break
 
-        except Exception:
-            continue
-
-    if method == "artist.gettoptags":
-        spotify_tags = _get_spotify_artist_genres(artist_name)
-        if len(filtered_tags) == 0:
-            sources.append("No Last.fm tags; used Spotify artist genres")
-        filtered_tags.extend(spotify_tags)
-
-    return filtered_tags, sources
+        if method == "artist.gettoptags":
+            spotify_tags = spotify_future.result() if spotify_future else _get_spotify_artist_genres(artist_name, artist_id)
+            if len(filtered_tags) == 0:
+                sources.append("No Last.fm tags; used Spotify artist genres")
+            filtered_tags.extend(spotify_tags)
+    finally:
+        if executor:
+            executor.shutdown(wait = False, cancel_futures = True)
+
+    return filtered_tags, sources, method, lookup_failed
+
+def get_artist_verdict(artist_id: str) -> Optional[dict]:
+    """Return the stored artist-level classification for a Spotify artist, if still fresh."""
+    verdict = _artist_verdicts.get(artist_id)
+    return None if verdict is MISSING else verdict
+
+def record_artist_verdict(artist_id: str, tags: list, methods: list, is_christian: bool, source: str):
+    """Store an artist-level classification for ``ARTIST_VERDICT_TTL`` seconds."""
+    _artist_verdicts.set(artist_id, {
+        "tags": tags,
+        "methods": methods,
+        "is_christian": is_christian,
+        "source": source,
+    }, ARTIST_VERDICT_TTL)
 
 def is_song_christian(song_id: str):
-    """Determine if a song is Christian based on its Last.fm tags."""
+    """
+    Determine if a song is Christian based on its Last.fm tags.
+    Track and album tags always come first. Only when they fall through is the stored
+    artist verdict used, in place of the artist-level lookups, so one artist verdict never
+    overrides a track's own tags. A verdict is only stored when the artist lookup answered
+    and produced tags, so a failed request never turns into a month of "no tags" for the artist.
+    """
     song_info = search_song(track_id = song_id)
     if not song_info:
         return False, None, None, None, None
@@ -172,12 +273,17 @@ def is_song_christian(song_id: str):
     if not song_name or not artist_name:
         return False, None, None, None, None
 
-    tags, methods = get_tags_for_song(song_name, artist_name, limit = 10)
+    artist_id = song_info.get("artist_id")
+    verdict = get_artist_verdict(artist_id) if artist_id else None
+
+    tags, methods, method, lookup_failed = _get_tags_with_method(song_name, artist_name, 10, True, artist_id, verdict)
+    is_christian = len(_apply_christian_tag_filter(tags)) > 0
+    if artist_id and tags and method == "artist.gettoptags" and not lookup_failed:
+        source = "spotify.artist_genres" if "No Last.fm tags; used Spotify artist genres" in methods else method
+        record_artist_verdict(artist_id, tags, methods, is_christian, source)
+
     if not tags:
         return False, None, None, None, None
-    
-    christian_tags = _apply_christian_tag_filter(tags)
-    is_christian = len(christian_tags) > 0
 
     if is_christian:
         isrc = song_info.get("isrc")
@@ -186,10 +292,70 @@ def is_song_christian(song_id: str):
 
     return is_christian, tags, methods, isrc, song_info
 
+def _ordered_fanout(fn, items, max_workers: int = SIMILAR_RESOLVE_WORKERS):
+    """
+    Yield ``fn(item)`` for each item in input order with at most ``max_workers``
+    calls in flight. Failed calls yield None; closing the generator cancels queued calls.
+    """
+    items = iter(items)
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers = max_workers)
+    window = deque(executor.submit(fn, item) for item in itertools.islice(items, max_workers))
+    try:
+        while window:
+            future = window.popleft()
+            for item in itertools.islice(items, 1):
+                window.append(executor.submit(fn, item))
+            try:
+                yield future.result()
+            except Exception:
+                yield None
+    finally:
+        executor.shutdown(wait = False, cancel_futures = True)
+
+def _resolve_similar_track(candidate: tuple):
+    """Resolve a Last.fm ``(title, artist)`` pair to a Spotify track with an ISRC."""
+    match_title, match_artist = candidate
+    spotify_data = search_song(song_name=match_title, artist_name=match_artist)
+    if not spotify_data or "error" in spotify_data:
+        return None
+    if not spotify_data.get("track_id") or not spotify_data.get("isrc"):
+        return None
+    return {
+        "title": match_title,
+        "artist": match_artist,
+        "track_id": spotify_data["track_id"],
+        "isrc": spotify_data["isrc"],
+        "source_api": "lastfm"
+    }
+
+def _resolve_artist_top_tracks(artist_name: str) -> list:
+    """Return a similar artist's Spotify top tracks, shuffled, as candidate dicts."""
+    s_results = sp.search(q=f'artist:"{artist_name}"', type="artist", limit=1)
+    if not s_results or not s_results.get("artists") or not s_results["artists"].get("items"):
+        return []
+    top_tracks = sp.artist_top_tracks(s_results["artists"]["items"][0]["id"])
+    if not top_tracks or "tracks" not in top_tracks:
+        return []
+
+    t_tracks = list(top_tracks["tracks"])
+    random.shuffle(t_tracks)
+    return [
+        {
+            "title": t.get("name"),
+            "artist": t["artists"][0]["name"] if t.get("artists") else None,
+            "track_id": t.get("id"),
+            "isrc": t.get("external_ids", {}).get("isrc"),
+            "source_api": "spotify_fallback"
+        }
+        for t in t_tracks
+        if t.get("id") and t.get("external_ids", {}).get("isrc")
+    ]
+
 def get_similar_tracks_by_id(track_id: str, limit: int = 5):
     """
     Fetch similar tracks using Last.fm native API first.
     If less than 2 valid tracks are returned, supplement with Spotify's Related Artists feature.
+    Candidates are resolved to Spotify concurrently, stopping once ``limit`` unique ISRCs are found.
     """
     try:
         track_id = track_id.replace("spotify:track:", "")
@@ -205,94 +371,44 @@ def get_similar_tracks_by_id(track_id: str, limit: int = 5):
         seen_isrcs = set()
         
         # 1. LastFM track.getSimilar
-        import random
-        params = {
-            "method": "track.getsimilar",
-            "api_key": LASTFM_API_KEY,
-            "format": "json",
-            "autocorrect": 1,
-            "artist": artist_name,
-            "track": song_name,
-            "limit": limit * 3
-        }
         try:
-            res = requests.get(BASE_URL, params=params, timeout=10)
-            if res.status_code == 200:
-                data = res.json()
-                similartracks = data.get("similartracks", {}).get("track", [])
-                if isinstance(similartracks, dict):
-                    similartracks = [similartracks]
-                    
-                for t in similartracks:
+            data = _lastfm_get("track.getsimilar", artist=artist_name, track=song_name, limit=limit * 3)
+            similartracks = data.get("similartracks", {}).get("track", [])
+            if isinstance(similartracks, dict):
+                similartracks = [similartracks]
+
+            candidates = [
+                (t.get("name"), t.get("artist", {}).get("name"))
+                for t in similartracks
+                if t.get("name") and t.get("artist", {}).get("name")
+            ]
+            with contextlib.closing(_ordered_fanout(_resolve_similar_track, candidates)) as resolved_tracks:
+                for resolved in resolved_tracks:
+                    if resolved and resolved["isrc"] not in seen_isrcs:
+                        seen_isrcs.add(resolved["isrc"])
+                        final_tracks.append(resolved)
                     if len(final_tracks) >= limit: break
-                    match_title = t.get("name")
-                    match_artist = t.get("artist", {}).get("name")
-                    if match_title and match_artist:
-                        spotify_data = search_song(song_name=match_title, artist_name=match_artist)
-                        if spotify_data and "error" not in spotify_data:
-                            t_id = spotify_data.get("track_id")
-                            isrc = spotify_data.get("isrc")
-                            if t_id and isrc and isrc not in seen_isrcs:
-                                seen_isrcs.add(isrc)
-                                final_tracks.append({
-                                    "title": match_title,
-                                    "artist": match_artist,
-                                    "track_id": t_id,
-                                    "isrc": isrc,
-                                    "source_api": "lastfm"
-                                })
         except Exception as e:
             print(f"[lastfm] Failed to fetch similar tracks: {e}")
             
         # 2. LastFM Artist Similarity Fallback
         if len(final_tracks) < 2 and artist_id:
             try:
-                params_artist = {
-                    "method": "artist.getsimilar",
-                    "api_key": LASTFM_API_KEY,
-                    "format": "json",
-                    "artist": artist_name,
-                    "limit": 5
-                }
-                res_artist = requests.get(BASE_URL, params=params_artist, timeout=10)
-                if res_artist.status_code == 200:
-                    data_artist = res_artist.json()
-                    similar_artists = data_artist.get("similarartists", {}).get("artist", [])
-                    if isinstance(similar_artists, dict):
-                        similar_artists = [similar_artists]
-                    
-                    random.shuffle(similar_artists)
-                    for s_artist_obj in similar_artists:
+                data_artist = _lastfm_get("artist.getsimilar", artist=artist_name, limit=5)
+                similar_artists = data_artist.get("similarartists", {}).get("artist", [])
+                if isinstance(similar_artists, dict):
+                    similar_artists = [similar_artists]
+
+                random.shuffle(similar_artists)
+                names = [s_artist_obj.get("name") for s_artist_obj in similar_artists if s_artist_obj.get("name")]
+                with contextlib.closing(_ordered_fanout(_resolve_artist_top_tracks, names)) as artist_tracks:
+                    for t_tracks in artist_tracks:
+                        for t in t_tracks or []:
+                            if len(final_tracks) >= limit: break
+                            if t["isrc"] not in seen_isrcs:
+                                seen_isrcs.add(t["isrc"])
+                                final_tracks.append(t)
                         if len(final_tracks) >= limit: break
-                        s_name = s_artist_obj.get("name")
-                        if not s_name: continue
-                        
-                        # Resolve Spotify Artist
-                        s_data = search_song(artist_name=s_name)
-                        s_results = sp.search(q=f'artist:"{s_name}"', type="artist", limit=1)
-                        if s_results and s_results.get("artists") and s_results["artists"].get("items"):
-                            r_artist_id = s_results["artists"]["items"][0]["id"]
-                            # Fetch top tracks
-                            top_tracks = sp.artist_top_tracks(r_artist_id)
-                            if top_tracks and "tracks" in top_tracks:
-                                t_tracks = top_tracks["tracks"]
-                                random.shuffle(t_tracks)
-                                for t in t_tracks:
-                                    if len(final_tracks) >= limit: break
-                                    t_id = t.get("id")
-                                    t_isrc = t.get("external_ids", {}).get("isrc")
-                                    t_title = t.get("name")
-                                    t_a_name = t["artists"][0]["name"] if t.get("artists") else None
-                                    
-                                    if t_id and t_isrc and t_isrc not in seen_isrcs:
-                                        seen_isrcs.add(t_isrc)
-                                        final_tracks.append({
-                                            "title": t_title,
-                                            "artist": t_a_name,
-                                            "track_id": t_id,
-                                            "isrc": t_isrc,
-                                            "source_api": "spotify_fallback"
-                                        })
             except Exception as e:
                 print(f"[fallback] Failed fetching similar artists via lastfm: {e}")
                 
@@ -5,11 +5,12 @@ song searching and audio feature retrieval
 import glob
 import math
 import os
+import re
 import subprocess
 import logging
 import concurrent.futures
 import time
-from typing import List, Dict, Optional
+from typing import List, Dict, Iterator, Optional, Tuple
 import requests
 import spotipy
 import yt_dlp
@@ -17,19 +18,116 @@ import librosa
 from dotenv import load_dotenv
 from spotipy.exceptions import SpotifyException
 from spotipy.oauth2 import SpotifyClientCredentials
+from services.cache import PersistentCache, CacheStats, MISSING, make_key
 
 logger = logging.getLogger(__name__)
 
 load_dotenv()
 
-sp = spotipy.Spotify(auth_manager = SpotifyClientCredentials(
+# Seconds each Spotify endpoint response stays cached
+SPOTIFY_CACHE_TTLS = {
+    "track": 7 * 24 * 3600,
+    "album": 7 * 24 * 3600,
+    "artist": 24 * 3600,
+    "search": 24 * 3600,
+    "artist_top_tracks": 24 * 3600,
+}
+SPOTIFY_CACHE_MAX_ENTRIES = 200_000 # Rows kept in the SQLite store; expired and soonest-expiring rows go first
+
+class CachedSpotify:
+    """
+    Read-through cache around a ``spotipy.Spotify`` client.
+    Track, album, artist, search and top-tracks responses are served from
+    ``PersistentCache``; every other attribute is passed to the wrapped client.
+    """
+
+    def __init__(self, client: spotipy.Spotify, cache: Optional[PersistentCache] = None):
+        self.client = client
+        self.cache = cache or PersistentCache("spotify", max_entries = SPOTIFY_CACHE_MAX_ENTRIES)
+        self.stats = CacheStats()
+
+    def _cached(self, endpoint: str, *args, **kwargs):
+        key = make_key(endpoint, args, kwargs)
+        value = self.cache.get(key)
+        if value is not MISSING:
+            self.stats.hit(endpoint)
+            return value
+
+        self.stats.miss(endpoint)
+        value = getattr(self.client, endpoint)(*args, **kwargs)
+        if value is not None:
+            self.cache.set(key, value, SPOTIFY_CACHE_TTLS[endpoint])
+        return value
+
+    def track(self, track_id: str, market: Optional[str] = None):
+        return self._cached("track", track_id, market=market)
+
+    def tracks(self, track_ids: List[str], market: Optional[str] = None):
+        """
+        Batch track lookup sharing cache entries with ``track``.
+        Only uncached ids go to Spotify, ``SPOTIFY_BATCH_SIZE`` per request.
+        """
+        found: Dict[str, Optional[Dict]] = {}
+        misses: List[str] = []
+        for track_id in dict.fromkeys(track_ids):
+            value = self.cache.get(make_key("track", (track_id,), {"market": market}))
+            if value is MISSING:
+                misses.append(track_id)
+            else:
+                found[track_id] = value
+
+        self.stats.hit("track", len(found))
+        self.stats.miss("track", len(misses))
+
+        for start in range(0, len(misses), SPOTIFY_BATCH_SIZE):
+            chunk = misses[start:start + SPOTIFY_BATCH_SIZE]
+            response = self.client.tracks(chunk, market=market) or {}
+            for track_id, track in zip(chunk, response.get("tracks") or []):
+                found[track_id] = track
+                if track is not None:
+                    self.cache.set(make_key("track", (track_id,), {"market": market}), track, SPOTIFY_CACHE_TTLS["track"])
+
+        return {"tracks": [found.get(track_id) for track_id in track_ids]}
+
+    def album(self, album_id: str, market: Optional[str] = None):
+        return self._cached("album", album_id, market=market)
+
+    def artist(self, artist_id: str):
+        return self._cached("artist", artist_id)
+
+    def artist_top_tracks(self, artist_id: str, country: str = "US"):
+        return self._cached("artist_top_tracks", artist_id, country=country)
+
+    def search(self, q: str, limit: int = 10, offset: int = 0, type: str = "track", market: Optional[str] = None):
+        return self._cached("search", q, limit=limit, offset=offset, type=type, market=market)
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
+
+sp = CachedSpotify(spotipy.Spotify(auth_manager = SpotifyClientCredentials(
     client_id = os.getenv("SPOTIFY_CLIENT_ID"),
     client_secret = os.getenv("SPOTIFY_CLIENT_SECRET")
-))
+)))
 
-TEMP_DIR = "temp"
+TEMP_DIR = os.getenv("WORSHIPIFY_TEMP_DIR", "temp")
+SPOTIFY_BATCH_SIZE = 50 # Max ids accepted by the /tracks endpoint
 RECCOBEATS_API = "https://api.reccobeats.com/v1/analysis/audio-features"
 
+def _track_details(track: Dict) -> Dict:
+    """Flatten a Spotify track object into the metadata dict used across the backend."""
+    return{
+        "title": track["name"],
+        "artist": track["artists"][0]["name"],
+        "artist_id": track["artists"][0]["id"],
+        "album": track["album"]["name"],
+        "spotify_url": track["external_urls"]["spotify"],
+        "preview_url": track["preview_url"],
+        "album_art": track["album"]["images"][0]["url"] if track["album"]["images"] else None,
+        "track_id": track["id"],
+        "isrc": track["external_ids"]["isrc"],
+        "yt_url": f"ytsearch1:{track['name']} {track['artists'][0]['name']} official audio"
+    }
+
 def search_song(song_name: Optional[str] = None, artist_name: Optional[str] = None, track_id: Optional[str] = None) -> Optional[Dict]:
     """Return metadata for the best matching Spotify track."""
 
@@ -41,17 +139,7 @@ def search_song(song_name: Optional[str] = None, artist_name: Optional[str] = No
             track = sp.track(track_id)
             if not track:
                 return {"error": "Track not found"}
-            return{
-                "title": track["name"],
-                "artist": track["artists"][0]["name"],
-                "album": track["album"]["name"],
-                "spotify_url": track["external_urls"]["spotify"],
-                "preview_url": track["preview_url"],
-                "album_art": track["album"]["images"][0]["url"] if track["album"]["images"] else None,
-                "track_id": track["id"],
-                "isrc": track["external_ids"]["isrc"],
-                "yt_url": f"ytsearch1:{track['name']} {track['artists'][0]['name']} official audio"
-            }
+            return _track_details(track)
         except SpotifyException as error:
             return {"error": f"Spotify track lookup failed: {error}"}
     
@@ -69,17 +157,7 @@ def search_song(song_name: Optional[str] = None, artist_name: Optional[str] = No
 
     if results and results.get("tracks") and results["tracks"].get("items"):
         track = results["tracks"]["items"][0]
-        return{
-            "title": track["name"],
-            "artist": track["artists"][0]["name"],
-            "album": track["album"]["name"],
-            "spotify_url": track["external_urls"]["spotify"],
-            "preview_url": track["preview_url"],
-            "album_art": track["album"]["images"][0]["url"] if track["album"]["images"] else None,
-            "track_id": track["id"],
-            "isrc": track["external_ids"]["isrc"],
-            "yt_url": f"ytsearch1:{track['name']} {track['artists'][0]['name']} official audio"
-        }
+        return _track_details(track)
     return {"error": "Song not found"}
 
 def validate_spotify_track(spotify_track_id: str) -> bool:
@@ -106,6 +184,103 @@ def validate_spotify_playlist(spotify_playlist_id: str) -> bool:
     except SpotifyException:
         return False
 
+_spotify_id_re  = re.compile(r"^[A-Za-z0-9]{22}$")
+_spotify_uri_re = re.compile(r"^spotify:(track|album|playlist):([A-Za-z0-9]{22})$")
+_spotify_url_re = re.compile(r"open\.spotify\.com/(?:intl-[\w-]+/|embed/)?(track|album|playlist)/([A-Za-z0-9]{22})")
+
+def parse_spotify_id(value: str) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Parse a Spotify URI, URL or bare ID without any network calls.
+    Returns ``(kind, id)``; ``kind`` is None for a bare ID since its type
+    is ambiguous, and both are None if the input is not a Spotify reference.
+    """
+    value = value.strip()
+    match = _spotify_uri_re.match(value) or _spotify_url_re.search(value)
+    if match:
+        return match.group(1), match.group(2)
+    if _spotify_id_re.match(value):
+        return None, value
+    return None, None
+
+def detect_spotify_id_type(value: str, probe_kinds: Tuple[str, ...] = ("track", "album", "playlist")) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Return ``(kind, id)`` for a pasted Spotify reference.
+    URIs and URLs are resolved locally; only bare IDs are probed against the
+    ``probe_kinds`` endpoints in order (callers that already batch-checked tracks skip "track").
+    """
+    kind, spotify_id = parse_spotify_id(value)
+    if spotify_id is None or kind is not None:
+        return kind, spotify_id
+
+    probes = {
+        "track": validate_spotify_track,
+        "album": validate_spotify_album,
+        "playlist": validate_spotify_playlist,
+    }
+    for kind in probe_kinds:
+        if probes[kind](spotify_id):
+            return kind, spotify_id
+    return None, spotify_id
+
+def get_tracks(track_ids: List[str]) -> Dict[str, Optional[Dict]]:
+    """
+    Resolve many track IDs with the batch endpoint (50 per request).
+    Returns a mapping of ID to full track object, or None if Spotify has no such track.
+    A batch rejected as malformed (HTTP 400) is split until the bad IDs are isolated, so one
+    bad ID does not condemn the rest. Any other ``SpotifyException`` (rate limit, server error)
+    is raised, so callers can retry the batch instead of treating valid tracks as missing.
+    """
+    if not track_ids:
+        return {}
+    try:
+        response = sp.tracks(track_ids)
+    except SpotifyException as error:
+        if error.http_status != 400:
+            raise
+        if len(track_ids) == 1:
+            return {track_ids[0]: None}
+        logger.warning(f"Spotify rejected a batch of {len(track_ids)} track IDs, splitting it: {error}")
+        middle = len(track_ids) // 2
+        return {**get_tracks(track_ids[:middle]), **get_tracks(track_ids[middle:])}
+    return dict(zip(track_ids, response["tracks"]))
+
+def _iter_pages(first_page: Optional[Dict]) -> Iterator[Dict]:
+    """
+    Yield every page of a Spotify paging object.
+    The next page is fetched in the background while the caller handles the current one.
+    """
+    page = first_page
+    with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+        while page:
+            next_future = executor.submit(sp.next, page) if page.get("next") else None
+            yield page
+            page = next_future.result() if next_future else None
+
+def iter_playlist_tracks(spotify_playlist_id: str) -> Iterator[List[Tuple[str, str]]]:
+    """Stream a playlist as pages of ``(track_id, name)`` tuples, 100 tracks per page."""
+    first_page = sp.playlist_items(
+        spotify_playlist_id,
+        fields="items(track(id,name,type)),next",
+        limit=100,
+        additional_types=("track",),
+    )
+    for page in _iter_pages(first_page):
+        yield [
+            (item["track"]["id"], item["track"]["name"])
+            for item in page.get("items", [])
+            if item.get("track") and item["track"].get("id")
+        ]
+
+def iter_album_tracks(spotify_album_id: str) -> Iterator[List[Tuple[str, str]]]:
+    """Stream an album as pages of ``(track_id, name)`` tuples, 50 tracks per page."""
+    first_page = sp.album_tracks(spotify_album_id, limit=50)
+    for page in _iter_pages(first_page):
+        yield [
+            (item["id"], item["name"])
+            for item in page.get("items", [])
+            if item.get("id")
+        ]
+
 def _ffmpeg_trim(src: str, start: int, dur: int, dst: str) -> None:
     """Trim ``dur`` seconds from ``src`` starting at ``start`` using ffmpeg."""
     subprocess.run(
@@ -130,10 +305,12 @@ def _get_duration(src: str) -> float:
     ])
     return float(out.strip())
 
-def download_audio(youtube_url: str, base_path_no_ext: str) -> List[str]:
+def download_audio(youtube_url: str, base_path_no_ext: str, timings: Optional[Dict[str, float]] = None) -> List[str]:
     """Download full audio from YouTube and split into 30s clips—dropping
-    first/last if there are 4+ clips to save ffmpeg calls."""
-    os.makedirs(TEMP_DIR, exist_ok=True)
+    first/last if there are 4+ clips to save ffmpeg calls.
+    If ``timings`` is given, the download and trim durations (seconds) are added to it."""
+    started = time.perf_counter()
+    os.makedirs(os.path.dirname(base_path_no_ext) or TEMP_DIR, exist_ok=True)
     base = f"{base_path_no_ext}"
     outtmpl = base + ".%(ext)s"
 
@@ -153,6 +330,9 @@ def download_audio(youtube_url: str, base_path_no_ext: str) -> List[str]:
     raw = matches[0]
 
     total_secs = _get_duration(raw)
+    if timings is not None:
+        timings["download"] = timings.get("download", 0.0) + time.perf_counter() - started
+        started = time.perf_counter()
 
     num_clips = 4
     clip_duration = 30
@@ -187,6 +367,8 @@ def download_audio(youtube_url: str, base_path_no_ext: str) -> List[str]:
 
         concurrent.futures.wait(trim_tasks)
 
+    if timings is not None:
+        timings["trim"] = timings.get("trim", 0.0) + time.perf_counter() - started
     return out_paths
 
 def extract_features(paths: List[str]):
@@ -303,4 +485,10 @@ def features_to_vector(features: Dict) -> List[float]:
         features["liveness"],
         features["loudness"],
         features["tempo"],
-    ]
\ No newline at end of file
+    ]
+
+def vector_to_features(vector: List[float]) -> Dict:
+    """Convert a stored DB vector back into a feature dict (inverse of ``features_to_vector``)."""
+    keys = ("acousticness", "danceability", "energy", "valence", "instrumentalness",
+            "speechiness", "liveness", "loudness", "tempo")
+    return dict(zip(keys, vector))
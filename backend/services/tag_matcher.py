@@ -0,0 +1,152 @@
+'''
+compiled genre whitelist and Christian keyword matching
+'''
+
+import os
+import json
+import pickle
+import re
+from collections import deque
+from typing import Iterable, List, Tuple
+from services.cache import CACHE_DIR
+
+GENRES_FILE = os.path.join(os.path.dirname(__file__), "..", "data", "genres.txt")
+MATCHER_CACHE_FILE = os.path.join(CACHE_DIR, "tag_matcher.pickle")
+MATCHER_VERSION = 1 # Bump when the compiled layout changes
+
+CHRISTIAN_KEYWORDS = ("christian", "ccm", "worship", "gospel", "chh", "jesus", "bible", "christ")
+
+_nonword_re = re.compile(r"[^\w]+")
+_word_re    = re.compile(r"\w+")
+
+def normalize_genre(name: str) -> str:
+    """Normalize a genre string for comparison."""
+    return _nonword_re.sub("", name.lower().strip())
+
+def build_genre_filter(genres_file: str = GENRES_FILE) -> frozenset:
+    """Parse ``genres.txt`` into the set of allowed names, bare names and words."""
+    genre_filters = set()
+    with open(genres_file, "r", encoding = "utf-8") as txt:
+        for line in txt:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                line_contents = json.loads(line)
+                name = line_contents.get("name", "").lower()
+            except json.JSONDecodeError:
+                continue
+            name = name.strip()
+            if not name:
+                continue
+
+            genre_filters.add(name)
+
+            bare = _nonword_re.sub("", name)
+            if bare:
+                genre_filters.add(bare)
+
+            for word in _word_re.findall(name):
+                genre_filters.add(word)
+
+    return frozenset(genre_filters)
+
+class KeywordAutomaton:
+    """Aho-Corasick automaton answering "does this text contain any keyword" in one scan."""
+
+    def __init__(self, keywords: Iterable[str]):
+        self.goto = [{}]
+        self.fail = [0]
+        self.terminal = [False]
+
+        for keyword in keywords:
+            state = 0
+            for char in keyword:
+                if char not in self.goto[state]:
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.terminal.append(False)
+                    self.goto[state][char] = len(self.goto) - 1
+                state = self.goto[state][char]
+            self.terminal[state] = True
+
+        # Breadth-first pass to wire failure links
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, target in self.goto[state].items():
+                queue.append(target)
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[target] = self.goto[fallback].get(char, 0)
+                self.terminal[target] = self.terminal[target] or self.terminal[self.fail[target]]
+
+    def contains_any(self, text: str) -> bool:
+        """Return True if any keyword occurs as a substring of ``text``."""
+        state = 0
+        for char in text:
+            while state and char not in self.goto[state]:
+                state = self.fail[state]
+            state = self.goto[state].get(char, 0)
+            if self.terminal[state]:
+                return True
+        return False
+
+class TagMatcher:
+    """Precompiled genre whitelist plus Christian keyword automaton."""
+
+    def __init__(self, allowed_genres: frozenset, christian_keywords: Iterable[str] = CHRISTIAN_KEYWORDS):
+        self.allowed = allowed_genres
+        self.christian = KeywordAutomaton(christian_keywords)
+
+    def is_allowed(self, name: str, norm: str) -> bool:
+        """Apply the whitelist to a lowercased tag name and its normalized form."""
+        allowed = self.allowed
+        return name in allowed or norm in allowed or any(word in allowed for word in _word_re.findall(name))
+
+    def is_christian(self, name: str) -> bool:
+        """Return True if the lowercased tag name contains a Christian keyword."""
+        return self.christian.contains_any(name)
+
+    def classify(self, names: Iterable[str]) -> List[Tuple[str, str, bool, bool]]:
+        """
+        Classify a batch of raw tag names in one pass.
+        Returns ``(name, normalized, allowed, christian)`` per input name.
+        """
+        results = []
+        for raw in names:
+            name = raw.lower().strip()
+            norm = _nonword_re.sub("", name)
+            results.append((name, norm, self.is_allowed(name, norm), self.christian.contains_any(name)))
+        return results
+
+def _source_fingerprint(genres_file: str) -> tuple:
+    """Identify the inputs a compiled matcher was built from."""
+    stat = os.stat(genres_file)
+    return (MATCHER_VERSION, stat.st_size, stat.st_mtime_ns, CHRISTIAN_KEYWORDS)
+
+def load_tag_matcher(genres_file: str = GENRES_FILE, cache_file: str = MATCHER_CACHE_FILE) -> TagMatcher:
+    """
+    Return the compiled matcher, rebuilding the cached artifact only when
+    ``genres.txt`` or the keyword list has changed since it was written.
+    """
+    fingerprint = _source_fingerprint(genres_file)
+    try:
+        with open(cache_file, "rb") as handle:
+            cached_fingerprint, matcher = pickle.load(handle)
+        if cached_fingerprint == fingerprint:
+            return matcher
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ValueError, TypeError):
+        pass
+
+    matcher = TagMatcher(build_genre_filter(genres_file))
+    try:
+        os.makedirs(os.path.dirname(os.path.abspath(cache_file)), exist_ok = True)
+        tmp_file = f"{cache_file}.{os.getpid()}.tmp"
+        with open(tmp_file, "wb") as handle:
+            pickle.dump((fingerprint, matcher), handle, protocol = pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_file, cache_file)
+    except OSError:
+        pass # Still usable in memory; the next import retries the write
+    return matcher
@@ -0,0 +1,167 @@
+"""
+Check that the hot seeding queries are served by indexes.
+
+Applies the Alembic migrations to the database in TEST_DATABASE_URL, loads a
+realistic mix of synthetic rows, runs ANALYZE, and asserts on the EXPLAIN output
+of the SQL imported from the seeding modules. Planner settings are left at their
+defaults. Skipped when TEST_DATABASE_URL is not set. Never point it at a
+database you care about.
+"""
+
+import os
+import sys
+import json
+from pathlib import Path
+from datetime import datetime, timedelta, timezone
+
+BACKEND_PATH = Path(__file__).resolve().parent.parent
+
+QUEUE_ROWS = 50_000
+SONG_ROWS = 20_000
+
+def plan_checks() -> list[tuple[str, str, dict, tuple[str, ...]]]:
+    """(label, SQL, parameters, indexes expected in the plan), using the SQL the modules actually run."""
+    sys.path.insert(0, str(BACKEND_PATH))
+    sys.path.insert(0, str(BACKEND_PATH / "seeding"))
+    from worker import CLAIM_JOBS_SQL, REAP_EXPIRED_SQL, SONG_EXISTS_SQL, KNOWN_ISRCS_SQL, QUEUED_IDS_SQL, LEASE_SECONDS, MAX_ATTEMPTS
+    from manager import QUEUE_PAGE_SQL, QUEUE_PAGE_SIZE
+    from frontier import ARTIST_COUNTS_SQL
+    from reindexer import STALEST_SONGS_SQL, REINDEX_BATCH_SIZE, REINDEX_MIN_AGE
+    from services.catalogue import LOOKUP_SQL
+
+    return [
+        ("claim next jobs", CLAIM_JOBS_SQL,
+         {"lease_owner": "test", "lease_seconds": LEASE_SECONDS, "limit": 8},
+         ("populate_queue_pending_tier",)),
+        ("reap expired leases", REAP_EXPIRED_SQL,
+         {"max_attempts": MAX_ATTEMPTS},
+         ("populate_queue_processing_lease",)),
+        ("queue membership check", QUEUED_IDS_SQL,
+         {"track_ids": ["track_00000001", "track_00000002"]},
+         ("populate_queue_spotify_track_id",)),
+        ("queue page by status", QUEUE_PAGE_SQL,
+         {"status": "failed", "after_enqueued_at": datetime.now(timezone.utc) - timedelta(days=1), "after_id": 0,
+          "page_size": QUEUE_PAGE_SIZE},
+         ("populate_queue_status_enqueued",)),
+        ("queue page of pending jobs", QUEUE_PAGE_SQL,
+         {"status": "pending", "after_enqueued_at": None, "after_id": None, "page_size": QUEUE_PAGE_SIZE},
+         ("populate_queue_status_enqueued",)),
+        ("frontier artist counts", ARTIST_COUNTS_SQL,
+         {"artists": ["artist 7"]},
+         ("populate_queue_active_artist", "christian_songs_artist_lower")),
+        ("check_song_exists", SONG_EXISTS_SQL,
+         {"isrc": "ISRC00000001"},
+         ("christian_songs_isrc",)),
+        ("known ISRCs", KNOWN_ISRCS_SQL,
+         {"isrcs": ["ISRC00000001", "ISRC00000002"]},
+         ("christian_songs_isrc",)),
+        ("stalest songs for re-indexing", STALEST_SONGS_SQL,
+         {"limit": REINDEX_BATCH_SIZE, "min_age": REINDEX_MIN_AGE},
+         ("christian_songs_last_indexed",)),
+        ("catalogue lookup by ISRC", LOOKUP_SQL,
+         {"isrc": "ISRC00000001"},
+         ("christian_songs_isrc", "song_tags_pkey")),
+    ]
+
+def migrate(database_url: str):
+    """Apply all migrations to the test database."""
+    from alembic import command
+    from alembic.config import Config
+
+    os.environ["DATABASE_URL"] = database_url
+    config = Config(str(BACKEND_PATH / "alembic.ini"))
+    config.set_main_option("script_location", str(BACKEND_PATH / "migrations"))
+    command.upgrade(config, "head")
+
+def load_rows(db):
+    """Fill the tables with enough rows, in realistic proportions, that the planner's choices mean something."""
+    from sqlalchemy import text
+
+    db.execute(text("""
+        INSERT INTO populate_queue (spotify_track_id, source, status, enqueued_at, scheduled_at, lease_owner,
+                                    lease_expires_at, artist)
+        SELECT 'track_' || lpad(n::text, 8, '0'),
+               'auto_seeded_test',
+               CASE n % 100 WHEN 0 THEN 'pending' WHEN 1 THEN 'processing' WHEN 2 THEN 'failed' ELSE 'done' END,
+               NOW() - make_interval(secs => :rows - n),
+               NOW() + make_interval(secs => n),
+               CASE WHEN n % 100 = 1 THEN 'test' END,
+               CASE WHEN n % 100 = 1 THEN NOW() + make_interval(secs => 300 - n % 600) END,
+               'artist ' || (n % 1000)
+        FROM generate_series(1, :rows) AS n
+        ON CONFLICT (spotify_track_id) DO NOTHING
+    """), {"rows": QUEUE_ROWS})
+    db.execute(text("""
+        INSERT INTO christian_songs (track_id, isrc, title, artist, audio_features, weighted_features, last_indexed)
+        SELECT 'song_' || lpad(n::text, 8, '0'), 'ISRC' || lpad(n::text, 8, '0'), 'title', 'Artist ' || (n % 1000),
+               ARRAY[0.5, 0.5, 0.5, 0.5, 0.0, 0.1, 0.1, -7.0, 120.0], ARRAY[0.5, 0.9, 1.0, 1.2, 0.0, 0.1, 0.0, 0.1, 1.5],
+               CASE WHEN n % 50 = 0 THEN NULL ELSE NOW() - make_interval(days => n % 90) END
+        FROM generate_series(1, :rows) AS n
+        ON CONFLICT DO NOTHING
+    """), {"rows": SONG_ROWS})
+    db.execute(text("""
+        INSERT INTO tags (name)
+        SELECT 'tag ' || n FROM generate_series(1, 2000) AS n
+        ON CONFLICT (name) DO NOTHING
+    """))
+    db.execute(text("""
+        INSERT INTO song_tags (track_id, tag_id, count)
+        SELECT s.track_id, t.id, 10
+        FROM christian_songs s
+        JOIN tags t ON t.id % 500 = (substr(s.track_id, 6)::int % 500)
+        ON CONFLICT DO NOTHING
+    """))
+    for table in ("populate_queue", "christian_songs", "tags", "song_tags"):
+        db.execute(text(f"ANALYZE {table}"))
+
+def plan_indexes(node: dict) -> list[tuple[str, str | None]]:
+    """Flatten an EXPLAIN (FORMAT JSON) plan into (node type, index name) pairs."""
+    found = [(node.get("Node Type"), node.get("Index Name"))]
+    for child in node.get("Plans", []):
+        found.extend(plan_indexes(child))
+    return found
+
+def main() -> int:
+    database_url = os.getenv("TEST_DATABASE_URL")
+    if not database_url:
+        print("TEST_DATABASE_URL is not set, skipping query plan checks.")
+        return 0
+
+    from sqlalchemy import create_engine, text
+
+    migrate(database_url)
+    engine = create_engine(database_url)
+
+    failures: list[str] = []
+    with engine.connect() as db:
+        transaction = db.begin()
+        try:
+            load_rows(db)
+
+            for label, sql, params, expected_indexes in plan_checks():
+                plan = db.execute(text(f"EXPLAIN (FORMAT JSON) {sql}"), params).scalar()
+                if isinstance(plan, str):
+                    plan = json.loads(plan)
+                nodes = plan_indexes(plan[0]["Plan"])
+                indexes = {index for _, index in nodes if index}
+
+                if set(expected_indexes) <= indexes and not any(node == "Seq Scan" for node, _ in nodes):
+                    print(f"✔ {label}: uses {', '.join(expected_indexes)}")
+                else:
+                    print(f"✘ {label}: expected {', '.join(expected_indexes)}, plan nodes {nodes}")
+                    failures.append(label)
+        finally:
+            transaction.rollback()
+
+    engine.dispose()
+
+    if failures:
+        print(f"\n{len(failures)} queries are not served by their index.")
+        return 1
+
+    print("\nAll query plan checks passed.")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,112 @@
+"""
+Check the rejected-track Bloom filter: false-positive rate, key counting and the on-disk snapshot.
+
+Runs without a database; the snapshot is written to a temporary directory.
+"""
+
+import os
+import sys
+import tempfile
+from pathlib import Path
+from datetime import datetime, timedelta, timezone
+
+BACKEND_PATH = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_PATH))
+sys.path.insert(0, str(BACKEND_PATH / "seeding"))
+
+import rejections
+from rejections import BloomFilter, RejectionFilter
+
+CAPACITY = 20_000
+ERROR_RATE = 0.01
+PROBES = 50_000
+
+def check_false_positives() -> list[str]:
+    """A filter filled to capacity has no false negatives and stays near its target false-positive rate."""
+    failures: list[str] = []
+    bloom = BloomFilter(CAPACITY, ERROR_RATE)
+    keys = [f"t:track_{n:08d}" for n in range(CAPACITY)]
+    for key in keys:
+        bloom.add(key)
+
+    missing = sum(key not in bloom for key in keys)
+    if missing:
+        failures.append(f"bloom: {missing} added keys are reported absent")
+
+    hits = sum(f"t:other_{n:08d}" in bloom for n in range(PROBES))
+    rate = hits / PROBES
+    if rate > ERROR_RATE * 2:
+        failures.append(f"bloom: false-positive rate {rate:.2%} at capacity, target {ERROR_RATE:.0%}")
+    else:
+        print(f"✔ false-positive rate {rate:.2%} at capacity (target {ERROR_RATE:.0%})")
+    return failures
+
+def sample_rows(count: int, start: datetime) -> list[tuple]:
+    return [(f"track_{n:08d}", f"ISRC{n:08d}", start + timedelta(seconds=n)) for n in range(count)]
+
+def check_counting() -> list[str]:
+    """Re-reading the refresh overlap window adds no keys."""
+    failures: list[str] = []
+    start = datetime.now(timezone.utc) - timedelta(hours=1)
+    rows = sample_rows(1_000, start)
+    filter_ = RejectionFilter(snapshot_file=os.devnull)
+
+    added = filter_.add_rows(rows)
+    count = filter_.bloom.count
+    again = filter_.add_rows(rows[-100:])
+    if added != len(rows) or again != 0 or filter_.bloom.count != count:
+        failures.append(f"count: added {added} then {again} rows, bloom.count {count} -> {filter_.bloom.count}")
+    else:
+        print("✔ overlapping refreshes do not inflate the key count")
+    return failures
+
+def check_snapshot() -> list[str]:
+    """A saved snapshot restores the same bits, count and watermark; a stale layout is ignored."""
+    failures: list[str] = []
+    start = datetime.now(timezone.utc) - timedelta(hours=1)
+    rows = sample_rows(1_000, start)
+
+    with tempfile.TemporaryDirectory() as directory:
+        snapshot_file = os.path.join(directory, "rejections.bloom")
+        saved = RejectionFilter(snapshot_file)
+        saved.add_rows(rows)
+        saved.save()
+
+        restored = RejectionFilter(snapshot_file)
+        restored.restore()
+        if restored.bloom.bits != saved.bloom.bits or restored.bloom.count != saved.bloom.count:
+            failures.append("snapshot: restored bits or count differ from the saved filter")
+        if restored.watermark != rows[-1][2]:
+            failures.append(f"snapshot: watermark {restored.watermark}, expected {rows[-1][2]}")
+        if not all(restored.might_be_rejected(track_id, isrc) for track_id, isrc, _ in rows):
+            failures.append("snapshot: restored filter is missing saved rejections")
+
+        version = rejections.BLOOM_VERSION
+        rejections.BLOOM_VERSION = version + 1
+        try:
+            stale = RejectionFilter(snapshot_file)
+            stale.restore()
+        finally:
+            rejections.BLOOM_VERSION = version
+        if stale.watermark is not None or stale.bloom.count:
+            failures.append("snapshot: a snapshot with another BLOOM_VERSION was restored")
+
+    if not failures:
+        print("✔ snapshot save and restore")
+    return failures
+
+def main() -> int:
+    failures = check_false_positives() + check_counting() + check_snapshot()
+
+    for failure in failures:
+        print(f"✘ {failure}")
+    if failures:
+        print(f"\n{len(failures)} rejection filter checks failed.")
+        return 1
+
+    print("\nAll rejection filter checks passed.")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,97 @@
+"""
+Check the queue scheduling policy: manual seeds overtake an old crawl backlog.
+
+The ordering checks run everywhere. The claim check applies the migrations to the
+database in TEST_DATABASE_URL, fills the queue with auto-seeded jobs that have been
+due for hours, enqueues one manual seed and claims a job with the workers' own SQL.
+It is skipped when TEST_DATABASE_URL is not set. Never point it at a database you care about.
+"""
+
+import os
+import sys
+from pathlib import Path
+from datetime import datetime, timedelta, timezone
+
+BACKEND_PATH = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_PATH))
+sys.path.insert(0, str(BACKEND_PATH / "seeding"))
+
+from scheduling import MAX_FAIRNESS_DELAY, claim_key, job_priority, schedule_delays
+
+BACKLOG_ROWS = 5_000
+BACKLOG_AGE = timedelta(hours=6)
+
+def check_ordering() -> list[str]:
+    """Pure-Python checks of claim_key and schedule_delays."""
+    failures: list[str] = []
+    now = datetime.now(timezone.utc)
+
+    old_auto = {"id": 1, "priority": job_priority("auto_seeded", 3), "scheduled_at": now - BACKLOG_AGE}
+    new_manual = {"id": 2, "priority": job_priority("manual_single"), "scheduled_at": now}
+    if sorted([old_auto, new_manual], key=claim_key)[0] is not new_manual:
+        failures.append("claim_key: a new manual seed should sort before an old auto-seeded job")
+
+    delays = schedule_delays([job_priority("manual_playlist")] * 10_000)
+    if max(delays) > MAX_FAIRNESS_DELAY:
+        failures.append(f"schedule_delays: a 10k-track batch is pushed back {max(delays):.0f}s, over the cap")
+
+    return failures
+
+def check_claim(database_url: str) -> list[str]:
+    """A manual seed enqueued now is claimed ahead of an auto backlog that has been due for hours."""
+    from sqlalchemy import create_engine, text
+    from test_query_plans import migrate
+    from db_helpers import bulk_enqueue
+    from worker import CLAIM_JOBS_SQL
+
+    migrate(database_url)
+    engine = create_engine(database_url)
+    failures: list[str] = []
+
+    with engine.connect() as db:
+        transaction = db.begin()
+        try:
+            db.execute(text("""
+                INSERT INTO populate_queue (spotify_track_id, source, seed_depth, priority, enqueued_at, scheduled_at)
+                SELECT 'backlog_' || lpad(n::text, 8, '0'), 'auto_seeded_test', 1, :priority,
+                       NOW() - make_interval(secs => :age), NOW() - make_interval(secs => :age - n)
+                FROM generate_series(1, :rows) AS n
+                ON CONFLICT (spotify_track_id) DO NOTHING
+            """), {"priority": job_priority("auto_seeded", 1), "age": BACKLOG_AGE.total_seconds(), "rows": BACKLOG_ROWS})
+            bulk_enqueue(db, ["manual_seed_test"], "manual_single")
+
+            claimed = db.execute(text(CLAIM_JOBS_SQL), {"lease_owner": "test", "lease_seconds": 60, "limit": 1}).fetchall()
+            claimed_ids = [row.spotify_track_id for row in claimed]
+            if claimed_ids == ["manual_seed_test"]:
+                print(f"✔ manual seed claimed ahead of {BACKLOG_ROWS} auto jobs due for {BACKLOG_AGE}")
+            else:
+                failures.append(f"claim: expected the manual seed first, got {claimed_ids}")
+        finally:
+            transaction.rollback()
+
+    engine.dispose()
+    return failures
+
+def main() -> int:
+    failures = check_ordering()
+    if not failures:
+        print("✔ claim ordering and fairness cap")
+
+    database_url = os.getenv("TEST_DATABASE_URL")
+    if database_url:
+        failures.extend(check_claim(database_url))
+    else:
+        print("TEST_DATABASE_URL is not set, skipping the claim check.")
+
+    for failure in failures:
+        print(f"✘ {failure}")
+    if failures:
+        print(f"\n{len(failures)} scheduling checks failed.")
+        return 1
+
+    print("\nAll scheduling checks passed.")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())